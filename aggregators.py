@@ -0,0 +1,170 @@
+# aggregators.py
+# -------------------------------------------------------------------------
+# Strömmande aggregat för klimat- och luftkvalitetssensorerna.
+#
+# Varje prov som kommer in (mqtt_subscriber-lyssnare, alltså i ingest-
+# vägen) matas in i en Stream per (sektion, attribut) i SERIES, till
+# O(1) per prov utan att någon historik sparas eller skannas:
+#   ema     tidsviktat exponentiellt medelvärde (tidskonstant AGG_TAU_S),
+#           så att ojämna provintervall vägs rätt
+#   lo/hi   min/max över glidande fönster (AGG_WINDOWS_S, sekunder), med
+#           monotona köer: varje prov läggs till och tas bort högst en gång
+#   slope   trend i enhet per timme: EMA (AGG_TREND_TAU_S) av ema-kurvans
+#           lutning mellan prov
+#
+# Efter varje prov publiceras en frusen Agg per attribut; get(sektion)
+# returnerar den senaste mappningen {attribut: Agg} för sektionen, som
+# läses bredvid sektionens post i snapshoten.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple
+
+import mqtt_subscriber
+
+AGG_TAU_S: float = float(os.getenv("AGG_TAU_S", "300"))
+AGG_TREND_TAU_S: float = float(os.getenv("AGG_TREND_TAU_S", "900"))
+AGG_WINDOWS_S: Tuple[float, ...] = tuple(
+    float(w) for w in os.getenv("AGG_WINDOWS_S", "3600,86400").split(",") if w.strip())
+
+# sektion -> attribut
+SERIES: Dict[str, Tuple[str, ...]] = {
+    "shelly_bht":     ("t", "rh"),
+    "airquality_raw": ("eco2_ppm",),
+}
+
+
+class Ema:
+    """Exponentiellt medelvärde med tidskonstant tau för ojämnt samplade värden."""
+    __slots__ = ("tau", "value", "ts")
+
+    def __init__(self, tau: float) -> None:
+        self.tau = tau
+        self.value: Optional[float] = None
+        self.ts = 0.0
+
+    def push(self, ts: float, v: float) -> float:
+        if self.value is None:
+            self.value = v
+        else:
+            self.value += (1.0 - math.exp(-(ts - self.ts) / self.tau)) * (v - self.value)
+        self.ts = ts
+        return self.value
+
+
+class MinMax:
+    """Min och max över de senaste `window` sekunderna (monotona köer)."""
+    __slots__ = ("window", "_lo", "_hi")
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._lo: Deque[Tuple[float, float]] = deque()    # stigande värden
+        self._hi: Deque[Tuple[float, float]] = deque()    # fallande värden
+
+    def push(self, ts: float, v: float) -> None:
+        lo, hi = self._lo, self._hi
+        while lo and lo[-1][1] >= v:
+            lo.pop()
+        lo.append((ts, v))
+        while hi and hi[-1][1] <= v:
+            hi.pop()
+        hi.append((ts, v))
+        edge = ts - self.window
+        while lo[0][0] <= edge:
+            lo.popleft()
+        while hi[0][0] <= edge:
+            hi.popleft()
+
+    @property
+    def lo(self) -> float:
+        return self._lo[0][1]
+
+    @property
+    def hi(self) -> float:
+        return self._hi[0][1]
+
+
+@dataclass(frozen=True, slots=True)
+class Agg:
+    value: float                                   # senaste råvärdet
+    ema: float
+    slope: float                                   # ema-enhet per timme
+    ranges: Tuple[Tuple[float, float, float], ...] # (fönster s, min, max)
+    n: int
+    ts: float
+
+    def range(self, window: float) -> Optional[Tuple[float, float]]:
+        for w, lo, hi in self.ranges:
+            if w == window:
+                return lo, hi
+        return None
+
+
+class Stream:
+    """Alla aggregat för en serie; push() är O(1) (amorterat för min/max)."""
+    __slots__ = ("ema", "_slope", "windows", "n", "ts")
+
+    def __init__(self, tau: float = AGG_TAU_S, trend_tau: float = AGG_TREND_TAU_S,
+                 windows: Tuple[float, ...] = AGG_WINDOWS_S) -> None:
+        self.ema = Ema(tau)
+        self._slope = Ema(trend_tau)
+        self.windows = [MinMax(w) for w in windows]
+        self.n = 0
+        self.ts: Optional[float] = None
+
+    def push(self, ts: float, v: float) -> Optional[Agg]:
+        """Mata in ett prov; None om det inte är nyare än föregående."""
+        if self.ts is not None and ts <= self.ts:
+            return None
+        prev = self.ema.value
+        ema = self.ema.push(ts, v)
+        if prev is not None:
+            self._slope.push(ts, (ema - prev) / (ts - self.ts) * 3600)
+        for mm in self.windows:
+            mm.push(ts, v)
+        self.n += 1
+        self.ts = ts
+        return Agg(v, ema, self._slope.value or 0.0,
+                   tuple((mm.window, mm.lo, mm.hi) for mm in self.windows), self.n, ts)
+
+
+_lock = threading.Lock()
+_streams: Dict[Tuple[str, str], Stream] = {(sec, attr): Stream() for sec, attrs in SERIES.items() for attr in attrs}
+_published: Dict[str, Mapping[str, Agg]] = {sec: MappingProxyType({}) for sec in SERIES}
+
+
+def get(section: str) -> Mapping[str, Agg]:
+    """{attribut: Agg} för sektionen (tom innan första provet)."""
+    return _published.get(section, MappingProxyType({}))
+
+
+def _on_update(section: str, rec: Any) -> None:
+    attrs = SERIES.get(section)
+    if not attrs:
+        return
+    ts = getattr(rec, "ts", None)
+    if ts is None:
+        return
+    with _lock:
+        out: Dict[str, Agg] = dict(_published[section])
+        changed = False
+        for attr in attrs:
+            v = getattr(rec, attr, None)
+            if v is None:
+                continue
+            agg = _streams[(section, attr)].push(float(ts), float(v))
+            if agg is not None:
+                out[attr] = agg
+                changed = True
+        if changed:
+            _published[section] = MappingProxyType(out)
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
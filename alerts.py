@@ -0,0 +1,254 @@
+# alerts.py
+# -------------------------------------------------------------------------
+# Regelbaserade larm, utvärderade i ingest-vägen och indexerade per sektion.
+#
+# En regel gäller en snapshot-sektion och har ett villkor på formen
+# "<attribut> <op> <literal>" (op: == != > >= < <= in, not in), t.ex.
+# "eco2_ppm > 1200". Villkoren kompileras en gång till predikat och
+# grupperas per sektion; när en sektion uppdateras (mqtt_subscriber-
+# lyssnare) körs bara dess regler. Ett villkor vars attribut saknas (None)
+# ändrar ingenting. Strängar jämförs utan hänsyn till versaler, eftersom
+# payloadernas skiftläge inte är garanterat ("error" / "ERROR").
+#
+# Per regel:
+#   for_s     villkoret måste hålla så länge innan larmet går; en timer i
+#             scheduler bokas när det börjar hålla och avbokas om det släpper
+#   clear     eget villkor för återställning (hysteres); annars "inte when"
+#   edge      larma bara på övergång falskt -> sant, inte på första värdet
+#   expire_s  aktivt larm återställs självt efter så lång tid
+#
+# Aktiva larm publiceras som en tuple med sekvensnummer (current()), som
+# kioskens banner de-dupar på utan att utvärdera något. Nya larm skickas
+# till HA:s notify-tjänst (ALERT_NOTIFY, t.ex. "mobile_app_telefon"),
+# samlade i ett anrop per ALERT_NOTIFY_BATCH_S sekunder.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import ast
+import logging
+import operator
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import mqtt_subscriber
+import scheduler
+
+_LOGGER = logging.getLogger("alerts")
+
+ALERT_NOTIFY: Optional[str] = os.getenv("ALERT_NOTIFY") or None
+ALERT_NOTIFY_BATCH_S: float = float(os.getenv("ALERT_NOTIFY_BATCH_S", "10"))
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    name: str
+    section: str
+    when: str
+    text: str                        # str.format med postens attribut
+    for_s: float = 0.0
+    clear: Optional[str] = None
+    edge: bool = False
+    expire_s: Optional[float] = None
+    notify: bool = True
+
+
+RULES: Tuple[Rule, ...] = (
+    Rule("washer_done", "washer", "time_to_end_min == 0", "Tvättmaskinen är klar",
+         edge=True, clear="time_to_end_min > 0", expire_s=3600),
+    Rule("dryer_done", "dryer", "time_left == 0", "Torktumlaren är klar",
+         edge=True, clear="time_left > 0", expire_s=3600),
+    Rule("co2_high", "airquality_raw", "eco2_ppm > 1200", "CO₂ {eco2_ppm} ppm i stue",
+         for_s=600, clear="eco2_ppm < 1100"),
+    Rule("laundry_cold", "env_laundry", "t < 5", "Vaskerum {t:.1f} °C",
+         for_s=600, clear="t > 6"),
+    Rule("mower_error", "automower", "activity == 'error'", "Robotgräsklipparen har fel"),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Active:
+    name: str
+    text: str
+    since: float
+
+
+# --- Kompilering -----------------------------------------------------------
+_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq, "!=": operator.ne, ">=": operator.ge, "<=": operator.le,
+    ">": operator.gt, "<": operator.lt,
+    "in": lambda v, lit: v in lit, "not in": lambda v, lit: v not in lit,
+}
+_COND_RE = re.compile(r"^\s*(\w+)\s*(==|!=|>=|<=|>|<|not in|in)\s*(.+?)\s*$")
+
+Predicate = Callable[[Any], Optional[bool]]
+
+
+def _fold(lit: Any) -> Any:
+    """Strängliteraler (även i tuple/list/set) till gemener."""
+    if isinstance(lit, str):
+        return lit.lower()
+    if isinstance(lit, (tuple, list, set, frozenset)):
+        return type(lit)(_fold(x) for x in lit)
+    return lit
+
+
+def compile_condition(cond: str) -> Predicate:
+    """"attr op literal" -> pred(rec): True/False, None om attributet saknas."""
+    m = _COND_RE.match(cond)
+    if not m:
+        raise ValueError(f"ogiltigt villkor: {cond!r}")
+    attr, op, lit = m.group(1), _OPS[m.group(2)], _fold(ast.literal_eval(m.group(3)))
+
+    def pred(rec: Any) -> Optional[bool]:
+        v = getattr(rec, attr, None)
+        if v is None:
+            return None
+        if isinstance(v, str):
+            v = v.lower()
+        try:
+            return bool(op(v, lit))
+        except TypeError:
+            return None
+    return pred
+
+
+class _Compiled:
+    __slots__ = ("rule", "when", "clear", "prev", "pending", "active", "expiry")
+
+    def __init__(self, rule: Rule) -> None:
+        self.rule = rule
+        self.when = compile_condition(rule.when)
+        cl = compile_condition(rule.clear) if rule.clear else None
+        self.clear: Predicate = cl if cl is not None else (
+            lambda rec, w=self.when: None if (r := w(rec)) is None else not r)
+        self.prev: Optional[bool] = None          # senaste utfall av when
+        self.pending: Optional[scheduler.Handle] = None
+        self.active: Optional[Active] = None
+        self.expiry: Optional[scheduler.Handle] = None
+
+
+def _index(rules: Tuple[Rule, ...]) -> Dict[str, List[_Compiled]]:
+    by_section: Dict[str, List[_Compiled]] = {}
+    for rule in rules:
+        by_section.setdefault(rule.section, []).append(_Compiled(rule))
+    return by_section
+
+
+# --- Tillstånd -------------------------------------------------------------
+_lock = threading.Lock()
+_by_section = _index(RULES)
+_state: Tuple[int, Tuple[Active, ...]] = (0, ())   # byts ut i ett stycke
+_outbox: List[str] = []
+_flush: Optional[scheduler.Handle] = None
+
+
+def current() -> Tuple[int, Tuple[Active, ...]]:
+    """(sekvensnummer, aktiva larm i starttidsordning)."""
+    return _state
+
+
+def _publish() -> None:
+    """Kallas med _lock hållet."""
+    global _state
+    active = sorted((c.active for rules in _by_section.values() for c in rules if c.active),
+                    key=lambda a: a.since)
+    _state = (_state[0] + 1, tuple(active))
+
+
+def _text(rule: Rule, rec: Any) -> str:
+    try:
+        return rule.text.format_map({f: getattr(rec, f) for f in getattr(rec, "__slots__", ())})
+    except (KeyError, TypeError, ValueError):
+        return rule.text
+
+
+def _activate(c: _Compiled, rec: Any, now: float) -> None:
+    """Kallas med _lock hållet."""
+    global _flush
+    c.pending = None
+    c.active = Active(c.rule.name, _text(c.rule, rec), now)
+    _LOGGER.info("larm: %s", c.active.text)
+    if c.rule.expire_s:
+        c.expiry = scheduler.call_at(now + c.rule.expire_s, _on_expire, c)
+    if c.rule.notify and ALERT_NOTIFY:
+        _outbox.append(c.active.text)
+        if _flush is None:
+            _flush = scheduler.call_later(ALERT_NOTIFY_BATCH_S, _on_flush)
+    _publish()
+
+
+def _deactivate(c: _Compiled) -> None:
+    """Kallas med _lock hållet."""
+    _LOGGER.info("återställt: %s", c.active.text if c.active else c.rule.name)
+    c.active = None
+    if c.expiry is not None:
+        c.expiry.cancel()
+        c.expiry = None
+    _publish()
+
+
+def _step(c: _Compiled, rec: Any, now: float) -> None:
+    """Kör en regel mot en ny post. Kallas med _lock hållet."""
+    r = c.when(rec)
+    if c.active is not None:
+        if c.clear(rec):
+            _deactivate(c)
+    elif c.pending is not None:
+        if r is False:
+            c.pending.cancel()
+            c.pending = None
+    elif r and (not c.rule.edge or c.prev is False):
+        if c.rule.for_s:
+            c.pending = scheduler.call_at(now + c.rule.for_s, _on_held, c, rec)
+        else:
+            _activate(c, rec, now)
+    if r is not None:
+        c.prev = r
+
+
+def _on_held(c: _Compiled, rec: Any) -> None:
+    with _lock:
+        if c.pending is not None and c.active is None:
+            _activate(c, rec, time.time())
+
+
+def _on_expire(c: _Compiled) -> None:
+    with _lock:
+        c.expiry = None
+        if c.active is not None:
+            _deactivate(c)
+
+
+def _on_flush() -> None:
+    global _flush
+    with _lock:
+        msgs, _outbox[:] = list(_outbox), []
+        _flush = None
+    if msgs:
+        # HTTP-anropet får inte blockera schemaläggartråden
+        threading.Thread(target=_notify, args=(msgs,), name="alerts-notify", daemon=True).start()
+
+
+def _notify(msgs: List[str]) -> None:
+    from ha_client import call_service
+    ok, err = call_service("notify", ALERT_NOTIFY, {"title": "FamilyDash", "message": "\n".join(msgs)})
+    if not ok:
+        _LOGGER.warning("notify misslyckades (%d larm): %s", len(msgs), err)
+
+
+def _on_update(section: str, rec: Any) -> None:
+    rules = _by_section.get(section)
+    if not rules:
+        return
+    now = float(getattr(rec, "ts", None) or time.time())
+    with _lock:
+        for c in rules:
+            _step(c, rec, now)
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
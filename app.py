@@ -1,31 +1,63 @@
+import startup_trace  # först: STARTUP_TRACE=1 räknar faserna från denna import
+import log_setup
+log_setup.setup()  # först, så att all loggning går via kön
+import memprof  # MEMPROF=1 startar tracemalloc innan resten av appen allokerar
+
+# Anslut MQTT innan de tunga importerna (dash, plotly), så att connect och
+# retained-skuren sker medan resten av appen laddas.
+import mqtt_subscriber
+if startup_trace.DEFER:
+    mqtt_subscriber.start()
+    startup_trace.mark("mqtt_started")
+
 from dash import Dash, html, dcc, no_update
 from dash.dependencies import Input, Output, State
 
 from components.calendar_box import calendar_box
-from components.tibber_plot import make_tibber_figure
+from components.tibber_plot import make_tibber_figure, empty_tibber_figure, tibber_data, tibber_skeleton
 from components.weather_box import weather_box
 from components.washer_box import  washer_compute
 from components.dryer_box import dryer_compute
 from components.power_box import power_compute
 from components.climate_quality_box import climate_quality_compute
 from components.temperature_modal import (
-    create_modal_layout, render_temperature_tiles,
+    create_modal_layout, render_temperature_tiles, temperature_tiles_key,
     HEATPUMP_ENTITY, HEATPUMP_HEAT_TEMP, HEATPUMP_COOL_TEMP,
 )
 from components.anne_button import anne_button_render
 from components.lights_box import lights_render, create_lights_modal_layout
 from components.markis_box import markis_render, create_markis_modal_layout
 from components.automower_box import automower_compute
-from components.energy_modal import create_energy_modal_layout, make_energy_figure, make_energy_title, stat_ids
+from components.automower_modal import create_automower_modal_layout, automower_modal_compute
+from components.price_box import price_compute
+from components.alert_banner import alert_banner_compute
+from components.history_charts import create_history_layout, make_history_figures, history_extend
+from components.energy_modal import (
+    create_energy_modal_layout, make_energy_figure, make_energy_title, stat_ids,
+    live_energy_data, energy_drift, energy_data, energy_skeleton, loading_title,
+)
 
-from ha_client import call_service, get_energy_today
+from ha_client import call_service
+import energy_history
+from ha_bootstrap import start as ha_bootstrap_start
+from callback_stats import instrument
+import metrics
+import mqtt_log
+import view_gate
+import client_figures
+import price_planner
 
 # --- MQTT helper ---
-from mqtt_subscriber import start as mqtt_start, get_snapshot
+from mqtt_subscriber import start as mqtt_start, get_snapshot, device_kwh_today, ENERGY_LIVE
 from typing import Any, cast
 from zoneinfo import ZoneInfo
 import os, time
 
+# Alla ingest-lyssnare (aggregat, larm, cykler, …), även de ingen tile importerar
+mqtt_subscriber.load_ingest()
+
+startup_trace.mark("imports")
+
 LOCAL_TZ = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
 ANNE_SCRIPT_ENTITY = os.getenv("HA_SCRIPT_ANNE")
 LIGHTS_SCRIPT_OFF  = os.getenv("HA_SCRIPT_LIGHTS_OFF")
@@ -37,10 +69,40 @@ MARKIS_SCRIPT_CLOSE = os.getenv("HA_SCRIPT_MARKIS_CLOSE")
 STATUS_TTL_SECONDS = 5
 
 app = Dash(__name__)
+# DASH_INSTRUMENT=1: mät varje callback (måste ske innan callbacks registreras)
+instrument(app)
+# /metrics (Prometheus, METRICS=1) och /healthz
+metrics.install(app)
+# /debug/mqtt: senaste meddelandena per topic
+mqtt_log.install(app)
+# /debug/memory och minnesprov till /metrics (MEMPROF=1)
+memprof.install(app)
+# /api/plan: billigaste körfönster per apparat ur Tibber-prognosen
+price_planner.install(app)
+startup_trace.install(app)
+startup_trace.mark("dash_app")
 
 # Starta MQTT-subscribe i bakgrunden (threads), och skapar snapshots med
 # senaste värdena från MQTT, en fryst bild av senaste mqtt-läget.
 mqtt_start()
+# Valfritt (HA_BOOTSTRAP=1): fyll snapshoten direkt från HA:s REST-API så att
+# tiles inte väntar på icke-retained topics.
+ha_bootstrap_start()
+startup_trace.mark("mqtt_started")
+
+# Synlighetsgrindar (view_gate.py): widgets på skärm 1 uppdateras bara när
+# skärm 1 visas, modalernas innehåll bara när modalen är öppen.
+TICK_MAIN   = view_gate.gate(app, "tick-main", "tick", screen=0)
+SLOW_MAIN   = view_gate.gate(app, "slow-main", "interval-component", screen=0)
+TICK_TEMP   = view_gate.gate(app, "tick-temp", "tick", modal="modal-open")
+SLOW_ENERGY = view_gate.gate(app, "slow-energy", "interval-component", modal="energy-modal-open")
+TICK_MOWER  = view_gate.gate(app, "tick-mower", "tick", modal="automower-modal-open")
+TICK_HIST   = view_gate.gate(app, "tick-hist", "tick", screen=1)
+
+# CLIENT_FIGURES=1 (client_figures.py): pris- och energigrafen byggs i
+# webbläsaren; callbacks svarar då bara med data.
+TIBBER_OUT = client_figures.output(app, "tibber-graph", "tibber", tibber_skeleton)
+ENERGY_OUT = client_figures.output(app, "energy-devices-graph", "energy", energy_skeleton)
 
 app.layout = html.Div(
     children=[
@@ -73,29 +135,32 @@ app.layout = html.Div(
                 html.Div(id="markis-box",   className="box", children=markis_render()),
                 html.Div(id="dryer-box",    className="dryer-card"),
                 html.Div(id="power-box",    className="box power-card", n_clicks=0, style={"cursor": "pointer"}),
-                html.Div(id="automower-box", className="box appliance-card automower-card"),
+                html.Div(id="automower-box", className="box appliance-card automower-card",
+                         n_clicks=0, style={"cursor": "pointer"}),
             ],
         ),
 
         html.Div(
             id="tibber-box",
             className="tibber box",
-            children=dcc.Graph(
-                id="tibber-graph",
-                figure=make_tibber_figure(),
-                className="tibber-graph",
-                style={"height": "100%"},
-                config={"displayModeBar": False},
-            ),
+            children=[
+                dcc.Graph(
+                    id="tibber-graph",
+                    # Fylls av cb_tibber vid första laddningen; layouten väntar inte på grafen
+                    figure=empty_tibber_figure() if startup_trace.DEFER else make_tibber_figure(),
+                    className="tibber-graph",
+                    style={"height": "100%"},
+                    config={"displayModeBar": False},
+                ),
+                # Aktuellt pris och prislarm (price_alerts.py)
+                html.Div(id="price-box", className="price-tile"),
+            ],
         ),
             ],
           ),
           html.Div(
             className="screen screen-2",
-            children=[
-                html.Div("Skärm 2", className="screen2-title"),
-                html.Div("Tom – fylls senare", className="screen2-sub"),
-            ],
+            children=create_history_layout(),
           ),
         ],
       ),
@@ -108,6 +173,9 @@ app.layout = html.Div(
             ],
         ),
 
+        # Aktiva larm (alerts.py), över båda skärmarna
+        html.Div(id="alert-banner", className="alert-banner"),
+
         # Temperature modal
         create_modal_layout(),
 
@@ -120,11 +188,16 @@ app.layout = html.Div(
         # Energy devices modal
         create_energy_modal_layout(),
 
+        # Automower modal
+        create_automower_modal_layout(),
+
         # Två olika intervaller för callback-anrop:
         # 2 minuter för fetch av tibber, kalender, väder
         # 5 sekunder för uppdatering av widgets
         dcc.Interval(id="interval-component", interval=2*60*1000, n_intervals=0),
         dcc.Interval(id="tick", interval=5000, n_intervals=0),
+        # Live-uppdatering av energimodalen (ENERGY_LIVE=1), bara när den är öppen
+        dcc.Interval(id="energy-live-tick", interval=5000, n_intervals=0, disabled=True),
         # Store för att hålla reda på senaste timestamps för olika widgets,
         dcc.Store(id="last-ts-weather", data={}),
         dcc.Store(id="anne-button-pressed-at", data=None),
@@ -134,13 +207,24 @@ app.layout = html.Div(
         dcc.Store(id="last-ts-climate-quality", data={}),
         dcc.Store(id="last-ts-power", data={}),
         dcc.Store(id="last-ts-automower", data={}),
+        dcc.Store(id="last-ts-price", data={}),
+        dcc.Store(id="last-ts-alerts", data={}),
+        dcc.Store(id="last-ts-temp", data=None),
         dcc.Store(id="modal-open", data=False),
         dcc.Store(id="lights-modal-open", data=False),
         dcc.Store(id="markis-modal-open", data=False),
         dcc.Store(id="energy-modal-open", data=False),
+        dcc.Store(id="automower-modal-open", data=False),
+        dcc.Store(id="last-seq-automower-modal", data=None),
+        # Aktiv skärm (sätts av pager.js) och grindarnas stores
+        *view_gate.stores(),
+        # Figurskelett och data-stores för CLIENT_FIGURES=1
+        *client_figures.stores(),
     ],
 )
 
+startup_trace.mark("layout")
+
 # ---- CALLBACKS ----------------------------------------------------------
 
 #Callback syntax:
@@ -151,14 +235,14 @@ app.layout = html.Div(
 # ---- Calendar -----------------------------------------------------------
 @app.callback(
         [Output("calendar-box", "children")],
-        Input("interval-component", "n_intervals"))
+        Input(SLOW_MAIN, "data"))
 def cb_calendar(_):
     return (calendar_box(),)
 
 # ---- Weather --------------------------------------------------------------
 @app.callback(
         [Output("weather-box", "children")],
-        Input("interval-component", "n_intervals"))
+        Input(SLOW_MAIN, "data"))
 def cb_weather(_):
     return (weather_box(),)
 
@@ -167,24 +251,48 @@ def cb_weather(_):
     [Output("washer-box", "children"),
      Output("washer-box", "className"),
      Output("last-ts-washer", "data")],
-    Input("tick", "n_intervals"),
+    Input(TICK_MAIN, "data"),
     State("last-ts-washer", "data"),
 )
 def cb_washer(_n, last_ts):
     return washer_compute(get_snapshot(), LOCAL_TZ, last_ts)
 
 # ---- Tibber graph --------------------------------------------------------
-@app.callback(Output("tibber-graph", "figure"), Input("interval-component", "n_intervals"))
+@app.callback(TIBBER_OUT, Input(SLOW_MAIN, "data"))
 def cb_tibber(_):
+    if client_figures.ENABLED:
+        return tibber_data() or {}
     return make_tibber_figure()
 
+# ---- Price tile ----------------------------------------------------------
+@app.callback(
+    [Output("price-box", "children"),
+     Output("price-box", "className"),
+     Output("last-ts-price", "data")],
+    Input(TICK_MAIN, "data"),
+    State("last-ts-price", "data"),
+)
+def cb_price(_n, last_ts):
+    return price_compute(LOCAL_TZ, last_ts)
+
+# ---- Alert banner --------------------------------------------------------
+@app.callback(
+    [Output("alert-banner", "children"),
+     Output("alert-banner", "className"),
+     Output("last-ts-alerts", "data")],
+    Input("tick", "n_intervals"),
+    State("last-ts-alerts", "data"),
+)
+def cb_alerts(_n, last_ts):
+    return alert_banner_compute(LOCAL_TZ, last_ts)
+
 # ---- Anne Button ---------------------------------------------------------
 @app.callback(
     [Output("anne-button-box", "children"),
      Output("anne-button-pressed-at", "data"),
      Output("anne-button-status", "data")],
     [Input("anne-button", "n_clicks"),
-     Input("tick", "n_intervals")],
+     Input(TICK_MAIN, "data")],
     [State("anne-button-pressed-at", "data"),
      State("anne-button-status", "data")],
     prevent_initial_call=False,
@@ -227,7 +335,7 @@ def refresh_anne_button(n_clicks, _tick, pressed_at, status_state):
     [Output("dryer-box", "children"),
      Output("dryer-box", "className"),
      Output("last-ts-dryer", "data")],
-    Input("tick", "n_intervals"),
+    Input(TICK_MAIN, "data"),
     State("last-ts-dryer", "data"),
 )
 def cb_dryer(_n, last_ts):
@@ -238,17 +346,43 @@ def cb_dryer(_n, last_ts):
     [Output("automower-box", "children"),
      Output("automower-box", "className"),
      Output("last-ts-automower", "data")],
-    Input("tick", "n_intervals"),
+    Input(TICK_MAIN, "data"),
     State("last-ts-automower", "data"),
 )
 def cb_automower(_n, last_ts):
     return automower_compute(get_snapshot(), LOCAL_TZ, last_ts)
 
+# ---- Automower modal -----------------------------------------------------
+@app.callback(
+    [Output("automower-modal-open", "data"),
+     Output("automower-modal", "style")],
+    [Input("automower-box", "n_clicks"),
+     Input("close-automower-modal", "n_clicks")],
+    State("automower-modal-open", "data"),
+)
+def toggle_automower_modal(open_clicks, close_clicks, is_open):
+    from dash import callback_context
+    if not callback_context.triggered:
+        return is_open, {"display": "flex" if is_open else "none"}
+    trigger = callback_context.triggered[0]["prop_id"].split(".")[0]
+    if trigger == "automower-box":
+        return True, {"display": "flex"}
+    return False, {"display": "none"}
+
+@app.callback(
+    [Output("automower-stats", "children"),
+     Output("last-seq-automower-modal", "data")],
+    Input(TICK_MOWER, "data"),
+    State("last-seq-automower-modal", "data"),
+)
+def cb_automower_modal(_n, last_seq):
+    return automower_modal_compute(LOCAL_TZ, last_seq)
+
 # ---- Climate + Air Quality (combined) -------------------------------------
 @app.callback(
     [Output("climate-quality-box", "children"),
      Output("last-ts-climate-quality", "data")],
-    Input("tick", "n_intervals"),
+    Input(TICK_MAIN, "data"),
     State("last-ts-climate-quality", "data"),
 )
 def cb_climate_quality(_n, last_ts):
@@ -264,7 +398,7 @@ def cb_climate_quality(_n, last_ts):
     [Output("power-box", "children"),
      Output("power-box", "className"),
      Output("last-ts-power", "data")],
-    Input("tick", "n_intervals"),
+    Input(TICK_MAIN, "data"),
     State("last-ts-power", "data"),
 )
 def cb_power(_n, last_ts):
@@ -295,12 +429,47 @@ def toggle_temperature_modal(open_clicks, close_clicks, is_open):
     return is_open, {"display": "flex" if is_open else "none"}
 
 @app.callback(
-    Output("temp-tiles-container", "children"),
-    Input("tick", "n_intervals"),
+    [Output("temp-tiles-container", "children"),
+     Output("last-ts-temp", "data")],
+    Input(TICK_TEMP, "data"),
+    State("last-ts-temp", "data"),
 )
-def update_temperature_tiles(_n):
+def update_temperature_tiles(_n, last_key):
     """Update temperature tiles with latest sensor data"""
-    return render_temperature_tiles(get_snapshot(), LOCAL_TZ)
+    snap = get_snapshot()
+    key = temperature_tiles_key(snap)
+    if key == last_key:
+        return no_update, no_update
+    return render_temperature_tiles(snap, LOCAL_TZ), key
+
+# ---- Historik (skärm 2) ---------------------------------------------------
+_HIST_GRAPHS = ["hist-temp", "hist-rh", "hist-power", "hist-air"]
+
+@app.callback(
+    [Output(g, "figure") for g in _HIST_GRAPHS] + [Output("history-cursor", "data")],
+    [Input("history-range", "value"),
+     Input("view-screen", "data")],
+    State("history-cursor", "data"),
+)
+def cb_history(range_key, screen, cursor):
+    # Hela figurer bara när skärm 2 visas första gången eller intervallet byts;
+    # annars kommer diagrammen ikapp via extendData nedan.
+    if screen != 1 or (cursor and cursor.get("range") == range_key):
+        return [no_update] * (len(_HIST_GRAPHS) + 1)
+    figs, cursor = make_history_figures(range_key)
+    return [*figs, cursor]
+
+@app.callback(
+    [Output(g, "extendData") for g in _HIST_GRAPHS]
+    + [Output("history-cursor", "data", allow_duplicate=True)],
+    Input(TICK_HIST, "data"),
+    [State("history-range", "value"),
+     State("history-cursor", "data")],
+    prevent_initial_call=True,
+)
+def cb_history_extend(_n, range_key, cursor):
+    extends, cursor = history_extend(range_key, cursor)
+    return [*extends, cursor]
 
 # ---- Heat pump (luftvärmepump) buttons ----------------------------------
 @app.callback(
@@ -413,7 +582,8 @@ def cb_markis_buttons(_open, _stop, _close):
 # ---- Energy devices modal -----------------------------------------------
 @app.callback(
     [Output("energy-modal-open", "data"),
-     Output("energy-modal", "style")],
+     Output("energy-modal", "style"),
+     Output("energy-live-tick", "disabled")],
     [Input("power-box", "n_clicks"),
      Input("close-energy-modal", "n_clicks")],
     State("energy-modal-open", "data"),
@@ -421,27 +591,78 @@ def cb_markis_buttons(_open, _stop, _close):
 def toggle_energy_modal(open_clicks, close_clicks, is_open):
     from dash import callback_context
     if not callback_context.triggered:
-        return is_open, {"display": "flex" if is_open else "none"}
+        return is_open, {"display": "flex" if is_open else "none"}, not (is_open and ENERGY_LIVE)
     trigger = callback_context.triggered[0]["prop_id"].split(".")[0]
     if trigger == "power-box":
-        return True, {"display": "flex"}
-    return False, {"display": "none"}
+        return True, {"display": "flex"}, not ENERGY_LIVE
+    return False, {"display": "none"}, True
+
+
+_last_energy_drift: list[str] = []
+
+
+def _energy_figure(*args):
+    # Bara data i klientläget; {} betyder "väntar på data" (assets/figures.js)
+    if client_figures.ENABLED:
+        return energy_data(*args) or {}
+    return make_energy_figure(*args)
 
 
 @app.callback(
-    [Output("energy-devices-graph", "figure"),
+    [ENERGY_OUT,
      Output("energy-modal-title", "children")],
     [Input("energy-modal-open", "data"),
-     Input("interval-component", "n_intervals")],
+     Input(SLOW_ENERGY, "data"),
+     Input("energy-range", "value"),
+     Input("energy-live-tick", "n_intervals")],
 )
-def update_energy_graph(is_open, _n):
+def update_energy_graph(is_open, _n, range_key, _live_n):
     # Hämta bara från HA när modalen är öppen (annars onödig websocket-trafik).
     if not is_open:
         return no_update, no_update
-    data = get_energy_today(stat_ids())
-    total_today = (get_snapshot().get("pulse_power") or {}).get("energy_day_kwh")
-    return make_energy_figure(data, total_today), make_energy_title(data, total_today)
-
+    from dash import ctx
+    range_key = range_key or "day"
+    ids = stat_ids()
+    # Vecka/månad ändras inte av live-ticken, utom för att visa historiken
+    # så snart förhämtningen landat
+    if (ctx.triggered_id == "energy-live-tick" and range_key != "day"
+            and energy_history.history_ready(ids)):
+        return no_update, no_update
+    total_today = get_snapshot()["pulse_power"].energy_day_kwh
+
+    # Live-läge: enheter med effektsensor tas från MQTT-integreringen, övriga
+    # från HA-statistiken (cachad, hämtas högst varannan minut).
+    drift: list[str] = []
+    if ENERGY_LIVE and range_key == "day":
+        ha_data = energy_history.today(ids)
+        live_kwh = device_kwh_today()
+        data = live_energy_data(ha_data, live_kwh)
+        drift = energy_drift(live_kwh, ha_data)
+        global _last_energy_drift
+        if drift and drift != _last_energy_drift:
+            app.logger.warning("Live-energi avviker från HA för: %s", ", ".join(drift))
+        _last_energy_drift = drift
+        title = make_energy_title(data, total_today)
+        if drift:
+            title += f" · ⚠ avvikelse: {', '.join(drift)}"
+        return _energy_figure(data, total_today), title
+
+    # Avslutade dygn hämtas högst en gång (i bakgrunden, cachas på disk);
+    # dagens värde cachas kort, så byte av vy går utan HA-rundresa.
+    if not energy_history.history_ready(ids):
+        energy_history.prefetch(ids)
+        if range_key != "day":
+            # Visa inte dagens siffror under vecko-/månadsrubriken
+            return _energy_figure(None, total_today), loading_title(range_key)
+        data = energy_history.today(ids)
+        return _energy_figure(data, total_today), make_energy_title(data, total_today)
+    data, previous = energy_history.period(ids, range_key)
+    return (_energy_figure(data, total_today, previous, range_key),
+            make_energy_title(data, total_today, previous, range_key))
+
+
+startup_trace.mark("callbacks")
 
 if __name__ == "__main__":
+    startup_trace.mark("server_start")
     app.run(debug=False, host="0.0.0.0", port=8050)
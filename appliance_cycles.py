@@ -0,0 +1,280 @@
+# appliance_cycles.py
+# -------------------------------------------------------------------------
+# Cykler för tvättmaskin och torktumlare: start/slut, längd och energi.
+#
+# Lyssnaren (mqtt_subscriber, alltså i ingest-vägen) ser övergångarna
+# direkt i varje post: kvarvarande tid > 0 betyder att maskinen går.
+# Stillastående -> igång startar en cykel, igång -> stillastående avslutar
+# den. En cykel som redan pågick när kiosken startade saknar känd start och
+# räknas inte.
+#
+# Program: payloadens "program" om HA skickar det, annars maskinens första
+# tidsuppskattning avrundad till 5 min ("≈90 min"), som i praktiken skiljer
+# programmen åt. Per (maskin, program) hålls längden som löpande medelvärde
+# och varians (Welford), så förväntat slut är start + medel utan att någon
+# historik läses.
+#
+# Energi tas från live-effekten (device_power, ENERGY_LIVE=1) för maskiner
+# med power_key: en löpande kWh-summa som överlever midnattsnollningen, och
+# cykelns energi är skillnaden mellan slut och start.
+#
+# Avslutade cykler läggs till i APPLIANCE_CYCLES_PATH (en JSON-rad per
+# cykel). Filen läses en gång vid import för att bygga upp statistiken och
+# skrivs om med de senaste APPLIANCE_CYCLES_MAX raderna om den vuxit förbi.
+#
+#   appliance_cycles.get("washer") -> CycleInfo (färdig för tilen)
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import mqtt_subscriber
+
+_LOGGER = logging.getLogger("cycles")
+
+CYCLES_PATH: str  = os.getenv("APPLIANCE_CYCLES_PATH", "data/appliance_cycles.jsonl")
+CYCLES_MAX: int   = int(os.getenv("APPLIANCE_CYCLES_MAX", "1000"))
+MIN_RUNS: int     = int(os.getenv("APPLIANCE_CYCLES_MIN_RUNS", "2"))   # före prognos
+
+# sektion -> (fält med kvarvarande minuter, power_key i device_power eller None)
+APPLIANCES: Dict[str, Tuple[str, Optional[str]]] = {
+    "washer": ("time_to_end_min", "tvattmaskin"),
+    "dryer":  ("time_left", None),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Cycle:
+    appliance: str
+    program: str
+    start: float
+    end: float
+    est_min: Optional[int]           # maskinens uppskattning vid start
+    kwh: Optional[float]
+
+    @property
+    def duration_s(self) -> float:
+        return self.end - self.start
+
+
+class Welford:
+    """Löpande medelvärde och varians, O(1) per värde."""
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class ProgramStats:
+    n: int
+    mean_s: float
+    std_s: float
+    mean_kwh: Optional[float]
+
+
+@dataclass(frozen=True, slots=True)
+class CycleInfo:
+    seq: int                         # ökar vid varje ändring, för de-dupe
+    running: bool = False
+    program: Optional[str] = None
+    start: Optional[float] = None
+    predicted_end: Optional[float] = None
+    last: Optional[Cycle] = None
+    stats: Optional[ProgramStats] = None   # pågående program, annars senaste
+
+
+def program_key(program: Optional[str], est_min: Optional[int]) -> str:
+    if program:
+        return str(program)
+    if est_min:
+        return f"≈{int(round(est_min / 5.0)) * 5} min"
+    return "?"
+
+
+class _Track:
+    __slots__ = ("running", "start", "program", "est_min", "kwh0")
+
+    def __init__(self) -> None:
+        self.running: Optional[bool] = None   # None: inget sett ännu
+        self.start: Optional[float] = None    # None under en cykel med okänd start
+        self.program: Optional[str] = None
+        self.est_min: Optional[int] = None
+        self.kwh0: Optional[float] = None
+
+
+# --- Tillstånd -------------------------------------------------------------
+_lock = threading.Lock()
+_tracks: Dict[str, _Track] = {name: _Track() for name in APPLIANCES}
+_stats: Dict[Tuple[str, str], Welford] = {}
+_kwh_stats: Dict[Tuple[str, str], Welford] = {}
+_last: Dict[str, Cycle] = {}
+_kwh_total: Dict[str, float] = {}      # power_key -> kWh sedan start
+_kwh_seen: Dict[str, float] = {}       # power_key -> senaste dygnsvärde
+_published: Dict[str, CycleInfo] = {name: CycleInfo(0) for name in APPLIANCES}
+
+
+def get(appliance: str) -> CycleInfo:
+    return _published.get(appliance) or CycleInfo(0)
+
+
+def _program_stats(appliance: str, program: Optional[str]) -> Optional[ProgramStats]:
+    w = _stats.get((appliance, program or ""))
+    if w is None or not w.n:
+        return None
+    k = _kwh_stats.get((appliance, program or ""))
+    return ProgramStats(w.n, w.mean, w.std, k.mean if k and k.n else None)
+
+
+def _publish(appliance: str) -> None:
+    """Kallas med _lock hållet."""
+    t = _tracks[appliance]
+    last = _last.get(appliance)
+    running = bool(t.running)
+    program = t.program if running else (last.program if last else None)
+    stats = _program_stats(appliance, program)
+    predicted = None
+    if running and t.start is not None and stats is not None and stats.n >= MIN_RUNS:
+        predicted = t.start + stats.mean_s
+    _published[appliance] = CycleInfo(_published[appliance].seq + 1, running, program,
+                                      t.start if running else None, predicted, last, stats)
+
+
+def _record(c: Cycle) -> None:
+    """Lägg en avslutad cykel i statistiken. Kallas med _lock hållet."""
+    key = (c.appliance, c.program)
+    _stats.setdefault(key, Welford()).push(c.duration_s)
+    if c.kwh is not None:
+        _kwh_stats.setdefault(key, Welford()).push(c.kwh)
+    prev = _last.get(c.appliance)
+    if prev is None or c.end >= prev.end:
+        _last[c.appliance] = c
+
+
+def _on_appliance(appliance: str, rec: Any) -> Optional[Cycle]:
+    """Övergångar för en maskin; returnerar cykeln som just tog slut. Kallas med _lock hållet."""
+    field, power_key = APPLIANCES[appliance]
+    minutes = getattr(rec, field, None)
+    if minutes is None:
+        return None
+    running = minutes > 0
+    ts = float(rec.ts or time.time())
+    t = _tracks[appliance]
+    if running == t.running:
+        return None
+
+    done: Optional[Cycle] = None
+    if running:
+        first = t.running is None
+        t.start = None if first else ts
+        t.est_min = minutes
+        t.program = program_key(getattr(rec, "program", None), minutes)
+        t.kwh0 = _kwh_total.get(power_key) if power_key else None
+    elif t.start is not None and ts > t.start:
+        # Samma villkor som _load: ts är hela sekunder och bootstrap sår
+        # last_updated, så slut <= start räknas som okänd start
+        kwh = None
+        if t.kwh0 is not None and power_key in _kwh_total:
+            kwh = round(_kwh_total[power_key] - t.kwh0, 3)
+        done = Cycle(appliance, t.program or "?", t.start, ts, t.est_min, kwh)
+        _record(done)
+    t.running = running
+    if not running:
+        t.start = t.program = t.est_min = t.kwh0 = None
+    _publish(appliance)
+    return done
+
+
+def _on_power(rec: Any) -> None:
+    """Löpande kWh per power_key ur dygnsvärdena. Kallas med _lock hållet."""
+    for key, kwh in rec.kwh.items():
+        prev = _kwh_seen.get(key)
+        if prev is None:
+            delta = 0.0
+        elif kwh >= prev:
+            delta = kwh - prev
+        else:
+            delta = kwh                  # nollställt vid midnatt
+        _kwh_total[key] = _kwh_total.get(key, 0.0) + delta
+        _kwh_seen[key] = kwh
+
+
+def _append(c: Cycle) -> None:
+    try:
+        os.makedirs(os.path.dirname(CYCLES_PATH) or ".", exist_ok=True)
+        with open(CYCLES_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(c), separators=(",", ":"), ensure_ascii=False) + "\n")
+    except Exception as e:
+        _LOGGER.warning("kunde inte spara cykel i %s: %s", CYCLES_PATH, e)
+
+
+def _load() -> None:
+    """Bygg upp statistiken ur loggen; skriv om den om den blivit för lång."""
+    try:
+        with open(CYCLES_PATH, encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        _LOGGER.warning("kunde inte läsa %s: %s", CYCLES_PATH, e)
+        return
+    valid: List[Tuple[Cycle, str]] = []
+    for line in lines:
+        try:
+            c = Cycle(**json.loads(line))
+        except (ValueError, TypeError):
+            continue
+        if c.appliance in APPLIANCES and c.end > c.start:
+            valid.append((c, line if line.endswith("\n") else line + "\n"))
+    keep = [line for _c, line in valid[-CYCLES_MAX:]]
+    with _lock:
+        for c, _line in valid[-CYCLES_MAX:]:
+            _record(c)
+        for name in APPLIANCES:
+            _publish(name)
+    if len(keep) < len(lines):
+        try:
+            tmp = CYCLES_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(keep)
+            os.replace(tmp, CYCLES_PATH)
+        except Exception as e:
+            _LOGGER.warning("kunde inte komprimera %s: %s", CYCLES_PATH, e)
+
+
+def _on_update(section: str, rec: Any) -> None:
+    if section == "device_power":
+        with _lock:
+            _on_power(rec)
+        return
+    if section not in APPLIANCES:
+        return
+    with _lock:
+        done = _on_appliance(section, rec)
+    if done is not None:
+        _LOGGER.info("%s klar: %s, %.0f min", section, done.program, done.duration_s / 60)
+        _append(done)
+
+
+_load()
+mqtt_subscriber.add_listener(_on_update, replay=True)
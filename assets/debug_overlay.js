@@ -0,0 +1,50 @@
+// Debug-overlay med callback-statistik (callback_stats.py, DASH_INSTRUMENT=1).
+// Visas bara när sidan öppnas med ?debug=1; pollar /debug/callbacks var 5:e s.
+(function () {
+  if (!/[?&]debug=1\b/.test(window.location.search)) return;
+
+  var box = document.createElement('div');
+  box.className = 'debug-overlay';
+  box.textContent = 'Väntar på /debug/callbacks …';
+  box.addEventListener('click', function () { box.classList.toggle('collapsed'); });
+
+  function fmt(v, d) { return (typeof v === 'number') ? v.toFixed(d) : '–'; }
+
+  function render(data) {
+    var rows = Object.keys(data.callbacks).map(function (name) {
+      return [name, data.callbacks[name]];
+    }).filter(function (r) { return r[1].window; });
+    rows.sort(function (a, b) { return b[1].total_wall_s - a[1].total_wall_s; });
+
+    var html = '<table><tr><th>callback</th><th>n</th><th>p50</th><th>p95</th>' +
+               '<th>cpu p50</th><th>snap</th><th>kB</th><th>no_upd</th></tr>';
+    rows.forEach(function (r) {
+      var s = r[1];
+      html += '<tr><td>' + r[0] + '</td><td>' + s.calls + '</td>' +
+              '<td>' + fmt(s.wall_ms.p50, 1) + '</td><td>' + fmt(s.wall_ms.p95, 1) + '</td>' +
+              '<td>' + fmt(s.cpu_ms.p50, 1) + '</td>' +
+              '<td>' + fmt(s.snapshot_share * 100, 0) + '%</td>' +
+              '<td>' + (s.bytes ? fmt(s.bytes.mean / 1024, 1) : '–') + '</td>' +
+              '<td>' + fmt(s.no_update_ratio * 100, 0) + '%</td></tr>';
+    });
+    box.innerHTML = html + '</table>';
+  }
+
+  function poll() {
+    fetch('/debug/callbacks', { cache: 'no-store' })
+      .then(function (r) {
+        if (!r.ok) throw new Error('HTTP ' + r.status);
+        return r.json();
+      })
+      .then(function (data) { render(data); setTimeout(poll, 5000); })
+      .catch(function (e) { box.textContent = 'debug: ' + e.message + ' (DASH_INSTRUMENT=1?)'; });
+  }
+
+  function setup() {
+    document.body.appendChild(box);
+    poll();
+  }
+
+  if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', setup);
+  else setup();
+})();
@@ -0,0 +1,52 @@
+// Klientsidiga figurer (CLIENT_FIGURES=1, se client_figures.py).
+// Servern skickar bara dataarrayer; här fylls de i skeletten som kom en gång
+// med layouten. Skeletten klonas vid varje anrop eftersom Plotly skriver i
+// figuren (t.ex. autorange) och Store-data inte får ändras. Mallen är
+// gemensam för alla figurer och sätts tillbaka i layouten.
+(function () {
+  function figure(sk, kind, name) {
+    var fig = JSON.parse(JSON.stringify(sk[kind][name]));
+    fig.layout.template = sk.template;
+    return fig;
+  }
+
+  function noUpdate() { return window.dash_clientside.no_update; }
+
+  window.dash_clientside = window.dash_clientside || {};
+  window.dash_clientside.figures = {
+    // d: {x, y, c, now} eller {} utan prognos
+    tibber: function (d, sk) {
+      if (!d || !sk || !sk.tibber) { return noUpdate(); }
+      if (!d.x) { return figure(sk, 'tibber', 'empty'); }
+      var fig = figure(sk, 'tibber', 'figure');
+      fig.data.forEach(function (t) { t.x = d.x; t.y = d.y; });
+      fig.data[1].marker.color = d.c;
+      var shape = fig.layout.shapes[0];
+      shape.x0 = shape.x1 = d.now;
+      fig.layout.annotations[0].x = d.now;
+      return fig;
+    },
+
+    // d: {names, vals, colors, prev, prev_label} eller {} utan data
+    energy: function (d, sk) {
+      if (!d || !sk || !sk.energy) { return noUpdate(); }
+      if (!d.names) { return figure(sk, 'energy', 'empty'); }
+      var fig = figure(sk, 'energy', 'figure');
+      var prev = fig.data[0], cur = fig.data[1];
+      if (d.prev) {
+        prev.x = d.prev;
+        prev.y = d.names;
+        prev.text = d.prev.map(function (v) { return v === null ? '' : v.toFixed(1); });
+        prev.hovertemplate = '%{y} (' + d.prev_label + '): %{x:.1f} kWh<extra></extra>';
+        fig.data = [prev, cur];
+      } else {
+        fig.data = [cur];
+      }
+      cur.x = d.vals;
+      cur.y = d.names;
+      cur.marker.color = d.colors;
+      cur.text = d.vals.map(function (v) { return '<b>' + v.toFixed(1) + '</b>'; });
+      return fig;
+    }
+  };
+})();
@@ -9,9 +9,16 @@
 
     function screenCount() { return pager.querySelectorAll('.screen').length; }
 
+    var reported = 0;   // view-screen startar på 0 i layouten
+
     function updateDots() {
       var i = Math.round(pager.scrollLeft / pager.clientWidth);
       dots.forEach(function (d, idx) { d.classList.toggle('active', idx === i); });
+      // Rapportera aktiv skärm till Dash (view_gate.py) så dolda widgets pausas
+      if (i !== reported && window.dash_clientside && window.dash_clientside.set_props) {
+        reported = i;
+        window.dash_clientside.set_props('view-screen', { data: i });
+      }
     }
 
     function go(i) {
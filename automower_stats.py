@@ -0,0 +1,197 @@
+# automower_stats.py
+# -------------------------------------------------------------------------
+# Sessioner och historik för robotgräsklipparen, uppdaterat vid ingest.
+#
+# Varje automower-post (mqtt_subscriber-lyssnare) jämförs med föregående:
+#   sessioner  "mowing" och "charging" öppnas och stängs när activity
+#              byter; en stängd session (start, slut, batteri före/efter)
+#              läggs i en ringbuffert per sort (MOWER_SESSIONS st). Varje
+#              ring håller en löpande summa av %/h, så medel för urladdning
+#              och laddning är O(1) även när gamla sessioner faller ur.
+#   minuter    tiden mellan två poster där klipparen klipper läggs på
+#              dagens summa (delas vid midnatt), högst MOWER_MAX_GAP_S per
+#              lucka så att ett MQTT-avbrott inte ger timmar av påhittad
+#              klippning; MOWER_DAYS dygn sparas
+#   historik   batteri och progress, ett prov per MOWER_SAMPLE_S (första
+#              posten i varje intervall), MOWER_HISTORY_H timmar bakåt
+#
+# En session som redan pågick när kiosken startade har okänd start och
+# sparas inte. Allt publiceras som en frusen MowerStats med
+# sekvensnummer; modalen läser den som den är.
+#
+#   automower_stats.current() -> MowerStats
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Deque, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import mqtt_subscriber
+
+_TZ = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
+
+MOWER_SESSIONS: int    = int(os.getenv("MOWER_SESSIONS", "50"))
+MOWER_DAYS: int        = int(os.getenv("MOWER_DAYS", "14"))
+MOWER_SAMPLE_S: int    = int(os.getenv("MOWER_SAMPLE_S", "300"))
+MOWER_HISTORY_H: float = float(os.getenv("MOWER_HISTORY_H", "24"))
+MOWER_MAX_GAP_S: float = float(os.getenv("MOWER_MAX_GAP_S", str(3 * MOWER_SAMPLE_S)))
+MIN_SESSION_S: float   = 600.0     # kortare sessioner ger för brusig %/h
+
+# activity -> sessionssort
+KINDS = {"mowing": "mowing", "charging": "charging"}
+
+
+@dataclass(frozen=True, slots=True)
+class Session:
+    kind: str
+    start: float
+    end: float
+    battery_start: Optional[int]
+    battery_end: Optional[int]
+    progress: Optional[int]
+
+    @property
+    def duration_s(self) -> float:
+        return self.end - self.start
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Batteriändring i %/h (negativ vid klippning), None om okänd."""
+        if self.battery_start is None or self.battery_end is None or self.duration_s < MIN_SESSION_S:
+            return None
+        return (self.battery_end - self.battery_start) * 3600.0 / self.duration_s
+
+
+class SessionRing:
+    """Senaste `size` sessionerna och en löpande summa av deras %/h."""
+    __slots__ = ("items", "_sum", "_n")
+
+    def __init__(self, size: int) -> None:
+        self.items: Deque[Session] = deque(maxlen=size)
+        self._sum = 0.0
+        self._n = 0
+
+    def push(self, s: Session) -> None:
+        if len(self.items) == self.items.maxlen:
+            old = self.items[0].rate
+            if old is not None:
+                self._sum -= old
+                self._n -= 1
+        self.items.append(s)
+        r = s.rate
+        if r is not None:
+            self._sum += r
+            self._n += 1
+
+    @property
+    def mean_rate(self) -> Optional[float]:
+        return self._sum / self._n if self._n else None
+
+    @property
+    def last(self) -> Optional[Session]:
+        return self.items[-1] if self.items else None
+
+
+@dataclass(frozen=True, slots=True)
+class MowerStats:
+    seq: int = 0
+    activity: Optional[str] = None
+    since: Optional[float] = None              # start för pågående session
+    days: Tuple[Tuple[str, float], ...] = ()   # (YYYY-MM-DD, klippminuter), äldst först
+    discharge_pct_h: Optional[float] = None    # medel över klippsessionerna (positiv)
+    charge_pct_h: Optional[float] = None
+    last_mow: Optional[Session] = None
+    last_charge: Optional[Session] = None
+    history: Tuple[Tuple[float, Optional[int], Optional[int]], ...] = ()   # (ts, batteri, progress)
+
+    def minutes(self, day: str) -> float:
+        """Klippminuter för dygnet (YYYY-MM-DD), 0 om inget klippts."""
+        for d, m in reversed(self.days):
+            if d == day:
+                return m
+            if d < day:
+                break
+        return 0.0
+
+
+# --- Tillstånd -------------------------------------------------------------
+_lock = threading.Lock()
+_rings = {kind: SessionRing(MOWER_SESSIONS) for kind in set(KINDS.values())}
+_days: Deque[List[Any]] = deque(maxlen=MOWER_DAYS)        # [YYYY-MM-DD, minuter]
+_history: Deque[Tuple[float, Optional[int], Optional[int]]] = deque(
+    maxlen=max(1, int(MOWER_HISTORY_H * 3600 // MOWER_SAMPLE_S)))
+_open: Optional[Tuple[str, Optional[float], Optional[int]]] = None   # (sort, start, batteri)
+_prev: Optional[Tuple[float, str]] = None                           # (ts, activity)
+_stats = MowerStats()
+
+
+def current() -> MowerStats:
+    return _stats
+
+
+def _add_minutes(t0: float, t1: float) -> None:
+    """Lägg klipptiden t0..t1 på respektive dygn. Kallas med _lock hållet."""
+    while t0 < t1:
+        d = datetime.fromtimestamp(t0, _TZ).date()
+        midnight = datetime.combine(d + timedelta(days=1), datetime.min.time(), _TZ).timestamp()
+        seg_end = min(t1, midnight)
+        key = d.isoformat()
+        if _days and _days[-1][0] == key:
+            _days[-1][1] += (seg_end - t0) / 60.0
+        elif not _days or _days[-1][0] < key:
+            _days.append([key, (seg_end - t0) / 60.0])
+        t0 = seg_end
+
+
+def _publish(activity: str, history_changed: bool) -> None:
+    """Kallas med _lock hållet."""
+    global _stats
+    mow, charge = _rings["mowing"], _rings["charging"]
+    discharge = mow.mean_rate
+    _stats = MowerStats(
+        _stats.seq + 1, activity,
+        _open[1] if _open else None,
+        tuple((d, m) for d, m in _days),
+        -discharge if discharge is not None else None,
+        charge.mean_rate,
+        mow.last, charge.last,
+        tuple(_history) if history_changed else _stats.history,
+    )
+
+
+def _on_update(section: str, rec: Any) -> None:
+    global _open, _prev
+    if section != "automower" or not rec.ts:
+        return
+    ts = float(rec.ts)
+    activity = (rec.activity or "unknown").lower()
+    with _lock:
+        if _prev is not None:
+            if ts <= _prev[0]:
+                return
+            if _prev[1] == "mowing":
+                _add_minutes(_prev[0], min(ts, _prev[0] + MOWER_MAX_GAP_S))
+        first = _prev is None
+        kind = KINDS.get(activity)
+        if _open is not None and _open[0] != kind:
+            k, start, bat = _open
+            if start is not None:
+                _rings[k].push(Session(k, start, ts, bat, rec.battery, rec.progress))
+            _open = None
+        if kind is not None and _open is None:
+            _open = (kind, None if first else ts, rec.battery)
+        _prev = (ts, activity)
+
+        sampled = not _history or ts // MOWER_SAMPLE_S > _history[-1][0] // MOWER_SAMPLE_S
+        if sampled:
+            _history.append((ts, rec.battery, rec.progress))
+        _publish(activity, sampled)
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
@@ -0,0 +1,201 @@
+# calendar_index.py
+# -------------------------------------------------------------------------
+# Datumindex för kalendern, byggt när payloaden kommer in.
+#
+# När ett kalenderflöde uppdateras (mqtt_subscriber-lyssnare) normaliseras
+# varje händelse en gång: datum, starttid HH:MM, titel och klassning
+# (födelsedag med namn/år, tömning tunna, vanlig). Händelserna grupperas
+# per datum och sorteras som i kalenderrutan (heldag sist), familj före
+# födelsedagar vid lika tid.
+#
+# Fönstret, de 7 dagarna från idag med färdiga radtexter (ålder räknas mot
+# innevarande år), härleds ur indexet vid varje uppdatering och exakt vid
+# lokal midnatt via scheduler. window() returnerar samma tuple tills något
+# av det händer, så kalenderrutan kan cacha sin rendering på identitet.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import mqtt_subscriber
+import scheduler
+
+_LOGGER = logging.getLogger("calendar")
+
+DAYS = 7
+
+_BDAY_RE = re.compile(r"^([\wÅÄÖåäö\-]+)[^,]*,\s*(\d{4})$")
+
+_DA_WD  = ["Man", "Tir", "Ons", "Tor", "Fre", "Lør", "Søn"]
+_DA_MON = ["Jan", "Feb", "Mar", "Apr", "Maj", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dec"]
+
+
+@dataclass(frozen=True, slots=True)
+class Entry:
+    """En normaliserad händelse. kind: "bday" (title = namn), "bin" eller "plain"."""
+    time: Optional[str]
+    title: str
+    kind: str
+    year: Optional[int] = None
+
+
+@dataclass(frozen=True, slots=True)
+class Line:
+    text: str
+    kind: str
+
+
+@dataclass(frozen=True, slots=True)
+class Day:
+    day: date
+    label: str
+    lines: Tuple[Line, ...]
+
+
+# --- Normalisering (en gång per händelse och payload) ---------------------
+def _start(ev: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """(datumsträng, datetime-sträng eller None) för olika start-format."""
+    s = ev.get("start")
+    if isinstance(s, dict):
+        if "date" in s:
+            return s.get("date"), None
+        dt = s.get("dateTime")
+        if isinstance(dt, str):
+            return dt[:10], dt
+    elif isinstance(s, str):
+        return (s[:10], s) if "T" in s else (s, None)
+    return None, None
+
+
+def _entry(ev: Dict[str, Any]) -> Optional[Tuple[date, Entry]]:
+    dstr, dtstr = _start(ev)
+    if not dstr:
+        return None
+    try:
+        d = date.fromisoformat(dstr[:10])
+    except (TypeError, ValueError):
+        return None
+    t = None
+    if dtstr:
+        try:
+            t = datetime.fromisoformat(dtstr).strftime("%H:%M")
+        except ValueError:
+            pass
+    title = (ev.get("summary") or "").strip()
+    m = _BDAY_RE.match(title)
+    if m:
+        return d, Entry(t, m.group(1), "bday", int(m.group(2)))
+    if "tömning tunna" in title.lower():
+        return d, Entry(t, title, "bin")
+    return d, Entry(t, title, "plain")
+
+
+def build(events: Iterable[Dict[str, Any]]) -> Dict[date, Tuple[Entry, ...]]:
+    """Datum -> händelser i payload-ordning."""
+    by_day: Dict[date, List[Entry]] = {}
+    for ev in events:
+        e = _entry(ev)
+        if e is not None:
+            by_day.setdefault(e[0], []).append(e[1])
+    return {d: tuple(es) for d, es in by_day.items()}
+
+
+def _sort_key(e: Entry) -> Tuple[bool, str]:
+    return e.time is None, e.time or ""
+
+
+def merge(index: Dict[date, Tuple[Entry, ...]], days: Iterable[date],
+          fam: Dict[date, Tuple[Entry, ...]],
+          bday: Dict[date, Tuple[Entry, ...]]) -> Dict[date, Tuple[Entry, ...]]:
+    """Ny kopia av index där `days` slagits ihop på nytt, sorterat (stabilt:
+    familj före födelsedagar). Bara dagar som något flöde rört behöver göras om."""
+    out = dict(index)
+    for d in days:
+        es = fam.get(d, ()) + bday.get(d, ())
+        if es:
+            out[d] = tuple(sorted(es, key=_sort_key))
+        else:
+            out.pop(d, None)
+    return out
+
+
+# --- Fönster ---------------------------------------------------------------
+def _label(d: date) -> str:
+    return f"{_DA_WD[d.weekday()]} {d.day:02d}/{_DA_MON[d.month-1]}"
+
+
+def _line(e: Entry, year: int) -> Line:
+    if e.kind == "bday":
+        return Line(f"{e.title} – {year - e.year} år!", "bday")
+    return Line(f"{e.time} - {e.title}" if e.time else e.title, e.kind)
+
+
+def derive(index: Dict[date, Tuple[Entry, ...]], today: date) -> Tuple[Day, ...]:
+    return tuple(Day(d, _label(d), tuple(_line(e, today.year) for e in index.get(d, ())))
+                 for d in (today + timedelta(days=i) for i in range(DAYS)))
+
+
+_lock = threading.Lock()
+_feeds: Dict[str, Dict[date, Tuple[Entry, ...]]] = {"familie": {}, "fodelsedagar": {}}
+_feed_ts: Dict[str, int] = {}
+_index: Dict[date, Tuple[Entry, ...]] = {}
+_window: Tuple[Day, ...] = ()
+_window_day: Optional[date] = None
+
+
+def _rederive(today: date) -> None:
+    """Kallas med _lock hållet."""
+    global _window, _window_day
+    _window = derive(_index, today)
+    _window_day = today
+
+
+def window() -> Tuple[Day, ...]:
+    """Dagens 7-dagarsfönster; samma objekt tills data eller datum ändras."""
+    today = date.today()
+    if _window_day != today:                 # midnattsjobbet har inte hunnit köra
+        with _lock:
+            if _window_day != today:
+                _rederive(today)
+    return _window
+
+
+def _on_midnight() -> None:
+    with _lock:
+        _rederive(date.today())
+    _arm_midnight()
+
+
+def _arm_midnight() -> None:
+    tomorrow = date.today() + timedelta(days=1)
+    scheduler.call_at(datetime.combine(tomorrow, dtime()).timestamp(), _on_midnight)
+
+
+def _on_update(section: str, rec: Any) -> None:
+    if not section.startswith("calendar."):
+        return
+    feed = section.partition(".")[2]
+    events = rec.events_next7d if feed == "familie" else rec.events_next370d
+    idx = build(events or ())
+    global _index
+    with _lock:
+        ts = rec.ts
+        if ts is not None and ts < _feed_ts.get(feed, ts):
+            return                            # äldre än det som redan indexerats
+        if ts is not None:
+            _feed_ts[feed] = ts
+        touched = _feeds[feed].keys() | idx.keys()
+        _feeds[feed] = idx
+        _index = merge(_index, touched, _feeds["familie"], _feeds["fodelsedagar"])
+        _rederive(date.today())
+    _LOGGER.debug("%s: %d dagar indexerade", feed, len(idx))
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
+_arm_midnight()
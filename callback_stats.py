@@ -0,0 +1,171 @@
+# callback_stats.py
+# -------------------------------------------------------------------------
+# Instrumentering av Dash-callbacks (DASH_INSTRUMENT=1).
+#
+# instrument(app) anropas direkt efter Dash(...) och innan callbacks
+# registreras. Den lindar app.callback så att varje callback mäter:
+#   wall      väggklocka i callbacken (ms)
+#   cpu       trådens CPU-tid (ms), skiljer väntan på HA från beräkning
+#   snapshot  tid i get_snapshot() under anropet (andel av wall)
+#   bytes     storlek på serialiserat svar (Flask after_request)
+#   no_update andel outputs som var no_update (PreventUpdate räknas som alla)
+#
+# Varje callback har ett rullande fönster med de senaste WINDOW anropen;
+# sammanställningen (p50/p95/p99) görs först när någon läser den:
+#   GET /debug/callbacks            JSON
+#   kiosk-overlay                   assets/debug_overlay.js, öppna med ?debug=1
+#
+# Med METRICS=1 lindas callbacks även utan DASH_INSTRUMENT, men då går bara
+# väggtiden vidare till familydash_callback_seconds i /metrics. Med båda
+# avstängda lindas ingenting, så kostnaden är noll.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from dash import no_update
+
+import metrics
+import mqtt_subscriber
+
+_LOGGER = logging.getLogger("instrument")
+
+ENABLED: bool = os.getenv("DASH_INSTRUMENT", "0") == "1"
+WINDOW: int   = int(os.getenv("DASH_INSTRUMENT_WINDOW", "500"))
+
+# (wall_ms, cpu_ms, snapshot_ms, bytes|None, no_update-andel)
+Sample = Tuple[float, float, float, Optional[int], float]
+
+_samples: Dict[str, Deque[Sample]] = {}
+_calls: Dict[str, int] = {}
+_local = threading.local()
+_started = time.time()
+
+
+def _add_snapshot_time(dt: float) -> None:
+    _local.snap = getattr(_local, "snap", 0.0) + dt
+
+
+def _no_update_share(result: Any) -> float:
+    outs = result if isinstance(result, (list, tuple)) else (result,)
+    if not outs:
+        return 0.0
+    return sum(1 for o in outs if o is no_update) / len(outs)
+
+
+def _record(name: str, sample: Sample) -> None:
+    if ENABLED:
+        # deque.append och dict-uppdateringar är atomära under GIL:en
+        _samples[name].append(sample)
+        _calls[name] += 1
+    if metrics.ENABLED:
+        metrics.CALLBACK_SECONDS.observe(sample[0] / 1000, name)
+
+
+def _wrap(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    _samples.setdefault(name, deque(maxlen=WINDOW))
+    _calls.setdefault(name, 0)
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        _local.snap = 0.0
+        c0 = time.thread_time()
+        t0 = time.perf_counter()
+        share = 1.0                                  # PreventUpdate/undantag: inget uppdateras
+        try:
+            result = fn(*args, **kwargs)
+            share = _no_update_share(result)
+            return result
+        finally:
+            wall = (time.perf_counter() - t0) * 1000
+            cpu = (time.thread_time() - c0) * 1000
+            sample = (wall, cpu, _local.snap * 1000, None, share)
+            if _in_request():
+                _local.pending = (name, sample)     # bytes fylls i av after_request
+            else:
+                _record(name, sample)
+
+    return wrapper
+
+
+def _in_request() -> bool:
+    from flask import has_request_context
+    return has_request_context()
+
+
+def _after_request(resp: Any) -> Any:
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        _local.pending = None
+        name, (wall, cpu, snap, _b, share) = pending
+        size = None if resp.is_streamed else resp.calculate_content_length()
+        _record(name, (wall, cpu, snap, size, share))
+    return resp
+
+
+def _pct(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))]
+
+
+def summary() -> Dict[str, Any]:
+    """Sammanställning per callback över det rullande fönstret."""
+    out: Dict[str, Any] = {}
+    for name, dq in list(_samples.items()):
+        rows = list(dq)
+        if not rows:
+            out[name] = {"calls": _calls[name], "window": 0}
+            continue
+        wall = sorted(r[0] for r in rows)
+        cpu = sorted(r[1] for r in rows)
+        sizes = [r[3] for r in rows if r[3] is not None]
+        wall_sum = sum(wall)
+        out[name] = {
+            "calls": _calls[name],
+            "window": len(rows),
+            "wall_ms": {"p50": _pct(wall, 50), "p95": _pct(wall, 95), "p99": _pct(wall, 99), "max": wall[-1]},
+            "cpu_ms": {"p50": _pct(cpu, 50), "p95": _pct(cpu, 95), "max": cpu[-1]},
+            "snapshot_share": sum(r[2] for r in rows) / wall_sum if wall_sum else 0.0,
+            "bytes": {"mean": sum(sizes) / len(sizes), "max": max(sizes)} if sizes else None,
+            "no_update_ratio": sum(r[4] for r in rows) / len(rows),
+            "total_wall_s": wall_sum / 1000,
+        }
+    return out
+
+
+def instrument(app: Any) -> None:
+    """Linda app.callback och registrera /debug/callbacks. No-op om både detta och metrics är av."""
+    if not (ENABLED or metrics.ENABLED) or getattr(app, "_callback_stats", False):
+        return
+    app._callback_stats = True
+    orig_callback = app.callback
+
+    def callback(*args: Any, **kwargs: Any) -> Callable[[Callable[..., Any]], Any]:
+        decorator = orig_callback(*args, **kwargs)
+
+        def register(fn: Callable[..., Any]) -> Any:
+            return decorator(_wrap(fn.__name__, fn))
+        return register
+
+    app.callback = callback
+    server = app.server
+    server.after_request(_after_request)
+    if not ENABLED:
+        return
+    mqtt_subscriber.set_snapshot_timer(_add_snapshot_time)
+
+    @server.route("/debug/callbacks")
+    def _debug_callbacks() -> Any:
+        from flask import jsonify
+        return jsonify({"uptime_s": int(time.time() - _started), "window": WINDOW,
+                        "callbacks": summary()})
+
+    _LOGGER.info("callback-instrumentering på (fönster %d anrop), se /debug/callbacks", WINDOW)
@@ -0,0 +1,65 @@
+# client_figures.py
+# -------------------------------------------------------------------------
+# Figurer som byggs i webbläsaren (CLIENT_FIGURES=1).
+#
+# Normalt skickar callbacks för pris- och energigrafen en hel Plotly-figur
+# vid varje uppdatering: layout, plotly_dark-mallen och all stil, fast bara
+# siffrorna ändras. I klientläget svarar server-callbacken i stället med
+# kompakta dataarrayer till en Store "<graf>-data", och en klientsidig
+# callback (assets/figures.js) sätter ihop figuren ur ett skelett: figuren
+# utan data, byggd en gång i Python av samma kod som serverfiguren och
+# skickad en gång per sidladdning i Store "figure-skeletons". Mallen
+# (plotly_dark) är den största delen och skickas bara en gång, under
+# "template"; figures.js sätter tillbaka den i varje figur.
+#
+#   TIBBER_OUT = client_figures.output(app, "tibber-graph", "tibber", tibber_skeleton)
+#   ... layout: *client_figures.stores()
+#   @app.callback(TIBBER_OUT, ...)   # returnerar tibber_data() eller hel figur
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, List
+
+from dash import dcc
+from dash.dependencies import ClientsideFunction, Input, Output, State
+
+ENABLED = os.getenv("CLIENT_FIGURES", "0") == "1"
+
+SKELETON_STORE = "figure-skeletons"
+
+# namn i assets/figures.js -> funktion som bygger skelettet
+_SKELETONS: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_STORES: List[str] = []
+
+
+def output(app, graph_id: str, kind: str, skeleton: Callable[[], Dict[str, Any]]) -> Output:
+    """Output för grafens callback: dess data-Store i klientläget, annars figuren.
+
+    Anges före layouten (stores()). `kind` är funktionen i
+    window.dash_clientside.figures som bygger figuren ur data + skelett.
+    """
+    if not ENABLED:
+        return Output(graph_id, "figure")
+    store = f"{graph_id}-data"
+    _SKELETONS[kind] = skeleton
+    _STORES.append(store)
+    app.clientside_callback(ClientsideFunction("figures", kind), Output(graph_id, "figure"),
+                            Input(store, "data"), State(SKELETON_STORE, "data"))
+    return Output(store, "data")
+
+
+def stores() -> List[dcc.Store]:
+    """Skeletten plus en data-Store per graf; tom lista när läget är avstängt."""
+    if not ENABLED:
+        return []
+    skeletons: Dict[str, Any] = {}
+    for kind, fn in _SKELETONS.items():
+        figs = fn()
+        for fig in figs.values():
+            template = fig["layout"].pop("template", None)
+            if template is not None:
+                skeletons.setdefault("template", template)
+        skeletons[kind] = figs
+    return [dcc.Store(id=SKELETON_STORE, data=skeletons)] + [dcc.Store(id=s, data=None) for s in _STORES]
@@ -0,0 +1,23 @@
+# components/alert_banner.py
+# Aktiva larm överst på kiosken. Larmen utvärderas i alerts vid ingest;
+# här renderas listan bara när dess sekvensnummer ändrats.
+from datetime import datetime
+
+from dash import html, no_update
+
+import alerts
+
+
+def alert_banner_compute(tz, last_ts):
+    last_ts = (last_ts or {}).copy()
+    seq, active = alerts.current()
+    if last_ts.get("alerts") == seq:
+        return no_update, no_update, last_ts
+    last_ts["alerts"] = seq
+
+    children = [
+        html.Div([html.Span(datetime.fromtimestamp(a.since, tz).strftime("%H:%M"), className="alert-time"),
+                  a.text], className=f"alert-item {a.name}")
+        for a in active
+    ]
+    return children, "alert-banner" + (" show" if active else ""), last_ts
@@ -1,9 +1,9 @@
 # components/automower_box.py
 from dash import html, dcc, no_update
 from datetime import datetime, timezone
-import time
 
-_STALE_SECONDS = 15 * 60  # 15 minutes
+import staleness
+from sections import EMPTY, Automower
 
 SVG_STRING = r"""
 <svg class="appliance-svg automower-svg" viewBox="60 0 400 400" xmlns="http://www.w3.org/2000/svg" aria-hidden="true">
@@ -25,13 +25,13 @@ ACTIVITY_SV = {
 
 def automower_compute(snapshot: dict | None, tz, last_ts: dict | None):
     last_ts = (last_ts or {}).copy()
-    m = (snapshot or {}).get("automower") or {}
-    ts = m.get("ts")
+    m: Automower = (snapshot or EMPTY)["automower"]
+    ts = m.ts
 
     if not ts:
         return _placeholder_children(), "box appliance-card automower-card", last_ts
 
-    stale = (time.time() - ts) > _STALE_SECONDS
+    stale = staleness.is_stale("automower")
 
     if last_ts.get("automower") == ts and last_ts.get("automower_stale") == stale:
         return no_update, no_update, last_ts
@@ -47,16 +47,11 @@ def _placeholder_children():
         html.Div("Väntar på data …", className="time"),
     ]
 
-def _render(m: dict, tz, ts: int, stale: bool):
-    activity = (m.get("activity") or "").lower()
-    battery = m.get("battery")
+def _render(m: Automower, tz, ts: int, stale: bool):
+    activity = (m.activity or "").lower()
 
     activity_label = ACTIVITY_SV.get(activity, activity.capitalize() or "–")
-
-    try:
-        battery_str = f"{int(battery)}%"
-    except (TypeError, ValueError):
-        battery_str = "–"
+    battery_str = f"{m.battery}%" if m.battery is not None else "–"
 
     if activity == "docked":
         status_mod = "docked"
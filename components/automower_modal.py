@@ -0,0 +1,130 @@
+# components/automower_modal.py
+# Modal med klipparens sessioner: batteri/progress senaste dygnet som
+# sparkline (inline-SVG, som tilarnas ikoner) och nyckeltal. Allt räknas
+# vid ingest i automower_stats; här formateras bara det som redan finns.
+from datetime import datetime, timedelta, timezone
+
+from dash import dcc, html, no_update
+
+import automower_stats
+
+SPARK_W, SPARK_H = 360, 70
+WEEKDAYS_SV = ["må", "ti", "on", "to", "fr", "lö", "sö"]
+
+
+def create_automower_modal_layout() -> html.Div:
+    """Statisk modal-struktur. Innehållet fylls via callback."""
+    return html.Div(
+        id="automower-modal",
+        className="modal",
+        style={"display": "none"},
+        children=[
+            html.Div(
+                className="modal-content automower-modal-content",
+                children=[
+                    html.Div(
+                        className="modal-header",
+                        children=[
+                            html.Span("Gräsklippare", className="modal-title"),
+                            html.Button("×", id="close-automower-modal", className="modal-close-button"),
+                        ],
+                    ),
+                    html.Div(id="automower-stats", className="automower-stats"),
+                ],
+            ),
+        ],
+    )
+
+
+def automower_modal_compute(tz, last_key):
+    """(children|no_update, nyckel) – renderar bara när något synligt ändrats.
+
+    "Klippt idag", staplarna och sparklinens fönster beror på klockan, så
+    nyckeln har förutom sekvensnumret dagens datum och historikintervallet:
+    en tyst, dockad klippare visar ändå rätt dygn efter midnatt.
+    """
+    s = automower_stats.current()
+    now = datetime.now(tz)
+    key = f"{s.seq}/{now.date().isoformat()}/{int(now.timestamp() // automower_stats.MOWER_SAMPLE_S)}"
+    if key == last_key:
+        return no_update, last_key
+    return _render(s, now, tz), key
+
+
+def sparkline(history, t_end: float, span_s: float) -> str:
+    """SVG med batteri (linje) och progress (streckad), 0–100 % över span_s sekunder."""
+    t0 = t_end - span_s
+
+    def points(idx):
+        pts = []
+        for row in history:
+            v = row[idx]
+            if v is None or row[0] < t0:
+                continue
+            x = (row[0] - t0) / span_s * SPARK_W
+            y = SPARK_H - max(0, min(100, v)) / 100.0 * SPARK_H
+            pts.append(f"{x:.1f},{y:.1f}")
+        return " ".join(pts)
+
+    return (
+        f'<svg class="mower-spark" viewBox="0 0 {SPARK_W} {SPARK_H}" preserveAspectRatio="none" '
+        f'xmlns="http://www.w3.org/2000/svg" aria-hidden="true">'
+        f'<polyline class="battery" fill="none" stroke="currentColor" stroke-width="2" points="{points(1)}"/>'
+        f'<polyline class="progress" fill="none" stroke-width="1.5" stroke-dasharray="4 3" points="{points(2)}"/>'
+        f"</svg>"
+    )
+
+
+# ---- Interna helpers -----------------------------------------------------
+def _render(s, now, tz):
+    today = now.date()
+    week = [(today - timedelta(days=i)).isoformat() for i in range(6, -1, -1)]
+    week_min = [s.minutes(d) for d in week]
+
+    rows = [
+        _row("Klippt idag", _fmt_min(week_min[-1])),
+        _row("Klippt 7 dagar", _fmt_min(sum(week_min))),
+        _row("Urladdning", f"{s.discharge_pct_h:.0f} %/h" if s.discharge_pct_h is not None else "–"),
+        _row("Laddning", f"{s.charge_pct_h:.0f} %/h" if s.charge_pct_h is not None else "–"),
+        _row("Senaste klippning", _fmt_session(s.last_mow, tz)),
+        _row("Senaste laddning", _fmt_session(s.last_charge, tz)),
+    ]
+    peak = max(week_min) or 1.0
+    bars = html.Div(
+        className="mower-days",
+        children=[
+            html.Div(className="mower-day", title=f"{d}: {_fmt_min(m)}", children=[
+                html.Div(className="bar", style={"height": f"{m / peak * 100:.0f}%"}),
+                html.Span(WEEKDAYS_SV[datetime.fromisoformat(d).weekday()]),
+            ])
+            for d, m in zip(week, week_min)
+        ],
+    )
+    return [
+        dcc.Markdown(sparkline(s.history, now.timestamp(), automower_stats.MOWER_HISTORY_H * 3600),
+                     dangerously_allow_html=True, className="mower-spark-wrap"),
+        html.Div("Batteri (linje) och progress (streckad), senaste dygnet", className="mower-spark-legend"),
+        html.Div(rows, className="mower-rows"),
+        bars,
+    ]
+
+
+def _row(label, value):
+    return html.Div([html.Span(label, className="label"), html.Span(value, className="value")],
+                    className="mower-row")
+
+
+def _fmt_min(m):
+    h, mm = divmod(int(round(m)), 60)
+    return f"{h} h {mm:02d} min" if h else f"{mm} min"
+
+
+def _fmt_session(sess, tz):
+    if sess is None:
+        return "–"
+    t0 = datetime.fromtimestamp(sess.start, tz=timezone.utc).astimezone(tz)
+    t1 = datetime.fromtimestamp(sess.end, tz=timezone.utc).astimezone(tz)
+    text = f"{t0.strftime('%d/%m %H:%M')}–{t1.strftime('%H:%M')}"
+    if sess.battery_start is not None and sess.battery_end is not None:
+        text += f", {sess.battery_start}→{sess.battery_end} %"
+    return text
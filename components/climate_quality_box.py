@@ -1,40 +1,86 @@
 # components/climate_quality_box.py
 from dash import html, no_update
 from datetime import datetime, timezone
-import time
 
-_STALE_SECONDS = 4 * 3600  # 4 hours
+import aggregators
+import staleness
+from sections import EMPTY, RoomClimate
+
+# Trendpil: (gräns för ↗/↘, gräns för ↑/↓) i enhet per timme
+TREND_STEPS = {"t": (0.15, 0.5), "rh": (1.0, 3.0), "eco2_ppm": (30.0, 100.0)}
+
+
+def trend_arrow(slope, steps):
+    small, big = steps
+    if slope >= big:
+        return "↑"
+    if slope >= small:
+        return "↗"
+    if slope <= -big:
+        return "↓"
+    if slope <= -small:
+        return "↘"
+    return "→"
+
+
+def _smoothed(aggs, attr, raw):
+    """(EMA-värde, trendpil) ur aggregaten; råvärdet utan pil innan första provet."""
+    agg = aggs.get(attr)
+    if agg is None:
+        return raw, ""
+    return agg.ema, " " + trend_arrow(agg.slope, TREND_STEPS[attr])
+
+
+def _agg_n(aggs):
+    """Antal prov i aggregaten (0 innan första), för de-dupe."""
+    return max((a.n for a in aggs.values()), default=0)
 
 
 def climate_quality_compute(snapshot, local_tz, last_ts):
     last_ts = (last_ts or {}).copy()
 
-    bht = (snapshot or {}).get("shelly_bht", {})
-    bht_ts = bht.get("ts")
+    bht: RoomClimate = (snapshot or EMPTY)["shelly_bht"]
+    bht_ts = bht.ts
 
     if not bht_ts:
         return html.Div("Väntar på data …", className="time"), "box climate-quality-card", last_ts
 
-    stale = (time.time() - bht_ts) > _STALE_SECONDS
+    stale = staleness.is_stale("climate")
+
+    # Aggregaten publiceras efter att snapshoten bytts, så en tick emellan
+    # ser ny ts men gammal EMA; antalet prov ingår därför i de-dupe-nyckeln.
+    aggs = aggregators.get("shelly_bht")
+    agg_n = _agg_n(aggs)
+    aq = aggregators.get("airquality_raw")
+    co2_n = _agg_n(aq)
 
-    if last_ts.get("bht") == bht_ts and last_ts.get("bht_stale") == stale:
+    if (last_ts.get("bht") == bht_ts and last_ts.get("bht_stale") == stale
+            and last_ts.get("bht_agg") == agg_n and last_ts.get("co2_agg") == co2_n):
         return no_update, no_update, last_ts
 
-    t = bht.get("t")
-    rh = bht.get("rh")
-    t_txt = f"{t:.1f} °C" if isinstance(t, (int, float)) else "– °C"
-    rh_txt = f"{rh:.0f} %"  if isinstance(rh, (int, float)) else "– %"
+    # Utjämnade värden och trend från ingest-vägen (aggregators.py)
+    t, t_arrow = _smoothed(aggs, "t", bht.t)
+    rh, rh_arrow = _smoothed(aggs, "rh", bht.rh)
+    t_txt = f"{t:.1f} °C{t_arrow}" if t is not None else "– °C"
+    rh_txt = f"{rh:.0f} %{rh_arrow}"  if rh is not None else "– %"
 
     ts_str = datetime.fromtimestamp(bht_ts, tz=timezone.utc).astimezone(local_tz).strftime("%Y-%m-%d, %H:%M")
     ts_class = "timestamp wx-ts-stale" if stale else "timestamp"
 
-    view = html.Div([
+    rows = [
         html.Div("Stue", className="subtitle"),
         html.Div([html.Span("🌡️ "), html.Span(t_txt)], className="value"),
         html.Div([html.Span("💧 "), html.Span(rh_txt)], className="value"),
-        html.Div(ts_str, className=ts_class),
-    ], className="climate-section")
+    ]
+    # eCO₂ från luftkvalitetssensorn, utjämnad som ovan (visas när den rapporterat)
+    if "eco2_ppm" in aq:
+        co2, co2_arrow = _smoothed(aq, "eco2_ppm", None)
+        rows.append(html.Div([html.Span("CO₂ "), html.Span(f"{co2:.0f} ppm{co2_arrow}")], className="value co2"))
+    rows.append(html.Div(ts_str, className=ts_class))
+    view = html.Div(rows, className="climate-section")
 
     last_ts["bht"] = bht_ts
     last_ts["bht_stale"] = stale
+    last_ts["bht_agg"] = agg_n
+    last_ts["co2_agg"] = co2_n
     return view, "box climate-quality-card", last_ts
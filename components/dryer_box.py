@@ -2,6 +2,10 @@
 from dash import html, dcc, no_update
 from datetime import datetime, timezone
 
+import appliance_cycles
+import price_planner
+from sections import EMPTY, Dryer
+
 # SVG får både appliance-svg (gemensam storlek/färg) och dryer-svg (unika regler)
 SVG_STRING = r"""
 <svg class="appliance-svg dryer-svg" viewBox="0 0 64 64" xmlns="http://www.w3.org/2000/svg" aria-hidden="true">
@@ -39,27 +43,32 @@ SVG_STRING = r"""
 
 def dryer_compute(snapshot: dict | None, tz, last_ts: dict | None):
     """
-    snapshot['dryer'] = {
-      'ts': <epoch>,
-      'time_left': <int|min>   # minuter kvar; >0 = aktiv
-    }
+    snapshot['dryer'] = Dryer(status, time_left, ts)   # time_left i minuter; >0 = aktiv
     Returnerar (children|no_update, className|no_update, updated_last_ts)
     """
     last_ts = (last_ts or {}).copy()
-    d = (snapshot or {}).get("dryer") or {}
-    ts = d.get("ts")
+    d: Dryer = (snapshot or EMPTY)["dryer"]
+    ts = d.ts
 
     # 1) Ingen data ännu → placeholder
     if not ts:
         return _placeholder_children(), "box appliance-card dryer-card", last_ts
 
-    # 2) De-dupe: samma ts som senast → inga DOM-uppdateringar
-    if last_ts.get("dryer") == ts:
+    # Billigaste start visas bara när torktumlaren står still
+    plan = None if (d.time_left or 0) > 0 else price_planner.tile_text("dryer", tz)
+
+    cycle = appliance_cycles.get("dryer")
+
+    # 2) De-dupe: samma ts, plan och cykelläge som senast → inga DOM-uppdateringar
+    if (last_ts.get("dryer") == ts and last_ts.get("dryer_plan") == plan
+            and last_ts.get("dryer_cycle") == cycle.seq):
         return no_update, no_update, last_ts
 
     # 3) Ny data → rendera och spara ts
-    children, klass = _render(d, tz)
+    children, klass = _render(d, tz, plan, cycle)
     last_ts["dryer"] = ts
+    last_ts["dryer_plan"] = plan
+    last_ts["dryer_cycle"] = cycle.seq
     return children, klass, last_ts
 
 # ---- Interna helpers ----------------------------------------------------
@@ -69,21 +78,19 @@ def _placeholder_children():
         html.Div("Venter på data …", className="time"),
     ]
 
-def _render(d: dict, tz):
-    minutes = d.get("time_left")
-    try:
-        minutes = int(minutes)
-    except (TypeError, ValueError):
-        minutes = 0
+def _render(d: Dryer, tz, plan=None, cycle=None):
+    minutes = d.time_left or 0
 
     running = minutes > 0
-    ts = d.get("ts")
+    ts = d.ts
 
     if running:
         children = [
             dcc.Markdown(SVG_STRING, dangerously_allow_html=True),
             html.Div(_fmt_hhmm(minutes), className="value"),
         ]
+        if cycle is not None and cycle.predicted_end:
+            children.append(html.Div(f"Klar ~{_fmt_clock(cycle.predicted_end, tz)}", className="cycle"))
         klass = "box appliance-card dryer-card active"
     else:
         ts_str = _fmt_dt(ts, tz) if ts else "–"
@@ -91,6 +98,10 @@ def _render(d: dict, tz):
             dcc.Markdown(SVG_STRING, dangerously_allow_html=True),
             html.Div(ts_str, className="time"),
         ]
+        if cycle is not None and cycle.last is not None:
+            children.append(html.Div(_last_run(cycle.last), className="cycle"))
+        if plan:
+            children.append(html.Div(plan, className="plan"))
         klass = "box appliance-card dryer-card"
 
     return children, klass
@@ -101,6 +112,17 @@ def _fmt_dt(ts, tz):
     except Exception:
         return "–"
 
+def _fmt_clock(ts, tz):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).astimezone(tz).strftime("%H:%M")
+
+def _last_run(c):
+    """Senaste cykeln: längd och energi, t.ex. "Sist 1:42 · 0.9 kWh"."""
+    h, m = divmod(int(c.duration_s // 60), 60)
+    text = f"Sist {h}:{m:02d}"
+    if c.kwh is not None:
+        text += f" · {c.kwh:.1f} kWh"
+    return text
+
 def _fmt_hhmm(total_min):
     try:
         m = int(total_min)
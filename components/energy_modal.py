@@ -2,9 +2,11 @@
 """
 Energy devices modal.
 
-Visar en horisontell stapelgraf över dagens (sedan midnatt) energiförbrukning
-per enhet — samma data som HA:s energidashboard ("Individual devices total usage").
-Datan hämtas via ha_client.get_energy_today() (HA-statistik över websocket).
+Visar en horisontell stapelgraf över energiförbrukning per enhet — samma data
+som HA:s energidashboard ("Individual devices total usage") — för idag, senaste
+7 eller 30 dagarna, med föregående period som jämförelsestaplar.
+Dagens värden hämtas via ha_client.get_energy_today() (HA-statistik över
+websocket); avslutade dygn läses ur energy_history-cachen.
 """
 
 from dash import html, dcc
@@ -12,21 +14,40 @@ import plotly.graph_objects as go
 
 
 # Enhet -> en eller flera HA statistic_ids (summeras) + färg.
+# "power_key" finns för enheter som publicerar momentan effekt på
+# home/energy/<power_key>/power (används i live-läget, ENERGY_LIVE=1).
 # Ordningen spelar ingen roll; grafen sorteras efter förbrukning.
 DEVICES = [
     {"name": "VVB",           "ids": ["sensor.vvb_total_energy_fixed"],                "color": "#8d6e63"},
-    {"name": "Gräsklippare",  "ids": ["sensor.shellyoutdoorsg3_e4b063fd63f4_energy"],  "color": "#5c6bc0"},
-    {"name": "Luftvärmepump", "ids": ["sensor.daikinap61890_energy_consumption"],      "color": "#ffb74d"},
+    {"name": "Gräsklippare",  "ids": ["sensor.shellyoutdoorsg3_e4b063fd63f4_energy"],  "color": "#5c6bc0",
+     "power_key": "grasklippare"},
+    {"name": "Luftvärmepump", "ids": ["sensor.daikinap61890_energy_consumption"],      "color": "#ffb74d",
+     "power_key": "luftvarmepump"},
     {"name": "Golvvärme",     "ids": ["sensor.office_energy_usage",
                                       "sensor.kitchen_energy_usage",
                                       "sensor.badrum_energy_usage",
                                       "sensor.barnrum_energy_usage"],                  "color": "#e57373"},
-    {"name": "Laddbox",       "ids": ["sensor.zag029615_laddbox_energy_calculated"],   "color": "#9575cd"},
-    {"name": "Tvättmaskin",   "ids": ["sensor.shellyplugsg3_indoorplug_energy"],       "color": "#f06292"},
+    {"name": "Laddbox",       "ids": ["sensor.zag029615_laddbox_energy_calculated"],   "color": "#9575cd",
+     "power_key": "laddbox"},
+    {"name": "Tvättmaskin",   "ids": ["sensor.shellyplugsg3_indoorplug_energy"],       "color": "#f06292",
+     "power_key": "tvattmaskin"},
     {"name": "Torktumlare",   "ids": ["sensor.torktumlare_energy"],                    "color": "#90a4ae"},
 ]
 
+# Live- och HA-värde får skilja så här mycket innan avvikelse flaggas.
+DRIFT_ABS_KWH = 0.2
+DRIFT_REL = 0.10
+
 UNTRACKED_COLOR = "#607d8b"
+PREVIOUS_COLOR = "rgba(255,255,255,0.22)"
+
+# Vyer i modalen: (värde, etikett, rubrik, etikett för föregående period)
+RANGE_OPTIONS = [
+    ("day",   "Idag",    "Förbrukning idag",        "igår"),
+    ("week",  "7 dagar", "Förbrukning 7 dagar",     "föreg. 7 dagar"),
+    ("month", "30 dagar", "Förbrukning 30 dagar",   "föreg. 30 dagar"),
+]
+_RANGE_INFO = {v: (title, prev) for v, _label, title, prev in RANGE_OPTIONS}
 
 
 def stat_ids() -> list[str]:
@@ -43,6 +64,38 @@ def _device_sum(data: dict[str, float]) -> float:
     return sum(_device_value(data, d) for d in DEVICES)
 
 
+def live_energy_data(base: dict[str, float] | None, live_kwh: dict[str, float]) -> dict[str, float]:
+    """Ersätt HA-värdena för enheter med live-effekt med den integrerade summan.
+
+    `base` är {statistic_id: kWh} från HA (för enheter utan live-data),
+    `live_kwh` är {power_key: kWh} från mqtt_subscriber.device_kwh_today().
+    """
+    data = dict(base or {})
+    for d in DEVICES:
+        key = d.get("power_key")
+        if key and key in live_kwh:
+            data[d["ids"][0]] = live_kwh[key]
+            for sid in d["ids"][1:]:
+                data[sid] = 0.0
+    return data
+
+
+def energy_drift(live_kwh: dict[str, float], ha_data: dict[str, float] | None) -> list[str]:
+    """Namn på enheter där live-integreringen avviker från HA:s statistik."""
+    if not ha_data:
+        return []
+    drifted = []
+    for d in DEVICES:
+        key = d.get("power_key")
+        if not key or key not in live_kwh:
+            continue
+        ha = _device_value(ha_data, d)
+        diff = abs(live_kwh[key] - ha)
+        if diff > max(DRIFT_ABS_KWH, DRIFT_REL * ha):
+            drifted.append(d["name"])
+    return drifted
+
+
 def create_energy_modal_layout() -> html.Div:
     """Statisk modal-struktur. Grafen fylls via callback."""
     return html.Div(
@@ -57,6 +110,13 @@ def create_energy_modal_layout() -> html.Div:
                         className="modal-header",
                         children=[
                             html.Span("Förbrukning idag", id="energy-modal-title", className="modal-title"),
+                            dcc.RadioItems(
+                                id="energy-range",
+                                options=[{"label": label, "value": v} for v, label, _t, _p in RANGE_OPTIONS],
+                                value="day",
+                                inline=True,
+                                className="energy-range",
+                            ),
                             html.Button("×", id="close-energy-modal", className="modal-close-button"),
                         ],
                     ),
@@ -82,9 +142,25 @@ def total_kwh(data: dict[str, float] | None, total_today: float | None) -> float
     return _device_sum(data or {})
 
 
-def make_energy_title(data: dict[str, float] | None, total_today: float | None) -> str:
-    """Rubrik med totalförbrukning, t.ex. 'Förbrukning idag · totalt 4.2 kWh'."""
-    return f"Förbrukning idag · totalt {total_kwh(data, total_today):.1f} kWh"
+def make_energy_title(data: dict[str, float] | None, total_today: float | None,
+                      previous: dict[str, float] | None = None, range_key: str = "day") -> str:
+    """Rubrik med totalförbrukning, t.ex. 'Förbrukning idag · totalt 4.2 kWh (igår 5.1)'.
+
+    För vecka/månad finns inget hushållstotal i historiken, så summan av
+    enheterna används.
+    """
+    title, prev_label = _RANGE_INFO.get(range_key, _RANGE_INFO["day"])
+    total = total_kwh(data, total_today) if range_key == "day" else _device_sum(data or {})
+    text = f"{title} · totalt {total:.1f} kWh"
+    if previous:
+        text += f" ({prev_label} {_device_sum(previous):.1f})"
+    return text
+
+
+def loading_title(range_key: str) -> str:
+    """Rubrik medan avslutade dygn hämtas, t.ex. 'Förbrukning 7 dagar · hämtar historik …'."""
+    title, _prev = _RANGE_INFO.get(range_key, _RANGE_INFO["day"])
+    return f"{title} · hämtar historik …"
 
 
 def _empty_figure(msg: str = "Väntar på data...") -> go.Figure:
@@ -99,30 +175,56 @@ def _empty_figure(msg: str = "Väntar på data...") -> go.Figure:
     return fig
 
 
-def make_energy_figure(data: dict[str, float] | None, total_today: float | None) -> go.Figure:
-    """Bygg horisontell stapelgraf från {statistic_id: kWh} + live-total."""
+def energy_data(data: dict[str, float] | None, total_today: float | None,
+                previous: dict[str, float] | None = None, range_key: str = "day") -> dict | None:
+    """Grafens rader som kompakta arrayer (sorterade stigande), None utan data."""
     if not data:
-        return _empty_figure()
+        return None
 
     rows = []
     for d in DEVICES:
-        rows.append((d["name"], _device_value(data, d), d["color"]))
+        prev = _device_value(previous, d) if previous else None
+        rows.append((d["name"], _device_value(data, d), d["color"], prev))
 
-    # Untracked = hela hushållet (live) − summan av spårade enheter.
-    untracked = max(0.0, total_kwh(data, total_today) - _device_sum(data))
-    rows.append(("Övrigt", untracked, UNTRACKED_COLOR))
+    # Untracked = hela hushållet (live) − summan av spårade enheter. Bara för
+    # idag; historiken har inget hushållstotal.
+    if range_key == "day":
+        untracked = max(0.0, total_kwh(data, total_today) - _device_sum(data))
+        rows.append(("Övrigt", untracked, UNTRACKED_COLOR, None))
 
     # Sortera stigande: Plotly ritar första y-värdet nederst, så störst hamnar överst.
     rows.sort(key=lambda r: r[1])
-    names = [r[0] for r in rows]
-    vals = [r[1] for r in rows]
-    colors = [r[2] for r in rows]
+    _title, prev_label = _RANGE_INFO.get(range_key, _RANGE_INFO["day"])
+    return {
+        "names": [f"<b>{r[0]}</b>" for r in rows],
+        "vals": [r[1] for r in rows],
+        "colors": [r[2] for r in rows],
+        "prev": [r[3] for r in rows] if previous else None,
+        "prev_label": prev_label,
+    }
 
-    fig = go.Figure(go.Bar(
+
+def _figure(d: dict) -> go.Figure:
+    names, vals = d["names"], d["vals"]
+    fig = go.Figure()
+    if d["prev"] is not None:
+        prev_vals = d["prev"]
+        fig.add_trace(go.Bar(
+            x=prev_vals,
+            y=names,
+            orientation="h",
+            marker_color=PREVIOUS_COLOR,
+            text=[f"{v:.1f}" if v is not None else "" for v in prev_vals],
+            textposition="outside",
+            textfont=dict(size=13, color="#b0bec5"),
+            cliponaxis=False,
+            hovertemplate=f"%{{y}} ({d['prev_label']}): %{{x:.1f}} kWh<extra></extra>",
+        ))
+    fig.add_trace(go.Bar(
         x=vals,
-        y=[f"<b>{n}</b>" for n in names],
+        y=names,
         orientation="h",
-        marker_color=colors,
+        marker_color=d["colors"],
         text=[f"<b>{v:.1f}</b>" for v in vals],
         textposition="outside",
         textfont=dict(size=17, color="#ffffff"),
@@ -130,6 +232,9 @@ def make_energy_figure(data: dict[str, float] | None, total_today: float | None)
         hovertemplate="%{y}: %{x:.1f} kWh<extra></extra>",
     ))
     fig.update_layout(
+        barmode="group",
+        bargap=0.25,
+        bargroupgap=0.05,
         template="plotly_dark",
         font=dict(size=15, color="#eceff1", weight="bold"),
         paper_bgcolor="rgba(0,0,0,0)",
@@ -145,3 +250,25 @@ def make_energy_figure(data: dict[str, float] | None, total_today: float | None)
     )
     fig.update_yaxes(showgrid=False, tickfont=dict(size=17, color="#ffffff"))
     return fig
+
+
+def make_energy_figure(data: dict[str, float] | None, total_today: float | None,
+                       previous: dict[str, float] | None = None, range_key: str = "day") -> go.Figure:
+    """Bygg horisontell stapelgraf från {statistic_id: kWh} + live-total.
+
+    Med `previous` ritas föregående periods förbrukning som en smalare, grå
+    stapel under varje enhet.
+    """
+    d = energy_data(data, total_today, previous, range_key)
+    if d is None:
+        return _empty_figure()
+    return _figure(d)
+
+
+def energy_skeleton() -> dict:
+    """Figuren utan data (för CLIENT_FIGURES): assets/figures.js fyller staplarna.
+
+    Första tracen är stilen för jämförelsestaplarna, andra för förbrukningen.
+    """
+    fig = _figure({"names": [], "vals": [], "colors": [], "prev": [], "prev_label": ""})
+    return {"figure": fig.to_plotly_json(), "empty": _empty_figure().to_plotly_json()}
@@ -2,6 +2,8 @@
 from dash import html, no_update
 from datetime import datetime, timezone
 
+from sections import EMPTY, AirQuality, RoomClimate
+
 # Din tyngre emoji-serie 💀
 EMOJI_BY_IAQ = {1: "😃", 2: "🙂", 3: "☹️", 4: "☠️", 5: "☠️☠️"}
 
@@ -11,11 +13,11 @@ def compute(snapshot, local_tz, last_ts):
     Returnerar (view, box_class, last_ts).
     """
     last_ts = last_ts or {}
-    bht = (snapshot or {}).get("shelly_bht", {})
-    voc = (snapshot or {}).get("airquality_raw", {})
+    bht: RoomClimate = (snapshot or EMPTY)["shelly_bht"]
+    voc: AirQuality = (snapshot or EMPTY)["airquality_raw"]
 
-    ts_bht = bht.get("ts")
-    ts_voc = voc.get("ts")
+    ts_bht = bht.ts
+    ts_voc = voc.ts
     ts_any = ts_voc or ts_bht
 
     if not ts_any:
@@ -29,15 +31,15 @@ def compute(snapshot, local_tz, last_ts):
         return no_update, no_update, last_ts
 
     # --- data ---
-    t  = bht.get("t")
-    rh = bht.get("rh")
-    tvoc = voc.get("tvoc_ppb")
-    aqi  = voc.get("aqi")
+    t  = bht.t
+    rh = bht.rh
+    tvoc = voc.tvoc_ppb
+    aqi  = voc.aqi
 
     # --- format ---
-    t_txt   = f"{t:.1f}°" if isinstance(t, (int, float)) else "–"
-    rh_txt  = f"{rh:.0f}%" if isinstance(rh, (int, float)) else "–"
-    voc_txt = f"{tvoc:.0f}" if isinstance(tvoc, (int, float)) else "–"
+    t_txt   = f"{t:.1f}°" if t is not None else "–"
+    rh_txt  = f"{rh:.0f}%" if rh is not None else "–"
+    voc_txt = f"{tvoc:.0f}" if tvoc is not None else "–"
     emoji   = EMOJI_BY_IAQ.get(aqi, "🙂")
 
     ts_str = datetime.fromtimestamp(ts_any, tz=timezone.utc).astimezone(local_tz).strftime("%H:%M")
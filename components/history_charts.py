@@ -0,0 +1,182 @@
+# components/history_charts.py
+# -------------------------------------------------------------------------
+# Skärm 2: historikdiagram för rumstemperatur, luftfuktighet, effekt och
+# luftkvalitet över 24 h eller 7 dagar (history.py).
+#
+# Hela figurer byggs bara när intervallet byts eller skärmen visas första
+# gången; varje serie nedsamplas då med LTTB till POINTS punkter, ungefär
+# diagrammets bredd i pixlar. Därefter skickas bara nya punkter via
+# dcc.Graph.extendData, i samma täthet (en punkt per hink = intervall /
+# POINTS), och maxPoints håller tracen vid samma längd. Markören i
+# Store "history-cursor" håller senast skickade (ts, värde) per serie.
+#
+# x skickas som lokal väggklocka i ms (Plotly visar epoch-ms som UTC) och
+# y som float32, så Plotly serialiserar dem som kompakta typade arrayer.
+# Layouten (med plotly_dark-mallen) valideras en gång per diagram och
+# intervall och återanvänds som dict; bara traces byggs per anrop.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import plotly.graph_objects as go
+from dash import dcc, html, no_update
+
+import history
+
+POINTS = min(2000, int(os.getenv("HISTORY_POINTS", "600")))   # ≈ diagrammets bredd i px
+_TZ = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
+
+# intervall -> (sekunder, etikett)
+RANGES: Dict[str, Tuple[int, str]] = {
+    "24h": (86400, "24 h"),
+    "7d":  (7 * 86400, "7 d"),
+}
+
+_ROOMS = [("stue", "Stue"), ("kontor", "Kontor"), ("vaskerum", "Vaskerum"), ("sovrum", "Soveværelse")]
+
+# diagram -> (rubrik, enhet, [(serie, namn, y-axel)])
+CHARTS: Dict[str, Tuple[str, str, List[Tuple[str, str, str]]]] = {
+    "hist-temp":  ("Temperatur", "°C", [(f"t.{k}", n, "y") for k, n in _ROOMS]),
+    "hist-rh":    ("Luftfuktighet", "%", [(f"rh.{k}", n, "y") for k, n in _ROOMS]),
+    "hist-power": ("Effekt", "W", [("power", "Effekt", "y")]),
+    "hist-air":   ("Luftkvalitet", "ppm", [("eco2", "eCO₂ (ppm)", "y"), ("tvoc", "TVOC (ppb)", "y2")]),
+}
+
+
+def _local_ms(ts: np.ndarray) -> np.ndarray:
+    """Epoch-sekunder -> lokal väggklocka i ms (float64) för Plotlys datumaxel."""
+    if not len(ts):
+        return ts.astype(np.float64)
+    first = datetime.fromtimestamp(float(ts[0]), _TZ).utcoffset().total_seconds()
+    last = datetime.fromtimestamp(float(ts[-1]), _TZ).utcoffset().total_seconds()
+    if first == last:
+        off: Any = first
+    else:                                     # sommartidsbyte i fönstret
+        off = np.array([datetime.fromtimestamp(float(t), _TZ).utcoffset().total_seconds() for t in ts])
+    return (ts + off) * 1000.0
+
+
+def create_history_layout():
+    graphs = [
+        dcc.Graph(id=cid, className="history-graph", config={"displayModeBar": False},
+                  figure=_empty_figure(title))
+        for cid, (title, _unit, _series) in CHARTS.items()
+    ]
+    return [
+        html.Div(
+            className="history-header",
+            children=[
+                html.Span("Historik", className="screen2-title"),
+                dcc.RadioItems(
+                    id="history-range",
+                    options=[{"label": label, "value": k} for k, (_s, label) in RANGES.items()],
+                    value="24h",
+                    inline=True,
+                    className="energy-range history-range",
+                ),
+            ],
+        ),
+        html.Div(graphs, className="history-grid"),
+        # Senast skickade punkt per serie (se extend)
+        dcc.Store(id="history-cursor", data=None),
+    ]
+
+
+@lru_cache(maxsize=None)
+def _layout(title: str, unit: str, range_key: str, secondary: bool) -> Dict[str, Any]:
+    """Färdig layout-dict; delas mellan anrop och får inte ändras."""
+    fig = go.Figure()
+    fig.update_layout(
+        template="plotly_dark",
+        title=dict(text=title, x=0.01, y=0.97, font=dict(size=14)),
+        autosize=True,
+        margin=dict(t=34, b=28, l=48, r=48 if secondary else 12),
+        legend=dict(orientation="h", x=1, xanchor="right", y=1.12, font=dict(size=10)),
+        uirevision=range_key,
+        paper_bgcolor="rgba(0,0,0,0)",
+    )
+    fig.update_xaxes(type="date", showgrid=False,
+                     tickformat="%H:%M" if range_key == "24h" else "%a %d")
+    fig.update_yaxes(title=unit, gridcolor="rgba(255,255,255,0.05)")
+    if secondary:
+        fig.update_layout(yaxis2=dict(overlaying="y", side="right", showgrid=False, title="ppb"))
+    return fig.layout.to_plotly_json()
+
+
+def figure(traces: List[go.Scattergl], layout: Dict[str, Any]) -> Dict[str, Any]:
+    # Figure utan layout är billig och kodar numpy-arrayerna som typade arrayer
+    return {"data": go.Figure(data=traces, layout={"template": {}}).to_plotly_json()["data"],
+            "layout": layout}
+
+
+def _empty_figure(title: str) -> Dict[str, Any]:
+    return {"data": [], "layout": _layout(f"{title} – väntar på data", "", "24h", False)}
+
+
+def make_history_figures(range_key: str, now: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Hela figurer för intervallet, plus markören för efterföljande extend."""
+    now = time.time() if now is None else now
+    span = RANGES.get(range_key, RANGES["24h"])[0]
+    last: Dict[str, Optional[List[float]]] = {}
+    figs = []
+    for _cid, (title, unit, series) in CHARTS.items():
+        traces = []
+        for name, label, axis in series:
+            x, y = history.points(name, now - span, POINTS)
+            last[name] = [float(x[-1]), float(y[-1])] if len(x) else None
+            traces.append(go.Scattergl(x=_local_ms(x), y=y, name=label, mode="lines",
+                                       yaxis=axis, line=dict(width=1.5)))
+        figs.append(figure(traces, _layout(title, unit, range_key, any(a == "y2" for _n, _l, a in series))))
+    return figs, {"range": range_key, "last": last}
+
+
+def _tail(name: str, prev: Optional[List[float]], span: int, now: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Nya punkter för serien sedan `prev`, i samma täthet som hela figuren."""
+    bucket = span / POINTS
+    if prev is None:
+        return history.points(name, now - span, POINTS)
+    ts0, v0 = prev
+    x, y = history.window(name, ts0)
+    if not len(x) or x[-1] - ts0 < bucket:
+        return x[:0], y[:0]                   # inte en hel hink än
+    k = int((x[-1] - ts0) // bucket)
+    if k == 1:
+        return x[-1:], y[-1:]
+    # förankra i senast skickade punkt så att LTTB väljer mot den
+    xs, ys = history.lttb(np.append(ts0, x), np.append(np.float32(v0), y), k + 1)
+    return xs[1:], ys[1:]
+
+
+def history_extend(range_key: str, cursor: Optional[Dict[str, Any]],
+                   now: Optional[float] = None) -> Tuple[List[Any], Any]:
+    """extendData per diagram (no_update om inget nytt) och uppdaterad markör."""
+    if not cursor or cursor.get("range") != range_key:
+        return [no_update] * len(CHARTS), no_update
+    now = time.time() if now is None else now
+    span = RANGES.get(range_key, RANGES["24h"])[0]
+    last = dict(cursor.get("last") or {})
+    out: List[Any] = []
+    changed = False
+    for _cid, (_title, _unit, series) in CHARTS.items():
+        xs: List[List[float]] = []
+        ys: List[List[float]] = []
+        for name, _label, _axis in series:
+            x, y = _tail(name, last.get(name), span, now)
+            if len(x):
+                last[name] = [float(x[-1]), float(y[-1])]
+            xs.append(_local_ms(x).tolist())
+            ys.append(np.round(y.astype(np.float64), 2).tolist())
+        if any(xs):
+            out.append([{"x": xs, "y": ys}, list(range(len(series))), POINTS])
+            changed = True
+        else:
+            out.append(no_update)
+    return out, ({"range": range_key, "last": last} if changed else no_update)
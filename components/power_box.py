@@ -1,30 +1,32 @@
 # components/power_box.py
-import time
 from dash import html, no_update
 from datetime import datetime, timezone
 
-_STALE_SECONDS = 600  # 10 minutes
+import staleness
+from sections import EMPTY, PulsePower
 
 def power_compute(snapshot, local_tz, last_ts):
     last_ts = (last_ts or {}).copy()
-    data = (snapshot or {}).get("pulse_power", {})
-    ts = data.get("ts")
+    data: PulsePower = (snapshot or EMPTY)["pulse_power"]
+    ts = data.ts
 
     if not ts:
         return html.Div("Väntar på data …", className="time"), "box appliance-card power-card", last_ts
 
-    power_raw    = data.get("power_raw")
-    power_smooth = data.get("power_smooth")
-    energy_day   = data.get("energy_day_kwh")
-    cost_day     = data.get("cost_day")
+    stale = staleness.is_stale("power")
+    if last_ts.get("power") == ts and last_ts.get("power_stale") == stale:
+        return no_update, no_update, last_ts
+
+    power_smooth = data.power_smooth
+    energy_day   = data.energy_day_kwh
+    cost_day     = data.cost_day
 
     ts_str = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone(local_tz).strftime("%Y-%m-%d, %H:%M")
-    stale = (time.time() - ts) > _STALE_SECONDS
     ts_style = {"color": "red", "fontWeight": "bold"} if stale else {}
 
-    smooth_txt = f"⚡ {power_smooth:.0f} W"        if isinstance(power_smooth, (int, float)) else "⚡ – W"
-    energy_txt = f"⚡ {energy_day:.2f} kWh"       if isinstance(energy_day,   (int, float)) else "⚡ – kWh"
-    cost_txt   = f"💸 {cost_day:.2f} kr"          if isinstance(cost_day,     (int, float)) else "💸 –"
+    smooth_txt = f"⚡ {power_smooth:.0f} W"        if power_smooth is not None else "⚡ – W"
+    energy_txt = f"⚡ {energy_day:.2f} kWh"       if energy_day   is not None else "⚡ – kWh"
+    cost_txt   = f"💸 {cost_day:.2f} kr"          if cost_day     is not None else "💸 –"
 
     view = html.Div([
         html.Ul([
@@ -35,4 +37,6 @@ def power_compute(snapshot, local_tz, last_ts):
         html.Div(ts_str, className="kv-ts", style=ts_style),
     ])
 
+    last_ts["power"] = ts
+    last_ts["power_stale"] = stale
     return view, "box appliance-card power-card", last_ts
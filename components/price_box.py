@@ -0,0 +1,42 @@
+# components/price_box.py
+# Aktuellt elpris ovanpå prisgrafen, med prislarm. Läget räknas i
+# price_alerts vid slotgränserna; här renderas det bara när det ändrats.
+from datetime import datetime
+
+from dash import html, no_update
+
+import price_alerts
+from sections import PRICE_LEVELS
+
+LEVEL_SV = {
+    "VERY_CHEAP":     "Mycket billigt",
+    "CHEAP":          "Billigt",
+    "NORMAL":         "Normalt",
+    "EXPENSIVE":      "Dyrt",
+    "VERY_EXPENSIVE": "Mycket dyrt",
+}
+
+
+def price_compute(tz, last_ts):
+    last_ts = (last_ts or {}).copy()
+    seq, cur = price_alerts.current()
+    if last_ts.get("price") == seq:
+        return no_update, no_update, last_ts
+    last_ts["price"] = seq
+
+    if cur is None:
+        return html.Div("– öre", className="price-now"), "price-tile", last_ts
+
+    level = LEVEL_SV.get(PRICE_LEVELS[cur.level], "") if cur.level >= 0 else ""
+    sub = [level] if level else []
+    if cur.next_ore is not None:
+        sub.append(f"{datetime.fromtimestamp(cur.end, tz).strftime('%H:%M')} {cur.next_ore:.0f} öre")
+
+    children = [
+        html.Div([f"{cur.ore:.0f}", html.Span(" öre/kWh", className="unit")],
+                 className="price-now", style={"color": cur.color}),
+        html.Div(" · ".join(sub), className="price-sub"),
+        *[html.Div(a.text, className=f"price-alert {a.name}") for a in cur.alerts],
+    ]
+    klass = "price-tile" + (" alert" if cur.alerts else "")
+    return children, klass, last_ts
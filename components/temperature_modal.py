@@ -8,9 +8,8 @@ Uses MQTT snapshot data to show real-time sensor readings.
 
 from dash import html
 from datetime import datetime, timezone
-import time
-
-_STALE_SECONDS = 3600  # 1 hour -> tidsstämpeln blir röd om mätningen är äldre
+import staleness
+from sections import EMPTY, RoomClimate
 
 
 # Room configuration
@@ -24,7 +23,7 @@ ROOMS = [
 
 def create_temperature_tile(room_name: str, icon: str, temperature: float | None,
                             humidity: float | None, ts: int | None = None,
-                            local_tz=None) -> html.Div:
+                            local_tz=None, stale: bool = False) -> html.Div:
     """
     Create a single temperature tile.
 
@@ -35,16 +34,17 @@ def create_temperature_tile(room_name: str, icon: str, temperature: float | None
         humidity: Relative humidity percentage (None if no data)
         ts: Epoch seconds when the reading was received (None if no data)
         local_tz: Timezone for formatting the timestamp
+        stale: Mark the timestamp as stale (see staleness.CHECKS)
 
     Returns:
         html.Div: Temperature tile component
     """
     # Format display values
-    temp_txt = f"{temperature:.1f}°C" if isinstance(temperature, (int, float)) else "–°C"
-    humidity_txt = f"{humidity:.0f}%" if isinstance(humidity, (int, float)) else "–%"
+    temp_txt = f"{temperature:.1f}°C" if temperature is not None else "–°C"
+    humidity_txt = f"{humidity:.0f}%" if humidity is not None else "–%"
 
     # Determine tile class based on data availability
-    has_data = isinstance(temperature, (int, float))
+    has_data = temperature is not None
     tile_class = "temp-tile" if has_data else "temp-tile no-data"
 
     children = [
@@ -59,7 +59,6 @@ def create_temperature_tile(room_name: str, icon: str, temperature: float | None
         when = datetime.fromtimestamp(ts, tz=timezone.utc)
         if local_tz is not None:
             when = when.astimezone(local_tz)
-        stale = (time.time() - ts) > _STALE_SECONDS
         ts_class = "timestamp wx-ts-stale" if stale else "timestamp"
         children.append(html.Div(when.strftime("%Y-%m-%d, %H:%M"), className=ts_class))
 
@@ -137,6 +136,12 @@ def create_modal_layout() -> html.Div:
     )
 
 
+def temperature_tiles_key(snapshot: dict | None) -> list:
+    """De-dupe-nyckel för tilesen: [ts, stale] per rum."""
+    return [[(snapshot or EMPTY)[room["key"]].ts, staleness.is_stale(f"room.{room['key']}")]
+            for room in ROOMS]
+
+
 def render_temperature_tiles(snapshot: dict | None, local_tz=None) -> list[html.Div]:
     """
     Render all temperature tiles from snapshot data.
@@ -151,17 +156,16 @@ def render_temperature_tiles(snapshot: dict | None, local_tz=None) -> list[html.
     tiles = []
 
     for room in ROOMS:
-        room_data = (snapshot or {}).get(room["key"], {})
-        temperature = room_data.get("t")
-        humidity = room_data.get("rh")
+        room_data: RoomClimate = (snapshot or EMPTY)[room["key"]]
 
         tile = create_temperature_tile(
             room_name=room["name"],
             icon=room["icon"],
-            temperature=temperature,
-            humidity=humidity,
-            ts=room_data.get("ts"),
+            temperature=room_data.t,
+            humidity=room_data.rh,
+            ts=room_data.ts,
             local_tz=local_tz,
+            stale=staleness.is_stale(f"room.{room['key']}"),
         )
         tiles.append(tile)
 
@@ -1,56 +1,67 @@
 # components/tibber_plot.py
-import pandas as pd
-import matplotlib.colors as mcolors
-from matplotlib import colormaps as cm
+# Prisgrafen läser Tibber-prognosens kolumner (sections.TibberForecast)
+# direkt; färgerna per slot räknas redan i parsern.
+import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
 import plotly.graph_objects as go
 
 from mqtt_subscriber import get_snapshot
 
+_TZ = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
 
-# === Gradient coloring ===
-def get_gradient_color(value, vmin=0, vmax=150, cmap="turbo"):
-    norm = mcolors.Normalize(vmin=vmin, vmax=vmax)
-    colormap = cm.get_cmap(cmap)  # ← detta är fixen
-    rgba = colormap(norm(value))
-    return mcolors.to_hex(rgba)
 
+def empty_tibber_figure():
+    fig = go.Figure()
+    fig.update_layout(
+        template="plotly_dark",
+        title="Elpris (øre/kWh) - Väntar på data...",
+        height=400
+    )
+    return fig
 
-# === Create Plotly figure ===
-def make_tibber_figure():
-    snapshot = get_snapshot()
-    prices = snapshot.get("tibber_forecast", {}).get("prices") or []
 
-    if not prices:
-        # Return empty figure if no data yet
-        fig = go.Figure()
-        fig.update_layout(
-            template="plotly_dark",
-            title="Elpris (øre/kWh) - Väntar på data...",
-            height=400
-        )
-        return fig
+# === Data ===
+def tibber_data():
+    """Kompakta arrayer för grafen (x, öre, färg, nu-timmen); None utan prognos."""
+    fc = get_snapshot()["tibber_forecast"]
 
-    df_all = pd.DataFrame(prices)
-    df_all["color"] = df_all["energy_ore"].apply(lambda x: get_gradient_color(x))
+    if not fc.starts:
+        return None
 
+    # Nu-linjen vid pågående slot (bisect); utanför prognosen vid hel timme
+    i = fc.index(time.time())
+    now = fc.starts_at[i] if i is not None else \
+        datetime.now(_TZ).replace(minute=0, second=0, microsecond=0).isoformat()
+    return {
+        "x": fc.starts_at,
+        "y": fc.ore,
+        "c": fc.colors,
+        "now": now,
+    }
+
+
+def _figure(d):
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df_all["startsAt"],
-        y=df_all["energy_ore"],
+        x=d["x"],
+        y=d["y"],
         mode="lines",
         line=dict(width=0, color="rgba(1, 209, 178, 0.2)"),
         fill="tozeroy"
     ))
     fig.add_trace(go.Scatter(
-        x=df_all["startsAt"],
-        y=df_all["energy_ore"],
+        x=d["x"],
+        y=d["y"],
         mode="lines+markers",
         line=dict(width=2, color="rgba(255,255,255,0.3)"),
-        marker=dict(color=df_all["color"], size=8),
+        marker=dict(color=d["c"], size=8),
         hovertemplate="%{x|%H:%M}, %{y:.0f} öre<extra></extra>"
     ))
 
-    current_time = pd.Timestamp.now(tz="Europe/Stockholm").floor("h")
+    current_time = d["now"]
     fig.add_shape(
         type="line",
         x0=current_time,
@@ -85,6 +96,21 @@ def make_tibber_figure():
 
     return fig
 
+
+# === Create Plotly figure ===
+def make_tibber_figure():
+    d = tibber_data()
+    if d is None:
+        # Return empty figure if no data yet
+        return empty_tibber_figure()
+    return _figure(d)
+
+
+def tibber_skeleton():
+    """Figuren utan data (för CLIENT_FIGURES): assets/figures.js fyller x/y/färg/nu."""
+    return {"figure": _figure({"x": [], "y": [], "c": [], "now": None}).to_plotly_json(),
+            "empty": empty_tibber_figure().to_plotly_json()}
+
 if __name__ == "__main__":
     fig = make_tibber_figure()
     fig.show()
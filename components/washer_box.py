@@ -2,6 +2,10 @@
 from dash import html, dcc, no_update
 from datetime import datetime, timezone
 
+import appliance_cycles
+import price_planner
+from sections import EMPTY, Washer
+
 # SVG: lägg till både appliance-svg (gemensam stil) och washer-svg (unika regler)
 SVG_STRING = r"""
 <svg class="appliance-svg washer-svg" viewBox="0 0 64 64" xmlns="http://www.w3.org/2000/svg" aria-hidden="true">
@@ -26,24 +30,32 @@ SVG_STRING = r"""
 # ---- Publikt API ---------------------------------------------------------
 def washer_compute(snapshot: dict | None, tz, last_ts: dict | None):
     """
-    snapshot['washer'] = {'ts': <epoch>, 'time_to_end_min': <int|float>}
+    snapshot['washer'] = Washer(status, time_to_end_min, ts)
     Returnerar (children|no_update, className|no_update, updated_last_ts)
     """
     last_ts = (last_ts or {}).copy()
-    w = (snapshot or {}).get("washer") or {}
-    ts = w.get("ts")
+    w: Washer = (snapshot or EMPTY)["washer"]
+    ts = w.ts
 
     # 1) Ingen data ännu → placeholder
     if not ts:
         return _placeholder_children(), "box appliance-card washer-card", last_ts
 
+    # Billigaste start visas bara när maskinen står still
+    plan = None if (w.time_to_end_min or 0) > 0 else price_planner.tile_text("washer", tz)
+
+    cycle = appliance_cycles.get("washer")
+
     # 2) De-dupe
-    if last_ts.get("washer") == ts:
+    if (last_ts.get("washer") == ts and last_ts.get("washer_plan") == plan
+            and last_ts.get("washer_cycle") == cycle.seq):
         return no_update, no_update, last_ts
 
     # 3) Ny data
-    children, klass = _render(w, tz)
+    children, klass = _render(w, tz, plan, cycle)
     last_ts["washer"] = ts
+    last_ts["washer_plan"] = plan
+    last_ts["washer_cycle"] = cycle.seq
     return children, klass, last_ts
 
 # ---- Interna helpers -----------------------------------------------------
@@ -53,21 +65,19 @@ def _placeholder_children():
         html.Div("Venter på data …", className="time"),
     ]
 
-def _render(w: dict, tz):
-    minutes = w.get("time_to_end_min")
-    try:
-        minutes = int(minutes)
-    except (TypeError, ValueError):
-        minutes = 0
+def _render(w: Washer, tz, plan=None, cycle=None):
+    minutes = w.time_to_end_min or 0
 
     running = minutes > 0
-    ts = w.get("ts")
+    ts = w.ts
 
     if running:
         children = [
             dcc.Markdown(SVG_STRING, dangerously_allow_html=True),
             html.Div(_fmt_hhmm(minutes), className="value"),
         ]
+        if cycle is not None and cycle.predicted_end:
+            children.append(html.Div(f"Klar ~{_fmt_clock(cycle.predicted_end, tz)}", className="cycle"))
         klass = "box appliance-card washer-card active"
     else:
         ts_str = _fmt_dt(ts, tz) if ts else "–"
@@ -75,6 +85,10 @@ def _render(w: dict, tz):
             dcc.Markdown(SVG_STRING, dangerously_allow_html=True),
             html.Div(ts_str, className="time"),
         ]
+        if cycle is not None and cycle.last is not None:
+            children.append(html.Div(_last_run(cycle.last), className="cycle"))
+        if plan:
+            children.append(html.Div(plan, className="plan"))
         klass = "box appliance-card washer-card"
 
     return children, klass
@@ -85,6 +99,17 @@ def _fmt_dt(ts, tz):
     except Exception:
         return "–"
 
+def _fmt_clock(ts, tz):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).astimezone(tz).strftime("%H:%M")
+
+def _last_run(c):
+    """Senaste cykeln: längd och energi, t.ex. "Sist 1:42 · 0.9 kWh"."""
+    h, m = divmod(int(c.duration_s // 60), 60)
+    text = f"Sist {h}:{m:02d}"
+    if c.kwh is not None:
+        text += f" · {c.kwh:.1f} kWh"
+    return text
+
 def _fmt_hhmm(total_min):
     try:
         m = int(total_min)
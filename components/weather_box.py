@@ -1,7 +1,9 @@
 # components/weather_box.py
 from datetime import datetime, timezone
 from dash import html
+import staleness
 from mqtt_subscriber import get_snapshot
+from sections import Weather
 
 ICON_MAP = {
     "sunny": "sunny.svg",
@@ -52,56 +54,37 @@ def _wind_class_color(wind_class):
 
 def weather_box():
     try:
-        wx = get_snapshot().get("weather", {})  # vädret ligger på toppnivå
+        wx: Weather = get_snapshot()["weather"]
 
-        condition   = wx.get("condition")
-        temperature = wx.get("temperature")
-        tmax        = wx.get("tmax")
-        uvmax       = wx.get("uv_max")
-        rain        = wx.get("precipitation")      # <-- rätt fält
-        wind_speed  = wx.get("wind_speed")
-        wind_gust   = wx.get("wind_gust")
-        wind_dir    = wx.get("wind_dir")
-        wind_class  = wx.get("wind_class")
-        ts          = wx.get("ts")
+        temperature = wx.temperature
+        tmax        = wx.tmax
+        uvmax       = wx.uv_max
+        rain        = wx.precipitation
+        wind_speed  = wx.wind_speed
+        wind_gust   = wx.wind_gust
+        wind_class  = wx.wind_class
+        ts          = wx.ts                        # epoch (sek) när posten togs emot
 
-        icon_path = icon_src(condition)
+        icon_path = icon_src(wx.condition)
 
-        now_txt  = f"{temperature:.0f}°C" if isinstance(temperature, (int, float)) else "–°C"
-        tmax_txt = f"{tmax:.0f}°C"        if isinstance(tmax, (int, float)) else "–°C"
-        uv_txt   = f"{uvmax:.1f}"         if isinstance(uvmax, (int, float)) else "–"
-        # gör rain till float om det kommer som sträng
-        try:
-            rain_f = float(rain) if rain is not None else None
-        except (TypeError, ValueError):
-            rain_f = None
-        rain_txt = f"{rain_f:.1f} mm" if isinstance(rain_f, (int, float)) else "– mm"
+        now_txt  = f"{temperature:.0f}°C" if temperature is not None else "–°C"
+        tmax_txt = f"{tmax:.0f}°C"        if tmax is not None else "–°C"
+        uv_txt   = f"{uvmax:.1f}"         if uvmax is not None else "–"
+        rain_txt = f"{rain:.1f} mm"       if rain is not None else "– mm"
 
-        if isinstance(wind_speed, (int, float)):
-            gust_txt  = f" ({wind_gust:.0f})" if isinstance(wind_gust, (int, float)) else ""
-            dir_txt   = f"{wind_dir} " if wind_dir else ""
+        if wind_speed is not None:
+            gust_txt  = f" ({wind_gust:.0f})" if wind_gust is not None else ""
+            dir_txt   = f"{wx.wind_dir} " if wx.wind_dir else ""
             wind_metrics = f"{dir_txt}{wind_speed:.0f} m/s{gust_txt}"
         else:
             wind_metrics = "–"
         wind_class_color = _wind_class_color(wind_class)
 
-        # ts: stöd både epoch (sek) och ISO-sträng
         gen_txt = ""
-        ts_stale = False
+        ts_stale = staleness.is_stale("weather")
         if ts is not None:
-            try:
-                if isinstance(ts, (int, float)):
-                    dt = datetime.fromtimestamp(float(ts), tz=timezone.utc).astimezone()
-                elif isinstance(ts, str):
-                    dt = datetime.fromisoformat(ts)
-                else:
-                    dt = None
-                gen_txt = dt.strftime("%Y-%m-%d, %H:%M") if dt else str(ts)
-                if dt:
-                    age = datetime.now(tz=timezone.utc) - dt.astimezone(timezone.utc)
-                    ts_stale = age.total_seconds() > 6 * 3600
-            except Exception:
-                gen_txt = str(ts)
+            dt = datetime.fromtimestamp(ts, tz=timezone.utc).astimezone()
+            gen_txt = dt.strftime("%Y-%m-%d, %H:%M")
 
         return html.Div(
             [
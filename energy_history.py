@@ -0,0 +1,178 @@
+# energy_history.py
+# -------------------------------------------------------------------------
+# Lokal cache av avslutade dygns förbrukning per enhet (kWh) för
+# energimodalens vecka/månad-vyer.
+#
+# Ett avslutat dygn ändras aldrig, så det hämtas från HA högst en gång per
+# enhet och sparas i data/energy_daily.json. Bara dagar som saknas i cachen
+# efterfrågas (en websocket-fråga för alla saknade enheter/dagar). Dagens
+# värde (pågående dygn) hålls i en kort minnescache så att byte av vy i
+# modalen inte ger någon HA-rundresa.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from ha_client import get_energy_daily, get_energy_today
+
+_LOGGER = logging.getLogger("energy")
+
+CACHE_PATH: str       = os.getenv("ENERGY_HISTORY_PATH", "data/energy_daily.json")
+HISTORY_DAYS: int     = 60        # två månadsperioder (30 + 30)
+TODAY_TTL_S: float    = 110.0     # strax under interval-component (2 min)
+RETRY_AFTER_S: float  = 15 * 60   # vänta innan ett misslyckat hämtförsök görs om
+
+# Vy -> antal dagar per period. "day" jämför idag med igår.
+RANGES: Dict[str, int] = {"day": 1, "week": 7, "month": 30}
+
+_TZ = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
+
+_lock = threading.Lock()
+_fetch_lock = threading.Lock()
+_days: Optional[Dict[str, Dict[str, float]]] = None   # "YYYY-MM-DD" -> {statistic_id: kWh}
+_today: Tuple[float, Dict[str, float]] = (0.0, {})      # (monotonic när hämtat, data)
+_last_failed: Optional[float] = None
+
+
+def _load() -> Dict[str, Dict[str, float]]:
+    global _days
+    if _days is None:
+        try:
+            with open(CACHE_PATH, encoding="utf-8") as f:
+                raw = json.load(f)
+            _days = {d: dict(v) for d, v in (raw.get("days") or {}).items() if isinstance(v, dict)}
+        except FileNotFoundError:
+            _days = {}
+        except Exception as e:
+            _LOGGER.warning("kunde inte läsa %s: %s", CACHE_PATH, e)
+            _days = {}
+    return _days
+
+
+def _save(days: Dict[str, Dict[str, float]]) -> None:
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        tmp = CACHE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"days": days}, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, CACHE_PATH)
+    except Exception as e:
+        _LOGGER.warning("kunde inte spara %s: %s", CACHE_PATH, e)
+
+
+def _missing(days: Dict[str, Dict[str, float]], ids: List[str], today: date) -> Tuple[List[str], Optional[date]]:
+    """(enheter som saknar något dygn, tidigaste saknade dygn) inom HISTORY_DAYS."""
+    missing_ids: set[str] = set()
+    first: Optional[date] = None
+    for i in range(HISTORY_DAYS, 0, -1):
+        d = today - timedelta(days=i)
+        have = days.get(d.isoformat()) or {}
+        lacking = [sid for sid in ids if sid not in have]
+        if lacking:
+            missing_ids.update(lacking)
+            first = first or d
+    return sorted(missing_ids), first
+
+
+def ensure_history(ids: List[str]) -> bool:
+    """Fyll cachen med avslutade dygn som saknas. Returnerar True om cachen är komplett.
+
+    Dagar som HA inte har statistik för (enheten fanns inte än) sparas som 0.0
+    så att de inte efterfrågas igen.
+    """
+    global _last_failed
+    today = datetime.now(_TZ).date()
+    with _lock:
+        missing_ids, first = _missing(_load(), ids, today)
+    if not missing_ids or first is None:
+        return True
+    if _last_failed is not None and time.monotonic() - _last_failed < RETRY_AFTER_S:
+        return False
+
+    with _fetch_lock:
+        # En annan tråd kan ha hunnit fylla cachen medan vi väntade.
+        with _lock:
+            missing_ids, first = _missing(_load(), ids, today)
+        if not missing_ids or first is None:
+            return True
+
+        start = datetime.combine(first, datetime.min.time(), _TZ)
+        end = datetime.combine(today, datetime.min.time(), _TZ)
+        t0 = time.monotonic()
+        fetched = get_energy_daily(missing_ids, start, end)
+        if fetched is None:
+            _last_failed = time.monotonic()
+            return False
+
+        with _lock:
+            days = _load()
+            d = first
+            while d < today:
+                key = d.isoformat()
+                row = days.setdefault(key, {})
+                for sid in missing_ids:
+                    if sid not in row:
+                        row[sid] = (fetched.get(sid) or {}).get(key, 0.0)
+                d += timedelta(days=1)
+            # Släng dygn som fallit ur fönstret
+            oldest = (today - timedelta(days=HISTORY_DAYS)).isoformat()
+            for key in [k for k in days if k < oldest]:
+                del days[key]
+            _save(days)
+        _LOGGER.info("hämtade %d enheter från %s på %.0f ms",
+                     len(missing_ids), first, (time.monotonic() - t0) * 1000)
+        return True
+
+
+def history_ready(ids: List[str]) -> bool:
+    """True om alla avslutade dygn i fönstret finns i cachen (ingen HA-trafik)."""
+    with _lock:
+        missing_ids, _first = _missing(_load(), ids, datetime.now(_TZ).date())
+    return not missing_ids
+
+
+def prefetch(ids: List[str]) -> None:
+    """Fyll historiken i bakgrunden (t.ex. när modalen öppnas)."""
+    if _fetch_lock.locked():
+        return
+    threading.Thread(target=ensure_history, args=(ids,), name="energy-history", daemon=True).start()
+
+
+def today(ids: List[str], force: bool = False) -> Dict[str, float]:
+    """Dagens förbrukning per statistic_id, cachad i TODAY_TTL_S."""
+    global _today
+    fetched_at, data = _today
+    if not force and data and time.monotonic() - fetched_at < TODAY_TTL_S:
+        return data
+    data = get_energy_today(ids)
+    if data:
+        _today = (time.monotonic(), data)
+    return data
+
+
+def period(ids: List[str], range_key: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """(aktuell period, föregående period) som {statistic_id: kWh}.
+
+    Aktuell period slutar med idag (pågående dygn ingår), föregående är lika
+    lång och ligger direkt före. Kräver att historiken finns i cachen.
+    """
+    n = RANGES.get(range_key, 1)
+    now_day = datetime.now(_TZ).date()
+    current: Dict[str, float] = dict(today(ids))
+    previous: Dict[str, float] = {}
+    with _lock:
+        days = _load()
+        for i in range(1, 2 * n):
+            row = days.get((now_day - timedelta(days=i)).isoformat()) or {}
+            target = current if i < n else previous
+            for sid in ids:
+                target[sid] = target.get(sid, 0.0) + float(row.get(sid) or 0.0)
+    return current, previous
@@ -0,0 +1,144 @@
+# ha_bootstrap.py
+# -------------------------------------------------------------------------
+# Bulk-hämtning av entitetstillstånd från Home Assistant vid uppstart.
+#
+# Icke-retained MQTT-topics kan dröja minuter innan första meddelandet kommer.
+# Bootstrapen hämtar därför alla mappade entiteter från HA:s REST-API direkt
+# när appen startar och fyller samma snapshot-sektioner som MQTT-parsarna.
+# mqtt_subscriber.seed() skriver aldrig över färskare MQTT-data.
+#
+# Mappningen (JSON, sökväg i HA_BOOTSTRAP_MAP) är entity_id -> spec eller
+# lista av specs:
+#   {
+#     "sensor.tibber_power": {"section": "pulse_power", "field": "power", "type": "float"},
+#     "weather.home": [
+#       {"section": "weather", "field": "condition"},
+#       {"section": "weather", "field": "temperature", "attr": "temperature", "type": "float"}
+#     ]
+#   }
+# "attr" läser ett attribut i stället för state, "type" är str|int|float|bool|json.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import mqtt_subscriber
+from ha_client import get_states
+
+_LOGGER = logging.getLogger("bootstrap")
+
+HA_BOOTSTRAP: bool      = os.getenv("HA_BOOTSTRAP", "0") == "1"
+HA_BOOTSTRAP_MAP: str   = os.getenv("HA_BOOTSTRAP_MAP", "data/ha_bootstrap.json")
+# "all"  -> ett GET /api/states (billigast när många entiteter mappas)
+# "each" -> parallella GET /api/states/<id> (mindre svar när få mappas)
+HA_BOOTSTRAP_MODE: str  = os.getenv("HA_BOOTSTRAP_MODE", "all").strip().lower()
+
+# Värden som HA använder när en entitet saknar tillstånd.
+_MISSING_STATES = {"unknown", "unavailable", "none", ""}
+
+
+def load_mapping(path: str = HA_BOOTSTRAP_MAP) -> Dict[str, List[Dict[str, Any]]]:
+    """Läs entity -> [spec]-mappningen. Saknad/trasig fil ger {}."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        _LOGGER.warning("ingen mappning i %s", path)
+        return {}
+    except Exception as e:
+        _LOGGER.warning("kunde inte läsa %s: %s", path, e)
+        return {}
+    if not isinstance(raw, dict):
+        return {}
+
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for entity_id, specs in raw.items():
+        specs = specs if isinstance(specs, list) else [specs]
+        valid = [s for s in specs if isinstance(s, dict) and s.get("section") and s.get("field")]
+        if valid:
+            out[entity_id] = valid
+    return out
+
+
+def _convert(value: Any, kind: str) -> Any:
+    if isinstance(value, str) and value.strip().lower() in _MISSING_STATES:
+        return None
+    if kind == "float":
+        return mqtt_subscriber._to_float(value)
+    if kind == "int":
+        return mqtt_subscriber._to_int(value)
+    if kind == "bool":
+        return str(value).strip().lower() in ("on", "true", "1", "yes")
+    if kind == "json":
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except Exception:
+                return None
+        return value
+    return value
+
+
+def _state_ts(state: Dict[str, Any]) -> Optional[int]:
+    raw = state.get("last_updated") or state.get("last_changed")
+    try:
+        return int(datetime.fromisoformat(raw).timestamp()) if raw else None
+    except Exception:
+        return None
+
+
+def apply_states(states: Dict[str, Dict[str, Any]],
+                 mapping: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+    """Mappa HA-states till snapshot-sektioner. Returnerar de sektioner som fylldes.
+
+    Fält grupperas per sektion och skrivs i ett seed()-anrop med den senaste
+    last_updated bland bidragande entiteter.
+    """
+    per_section: Dict[str, Dict[str, Any]] = {}
+    section_ts: Dict[str, int] = {}
+    for entity_id, specs in mapping.items():
+        state = states.get(entity_id)
+        if not isinstance(state, dict):
+            continue
+        ts = _state_ts(state) or mqtt_subscriber._now()
+        for spec in specs:
+            attr = spec.get("attr")
+            raw = (state.get("attributes") or {}).get(attr) if attr else state.get("state")
+            value = _convert(raw, spec.get("type", "str"))
+            if value is None:
+                continue
+            section = spec["section"]
+            per_section.setdefault(section, {})[spec["field"]] = value
+            section_ts[section] = max(section_ts.get(section, 0), ts)
+
+    return [section for section, fields in per_section.items()
+            if mqtt_subscriber.seed(section, section_ts[section], **fields)]
+
+
+def bootstrap() -> None:
+    mapping = load_mapping()
+    if not mapping:
+        return
+    t0 = time.monotonic()
+    ids = list(mapping)
+    states = get_states(ids) if HA_BOOTSTRAP_MODE == "each" else get_states()
+    t_fetch = time.monotonic() - t0
+    filled = apply_states(states, mapping)
+    t_total = time.monotonic() - t0
+    _LOGGER.info("%d/%d entiteter hämtade (%s) på %.0f ms, fyllde %d sektioner (%s) på totalt %.0f ms",
+                 len(states), len(ids), HA_BOOTSTRAP_MODE, t_fetch * 1000, len(filled),
+                 ", ".join(filled) or "–", t_total * 1000)
+
+
+def start() -> None:
+    """Kör bootstrapen i en bakgrundstråd (parallellt med MQTT-connect)."""
+    if not HA_BOOTSTRAP:
+        return
+    threading.Thread(target=bootstrap, name="ha-bootstrap", daemon=True).start()
@@ -3,11 +3,18 @@ from __future__ import annotations
 import json
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Tuple
+from functools import wraps
+from typing import Any, Callable, Tuple
 from zoneinfo import ZoneInfo
 
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,6 +31,48 @@ def _get_timeout() -> float:
 
 _HA_TIMEOUT = _get_timeout()
 
+# Delad session: återanvänder TCP/keep-alive-anslutningar mot HA i stället för
+# en ny anslutning per anrop. Poolstorleken räcker för bootstrapens parallella
+# GET /api/states/<id>.
+_POOL_SIZE = 8
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_POOL_SIZE)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+def _timed(op: str, ok: Callable[[Any], bool]) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Latens och fel per HA-operation till /metrics. `ok(resultat)` avgör om anropet lyckades."""
+    def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not metrics.ENABLED:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            result = fn(*args, **kwargs)
+            metrics.HA_REQUEST_SECONDS.observe(time.perf_counter() - t0, op)
+            if not ok(result):
+                metrics.HA_ERRORS.inc(op)
+            return result
+        return wrapper
+    return deco
+
+def _headers() -> dict[str, str]:
+    return {
+        "Authorization": f"Bearer {_HA_TOKEN}",
+        "Content-Type": "application/json",
+    }
+
+@_timed("call_service", lambda r: r[0])
 def call_service(domain: str, service: str, payload: dict[str, Any] | None = None) -> Tuple[bool, str]:
     """Anropa en Home Assistant-tjänst via REST och returnera (lyckades, felmeddelande)."""
 
@@ -33,13 +82,9 @@ def call_service(domain: str, service: str, payload: dict[str, Any] | None = Non
         return False, "HA_TOKEN saknas"
 
     url = f"{_HA_BASE_URL}/api/services/{domain}/{service}"
-    headers = {
-        "Authorization": f"Bearer {_HA_TOKEN}",
-        "Content-Type": "application/json",
-    }
 
     try:
-        response = requests.post(url, json=payload or {}, headers=headers, timeout=_HA_TIMEOUT)
+        response = _get_session().post(url, json=payload or {}, headers=_headers(), timeout=_HA_TIMEOUT)
     except requests.RequestException as exc:
         _LOGGER.warning("Misslyckad anrop till Home Assistant: %s", exc)
         return False, "Ingen kontakt med Home Assistant"
@@ -52,31 +97,79 @@ def call_service(domain: str, service: str, payload: dict[str, Any] | None = Non
     return False, "Home Assistant svarade med fel"
 
 
-def get_energy_today(statistic_ids: list[str]) -> dict[str, float]:
-    """Hämta dagens (sedan midnatt) förbrukning per enhet från HA:s statistik.
+@_timed("get_state", lambda r: r is not None)
+def _get_state(entity_id: str) -> dict[str, Any] | None:
+    url = f"{_HA_BASE_URL}/api/states/{entity_id}"
+    try:
+        response = _get_session().get(url, headers=_headers(), timeout=_HA_TIMEOUT)
+    except requests.RequestException as exc:
+        _LOGGER.warning("Misslyckades hämta %s från Home Assistant: %s", entity_id, exc)
+        return None
+    if response.status_code != 200:
+        _LOGGER.warning("Home Assistant svarade %s för %s", response.status_code, entity_id)
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
 
-    Använder HA:s websocket-API (`recorder/statistics_during_period`) eftersom
-    långtidsstatistiken inte exponeras via REST. Returnerar {statistic_id: kWh}.
-    Vid fel returneras {} (loggas) så anroparen kan visa en placeholder.
+
+@_timed("get_states", bool)
+def get_states(entity_ids: list[str] | None = None) -> dict[str, dict[str, Any]]:
+    """Hämta entitetstillstånd från HA:s REST-API som {entity_id: state-objekt}.
+
+    Utan `entity_ids` görs ett enda `GET /api/states` (alla entiteter). Med en
+    lista görs parallella `GET /api/states/<id>` över den delade sessionen.
+    Vid fel returneras det som gick att hämta (eventuellt {}).
+    """
+    if not _HA_BASE_URL or not _HA_TOKEN:
+        _LOGGER.warning("HA_BASE_URL/HA_TOKEN saknas - kan inte hämta states")
+        return {}
+
+    if entity_ids is None:
+        try:
+            response = _get_session().get(f"{_HA_BASE_URL}/api/states", headers=_headers(), timeout=_HA_TIMEOUT)
+        except requests.RequestException as exc:
+            _LOGGER.warning("Misslyckades hämta states från Home Assistant: %s", exc)
+            return {}
+        if response.status_code != 200:
+            _LOGGER.warning("Home Assistant svarade med felkod %s på /api/states", response.status_code)
+            return {}
+        try:
+            rows = response.json()
+        except ValueError:
+            return {}
+        return {r["entity_id"]: r for r in rows if isinstance(r, dict) and "entity_id" in r}
+
+    if not entity_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(_POOL_SIZE, len(entity_ids))) as pool:
+        results = pool.map(_get_state, entity_ids)
+    return {eid: st for eid, st in zip(entity_ids, results) if isinstance(st, dict)}
+
+
+@_timed("statistics", lambda r: r is not None)
+def _statistics_during_period(statistic_ids: list[str], start: datetime,
+                              end: datetime | None = None) -> dict[str, list[dict]] | None:
+    """Kör `recorder/statistics_during_period` (period=day, types=change) över websocket.
+
+    Långtidsstatistiken exponeras inte via REST. Returnerar HA:s rådata
+    {statistic_id: [rader]} eller None vid fel (loggas).
     """
     if not _HA_BASE_URL:
         _LOGGER.warning("HA_BASE_URL saknas")
-        return {}
+        return None
     if not _HA_TOKEN:
         _LOGGER.warning("HA_TOKEN saknas")
-        return {}
-    if not statistic_ids:
-        return {}
+        return None
 
     try:
         from websocket import create_connection
     except ImportError:
         _LOGGER.warning("websocket-client saknas - kan inte hämta HA-statistik")
-        return {}
+        return None
 
     ws_url = _HA_BASE_URL.replace("https://", "wss://").replace("http://", "ws://") + "/api/websocket"
-    tz = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
-    midnight = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
 
     ws = None
     try:
@@ -85,21 +178,24 @@ def get_energy_today(statistic_ids: list[str]) -> dict[str, float]:
         # 1) auth-handskakning
         if json.loads(ws.recv()).get("type") != "auth_required":
             _LOGGER.warning("Oväntat svar från HA websocket (förväntade auth_required)")
-            return {}
+            return None
         ws.send(json.dumps({"type": "auth", "access_token": _HA_TOKEN}))
         if json.loads(ws.recv()).get("type") != "auth_ok":
             _LOGGER.warning("HA websocket-auth misslyckades")
-            return {}
+            return None
 
-        # 2) fråga efter dagens statistik per enhet
-        ws.send(json.dumps({
+        # 2) fråga efter statistik per enhet och dag
+        query = {
             "id": 1,
             "type": "recorder/statistics_during_period",
-            "start_time": midnight.isoformat(),
+            "start_time": start.isoformat(),
             "statistic_ids": statistic_ids,
             "period": "day",
             "types": ["change"],
-        }))
+        }
+        if end is not None:
+            query["end_time"] = end.isoformat()
+        ws.send(json.dumps(query))
 
         result = None
         for _ in range(10):
@@ -109,24 +205,80 @@ def get_energy_today(statistic_ids: list[str]) -> dict[str, float]:
                 break
         if not result or not result.get("success"):
             _LOGGER.warning("statistics_during_period misslyckades: %s", result)
-            return {}
-
-        data = result.get("result") or {}
-        out: dict[str, float] = {}
-        for sid in statistic_ids:
-            total = 0.0
-            for row in (data.get(sid) or []):
-                change = row.get("change")
-                if isinstance(change, (int, float)):
-                    total += change
-            out[sid] = round(total, 2)
-        return out
+            return None
+        return result.get("result") or {}
     except Exception as exc:  # noqa: BLE001 - vill aldrig krascha callbacken
         _LOGGER.warning("Misslyckades hämta HA-statistik via websocket: %s", exc)
-        return {}
+        return None
     finally:
         if ws is not None:
             try:
                 ws.close()
             except Exception:  # noqa: BLE001
                 pass
+
+
+def _row_date(row: dict, tz: ZoneInfo) -> str | None:
+    """Lokalt datum (ISO) för en statistikrad; HA skickar start som ms-epoch eller ISO."""
+    start = row.get("start")
+    try:
+        if isinstance(start, (int, float)):
+            return datetime.fromtimestamp(start / 1000, tz).date().isoformat()
+        if isinstance(start, str):
+            return datetime.fromisoformat(start).astimezone(tz).date().isoformat()
+    except (ValueError, OverflowError, OSError):
+        pass
+    return None
+
+
+def get_energy_today(statistic_ids: list[str]) -> dict[str, float]:
+    """Hämta dagens (sedan midnatt) förbrukning per enhet från HA:s statistik.
+
+    Returnerar {statistic_id: kWh}. Vid fel returneras {} (loggas) så
+    anroparen kan visa en placeholder.
+    """
+    if not statistic_ids:
+        return {}
+
+    tz = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
+    midnight = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    data = _statistics_during_period(statistic_ids, midnight)
+    if data is None:
+        return {}
+
+    out: dict[str, float] = {}
+    for sid in statistic_ids:
+        total = 0.0
+        for row in (data.get(sid) or []):
+            change = row.get("change")
+            if isinstance(change, (int, float)):
+                total += change
+        out[sid] = round(total, 2)
+    return out
+
+
+def get_energy_daily(statistic_ids: list[str], start: datetime,
+                     end: datetime) -> dict[str, dict[str, float]] | None:
+    """Hämta förbrukning per enhet och dygn i [start, end) med en enda websocket-fråga.
+
+    Returnerar {statistic_id: {"YYYY-MM-DD": kWh}} (lokala datum) eller None
+    vid fel, så att anroparen kan skilja "ingen förbrukning" från "inget svar".
+    """
+    if not statistic_ids:
+        return {}
+
+    data = _statistics_during_period(statistic_ids, start, end)
+    if data is None:
+        return None
+
+    tz = start.tzinfo if isinstance(start.tzinfo, ZoneInfo) else ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
+    out: dict[str, dict[str, float]] = {}
+    for sid in statistic_ids:
+        days: dict[str, float] = {}
+        for row in (data.get(sid) or []):
+            change = row.get("change")
+            day = _row_date(row, tz)
+            if day and isinstance(change, (int, float)):
+                days[day] = round(days.get(day, 0.0) + change, 3)
+        out[sid] = days
+    return out
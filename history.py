@@ -0,0 +1,159 @@
+# history.py
+# -------------------------------------------------------------------------
+# Tidsserier för skärm 2: ringbuffertar per serie, fyllda från snapshoten.
+#
+# Modulen lyssnar på sektionsuppdateringar från mqtt_subscriber och lägger
+# (ts, värde) i en ringbuffert per serie i SERIES, högst ett prov per
+# HISTORY_STEP_S sekunder. Buffertarna är förallokerade NumPy-arrayer för
+# HISTORY_DAYS dagar, så minnet är fast (≈12 B per prov) och en append är
+# O(1). Historiken finns bara i minnet och börjar om vid omstart.
+#
+# Läsning sker per tidsfönster (window) och nedsamplas med Largest-
+# Triangle-Three-Buckets (lttb) till ungefär diagrammets bredd i pixlar:
+# formen och topparna behålls, men Plotly får aldrig mer än ett par tusen
+# punkter per trace oavsett hur många prov som ligger i bufferten.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import mqtt_subscriber
+
+HISTORY_DAYS: float   = float(os.getenv("HISTORY_DAYS", "7"))
+HISTORY_STEP_S: float = float(os.getenv("HISTORY_STEP_S", "10"))
+
+# serie -> (sektion, attribut)
+SERIES: Dict[str, Tuple[str, str]] = {
+    "t.stue":     ("shelly_bht", "t"),
+    "t.kontor":   ("env_office", "t"),
+    "t.vaskerum": ("env_laundry", "t"),
+    "t.sovrum":   ("env_bedroom", "t"),
+    "rh.stue":    ("shelly_bht", "rh"),
+    "rh.kontor":  ("env_office", "rh"),
+    "rh.vaskerum": ("env_laundry", "rh"),
+    "rh.sovrum":  ("env_bedroom", "rh"),
+    "power":      ("pulse_power", "power"),
+    "eco2":       ("airquality_raw", "eco2_ppm"),
+    "tvoc":       ("airquality_raw", "tvoc_ppb"),
+}
+
+
+class Ring:
+    """Ringbuffert med stigande tidsstämplar (epoch s, float64) och värden (float32)."""
+    __slots__ = ("ts", "v", "head", "size")
+
+    def __init__(self, capacity: int) -> None:
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.v = np.zeros(capacity, dtype=np.float32)
+        self.head = 0                    # nästa skrivposition
+        self.size = 0
+
+    def append(self, ts: float, v: float) -> None:
+        self.ts[self.head] = ts
+        self.v[self.head] = v
+        self.head = (self.head + 1) % len(self.ts)
+        self.size = min(self.size + 1, len(self.ts))
+
+    def last_ts(self) -> Optional[float]:
+        return float(self.ts[self.head - 1]) if self.size else None
+
+    def window(self, after: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Kopior av proven med ts > after, i tidsordning."""
+        cap = len(self.ts)
+        if self.size < cap:
+            parts = [(0, self.size)]
+        else:
+            parts = [(self.head, cap), (0, self.head)]
+        xs, ys = [], []
+        for lo, hi in parts:
+            i = lo + int(np.searchsorted(self.ts[lo:hi], after, side="right"))
+            if i < hi:
+                xs.append(self.ts[i:hi])
+                ys.append(self.v[i:hi])
+        if not xs:
+            return np.empty(0, np.float64), np.empty(0, np.float32)
+        return np.concatenate(xs), np.concatenate(ys)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets: n punkter ur (x, y), första och sista behålls."""
+    N = len(x)
+    if n >= N or n < 3:
+        return x, y
+    xf = x.astype(np.float64)
+    yf = y.astype(np.float64)
+    idx = np.empty(n, dtype=np.int64)
+    idx[0], idx[-1] = 0, N - 1
+    every = (N - 2) / (n - 2)
+    edges = (np.arange(n - 1) * every).astype(np.int64) + 1     # hinkgränser för hink 0..n-2
+    edges[-1] = N - 1
+    # medelpunkt för varje hink; sista "hinken" efter n-2 är slutpunkten
+    sums_x = np.add.reduceat(xf[1:N - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(yf[1:N - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, xf[N - 1])
+    avg_y = np.append(sums_y / counts, yf[N - 1])
+    a = 0
+    for i in range(n - 2):
+        s, e = edges[i], edges[i + 1]
+        ax, ay = xf[a], yf[a]
+        # dubbla triangelarean mot föregående vald punkt och nästa hinks medel
+        area = np.abs((ax - avg_x[i + 1]) * (yf[s:e] - ay) - (ax - xf[s:e]) * (avg_y[i + 1] - ay))
+        a = s + int(area.argmax())
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+_capacity = max(16, int(HISTORY_DAYS * 86400 / HISTORY_STEP_S))
+_rings: Dict[str, Ring] = {name: Ring(_capacity) for name in SERIES}
+_by_section: Dict[str, List[Tuple[str, str]]] = {}
+for _name, (_sec, _attr) in SERIES.items():
+    _by_section.setdefault(_sec, []).append((_name, _attr))
+_lock = threading.Lock()
+
+
+def window(name: str, after: float) -> Tuple[np.ndarray, np.ndarray]:
+    with _lock:
+        return _rings[name].window(after)
+
+
+def points(name: str, after: float, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Prov efter `after`, nedsamplade med LTTB till högst n punkter."""
+    x, y = window(name, after)
+    return lttb(x, y, n)
+
+
+def record(name: str, ts: float, v: float) -> bool:
+    """Lägg till ett prov; hoppar över prov tätare än HISTORY_STEP_S. True om sparat."""
+    ring = _rings[name]
+    with _lock:
+        last = ring.last_ts()
+        if last is not None and ts < last + HISTORY_STEP_S:
+            return False
+        ring.append(ts, v)
+    return True
+
+
+def memory_bytes() -> int:
+    return sum(r.ts.nbytes + r.v.nbytes for r in _rings.values())
+
+
+def _on_update(section: str, rec: Any) -> None:
+    series = _by_section.get(section)
+    if not series:
+        return
+    ts = getattr(rec, "ts", None)
+    if ts is None:
+        return
+    for name, attr in series:
+        v = getattr(rec, attr, None)
+        if v is not None:
+            record(name, float(ts), float(v))
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
@@ -0,0 +1,44 @@
+# log_setup.py
+# -------------------------------------------------------------------------
+# Icke-blockerande loggning: rotloggern får en QueueHandler och en
+# QueueListener-tråd gör själva skrivningen till stdout. Anropare (paho-
+# tråden, callbacks) lägger bara en post på kön och blockerar aldrig på I/O.
+#
+#   LOG_LEVEL=INFO         nivå för rotloggern (DEBUG/INFO/WARNING/...)
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional
+
+LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(name)s] %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup(level: Optional[str] = None) -> None:
+    """Koppla rotloggern till en kö + lyssnartråd. Idempotent."""
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    if _listener is not None:
+        return
+
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(logging.Formatter(LOG_FORMAT, datefmt="%H:%M:%S"))
+
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(logging.handlers.QueueHandler(q))
+
+    _listener = logging.handlers.QueueListener(q, out, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)          # töm kön vid avslut
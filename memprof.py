@@ -0,0 +1,273 @@
+# memprof.py
+# -------------------------------------------------------------------------
+# Minnesprofilering för långa körningar (MEMPROF=1).
+#
+# Med MEMPROF=1 startas tracemalloc så tidigt som möjligt (app.py importerar
+# modulen direkt efter loggningen) och en bakgrundstråd tar ett prov var
+# MEMPROF_SAMPLE_S sekund: RSS, tracemallocs aktuella/högsta bytes, antal
+# allokerade block och storleken på varje snapshot-sektion. Proven hålls i
+# en ring (MEMPROF_HISTORY) och det senaste exporteras till /metrics.
+#
+#   GET /debug/memory                    översikt + största allokeringsställen
+#       ?limit=25&key=lineno|filename|traceback
+#       ?base=<etikett>[&to=<etikett>]   diff mellan två captures (to=nu om utelämnad)
+#   GET /debug/memory/capture?label=x    spara en tracemalloc-snapshot
+#   GET /debug/memory/trim               malloc_trim(0): RSS före/efter, visar
+#                                        hur mycket som var fragmentering
+#
+#   MEMPROF=1                slå på (tracemalloc kostar CPU och minne, ~x1.3)
+#   MEMPROF_FRAMES=1         stackdjup per allokering (>1 för key=traceback)
+#   MEMPROF_SAMPLE_S=60      provintervall
+#   MEMPROF_HISTORY=1440     antal prov som sparas (24 h med 60 s)
+#   MEMPROF_CAPTURES=4       antal captures som sparas (äldsta kastas)
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+import metrics
+
+ENABLED: bool    = os.getenv("MEMPROF", "0") == "1"
+FRAMES: int      = int(os.getenv("MEMPROF_FRAMES", "1"))
+SAMPLE_S: float  = float(os.getenv("MEMPROF_SAMPLE_S", "60"))
+HISTORY: int     = int(os.getenv("MEMPROF_HISTORY", "1440"))
+CAPTURES: int    = int(os.getenv("MEMPROF_CAPTURES", "4"))
+
+_LOGGER = logging.getLogger("memprof")
+
+# Allokeringar som bara är profileringens eget brus
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+_samples: Deque[Dict[str, Any]] = deque(maxlen=HISTORY)
+_captures: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+_capture_lock = threading.Lock()
+_MIN_GROWTH_SAMPLES = 10           # färre prov ger meningslösa lutningar
+_sampler: Optional[threading.Thread] = None
+
+if ENABLED and not tracemalloc.is_tracing():
+    tracemalloc.start(FRAMES)
+
+
+# --- Storlek på snapshot-sektioner -----------------------------------------
+def deep_sizeof(obj: Any, _seen: Optional[Set[int]] = None) -> int:
+    """Ungefärliga bytes för obj och allt det refererar till (delade objekt räknas en gång)."""
+    seen = _seen if _seen is not None else set()
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        else:
+            d = getattr(o, "__dict__", None)
+            if d is not None:
+                stack.append(d)
+            for cls in type(o).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(o, slot):
+                        stack.append(getattr(o, slot))
+    return total
+
+
+def section_sizes() -> Dict[str, int]:
+    """Bytes per toppnivåsektion i MQTT-snapshoten."""
+    import mqtt_subscriber
+    snap = mqtt_subscriber.get_snapshot()
+    return {name: deep_sizeof(sec) for name, sec in sorted(snap.items())}
+
+
+# --- Prov ----------------------------------------------------------------
+def sample() -> Dict[str, Any]:
+    """Ett minnesprov just nu (läggs inte i historiken)."""
+    traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    rss = metrics.rss_bytes()
+    return {
+        "t": time.time(),
+        "rss": rss,
+        "traced": traced,
+        "traced_peak": peak,
+        # RSS som tracemalloc inte ser: C-bibliotek, interpretatorn, fragmentering
+        "untraced": rss - traced if rss is not None and traced is not None else None,
+        "blocks": sys.getallocatedblocks(),
+        "sections": section_sizes(),
+    }
+
+
+def _sample_loop() -> None:
+    while True:
+        try:
+            _samples.append(sample())
+        except Exception as e:
+            _LOGGER.warning("prov misslyckades: %s", e)
+        time.sleep(SAMPLE_S)
+
+
+def _growth_per_hour(key: str) -> Optional[float]:
+    """Lutning (bytes/h) med minsta kvadrat över historiken; None med för få prov."""
+    pts = [(s["t"], s[key]) for s in list(_samples) if s.get(key) is not None]
+    if len(pts) < _MIN_GROWTH_SAMPLES:
+        return None
+    n = len(pts)
+    mt = sum(t for t, _ in pts) / n
+    mv = sum(v for _, v in pts) / n
+    den = sum((t - mt) ** 2 for t, _ in pts)
+    if den <= 0:
+        return None
+    return sum((t - mt) * (v - mv) for t, v in pts) / den * 3600
+
+
+def _memory_metrics() -> Iterable[str]:
+    if not _samples:
+        return
+    last = _samples[-1]
+    if last["traced"] is not None:
+        yield from metrics.gauge("familydash_tracemalloc_bytes",
+                                 "Python heap traced by tracemalloc at the last sample",
+                                 [('kind="current"', last["traced"]), ('kind="peak"', last["traced_peak"])])
+    yield from metrics.gauge("familydash_sampled_resident_memory_bytes",
+                             "RSS at the last memory sample", [("", last["rss"] or 0)])
+    yield from metrics.gauge("familydash_allocated_blocks", "sys.getallocatedblocks() at the last sample",
+                             [("", last["blocks"])])
+    yield from metrics.gauge("familydash_snapshot_section_bytes",
+                             "Approximate deep size of each MQTT snapshot section",
+                             [(f'section="{name}"', b) for name, b in last["sections"].items()])
+    growth = [(f'kind="{k}"', g) for k in ("rss", "traced")
+              if (g := _growth_per_hour(k)) is not None]
+    if growth:
+        yield from metrics.gauge("familydash_memory_growth_bytes_per_hour",
+                                 "Least-squares memory growth over the sample history", growth)
+
+
+# --- tracemalloc-captures --------------------------------------------------
+def capture(label: Optional[str] = None) -> str:
+    """Spara en filtrerad tracemalloc-snapshot under `label` och returnera etiketten."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc är inte igång (MEMPROF=1)")
+    label = label or time.strftime("%H%M%S")
+    snap = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    with _capture_lock:
+        _captures.pop(label, None)
+        _captures[label] = snap
+        while len(_captures) > CAPTURES:
+            _captures.popitem(last=False)
+    return label
+
+
+def _fmt_stat(stat: Any, diff: bool) -> Dict[str, Any]:
+    frames = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+    row: Dict[str, Any] = {"where": frames[0] if len(frames) == 1 else frames,
+                           "bytes": stat.size, "count": stat.count}
+    if diff:
+        row["bytes_diff"] = stat.size_diff
+        row["count_diff"] = stat.count_diff
+    return row
+
+
+def top(limit: int = 25, key: str = "lineno") -> List[Dict[str, Any]]:
+    snap = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    return [_fmt_stat(s, False) for s in snap.statistics(key)[:limit]]
+
+
+def diff(base: str, to: Optional[str] = None, limit: int = 25,
+         key: str = "lineno") -> List[Dict[str, Any]]:
+    """Största förändringarna från capture `base` till `to` (eller nu)."""
+    with _capture_lock:
+        old = _captures[base]
+        new = _captures[to] if to else None
+    if new is None:
+        new = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    stats = new.compare_to(old, key)
+    return [_fmt_stat(s, True) for s in stats[:limit]]
+
+
+def malloc_trim() -> Dict[str, Any]:
+    """Lämna tillbaka fri heap till OS:et (glibc) och mät RSS före/efter."""
+    name = ctypes.util.find_library("c")
+    try:
+        libc = ctypes.CDLL(name)
+        trim = libc.malloc_trim
+    except (OSError, AttributeError, TypeError):
+        return {"supported": False}
+    before = metrics.rss_bytes()
+    trim(0)
+    after = metrics.rss_bytes()
+    return {"supported": True, "rss_before": before, "rss_after": after,
+            "released": before - after if before is not None and after is not None else None}
+
+
+def start() -> None:
+    """Starta provtråden och exporten till /metrics (idempotent)."""
+    global _sampler
+    if not ENABLED or _sampler is not None:
+        return
+    _sampler = threading.Thread(target=_sample_loop, name="memprof", daemon=True)
+    _sampler.start()
+    metrics.register_collector(_memory_metrics)
+
+
+def install(app: Any) -> None:
+    """Registrera /debug/memory* på Flask-servern bakom Dash (bara med MEMPROF=1)."""
+    if not ENABLED:
+        return
+    from flask import jsonify, request
+
+    start()
+    server = app.server
+
+    @server.route("/debug/memory")
+    def _debug_memory() -> Any:
+        limit = request.args.get("limit", 25, type=int)
+        key = request.args.get("key", "lineno")
+        if key not in ("lineno", "filename", "traceback"):
+            return jsonify({"error": "key måste vara lineno, filename eller traceback"}), 400
+        body: Dict[str, Any] = {
+            "now": sample(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "captures": list(_captures),
+            "history": list(_samples)[-60:],
+            "growth_bytes_per_hour": {k: _growth_per_hour(k) for k in ("rss", "traced")},
+        }
+        base = request.args.get("base")
+        if base:
+            try:
+                body["diff"] = diff(base, request.args.get("to") or None, limit, key)
+            except KeyError as e:
+                return jsonify({"error": f"okänd capture {e}", "captures": list(_captures)}), 404
+        else:
+            body["top"] = top(limit, key)
+        return jsonify(body)
+
+    @server.route("/debug/memory/capture")
+    def _debug_memory_capture() -> Any:
+        label = capture(request.args.get("label"))
+        return jsonify({"label": label, "captures": list(_captures)})
+
+    @server.route("/debug/memory/trim")
+    def _debug_memory_trim() -> Any:
+        return jsonify(malloc_trim())
+
+    _LOGGER.info("tracemalloc (%d ram) och /debug/memory aktiva", FRAMES)
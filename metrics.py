@@ -0,0 +1,335 @@
+# metrics.py
+# -------------------------------------------------------------------------
+# Prometheus-export (/metrics) och hälsokontroll (/healthz) för FamilyDash.
+#
+# Räknare och histogram är shardade per tråd: varje tråd skriver bara i sin
+# egen dict, så paho-tråden tar aldrig ett lås för att räkna ett meddelande
+# och en scrape stör den inte. Vid scrape summeras shardarna; shardar från
+# trådar som avslutats (Flask kör en tråd per request) viks in i en bas.
+#
+#   METRICS=0              stäng av (ingen TimedLock, inga mätpunkter)
+#   HEALTH_MAX_LAG_S=300   /healthz svarar 503 om inget MQTT-meddelande
+#                          kommit på så här länge
+#
+# Modulen använder bara stdlib och importeras av mqtt_subscriber/ha_client;
+# install(app) kopplar på routes och insamlare som läser subscribern.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+ENABLED: bool            = os.getenv("METRICS", "1") == "1"
+HEALTH_MAX_LAG_S: float  = float(os.getenv("HEALTH_MAX_LAG_S", "300"))
+
+Labels = Tuple[str, ...]
+
+_LOGGER = logging.getLogger("metrics")
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+_failing: Set[str] = set()    # collectors som fallerade vid förra skrapningen
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[Labels, Any]]] = []
+        self._dead: Dict[Labels, Any] = {}
+        self._reg_lock = threading.Lock()
+        _registry.append(self)
+
+    def _shard(self) -> Dict[Labels, Any]:
+        try:
+            return self._local.d
+        except AttributeError:
+            d = self._local.d = {}
+            with self._reg_lock:
+                self._shards.append((threading.current_thread(), d))
+            return d
+
+    def _merge_into(self, acc: Dict[Labels, Any], d: Dict[Labels, Any]) -> None:
+        raise NotImplementedError
+
+    def _collect(self) -> Dict[Labels, Any]:
+        acc: Dict[Labels, Any] = {}
+        with self._reg_lock:
+            alive = []
+            for thread, d in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, d))
+                else:
+                    self._merge_into(self._dead, dict(d))
+            self._shards = alive
+            self._merge_into(acc, self._dead)
+            shards = [d for _t, d in alive]
+        for d in shards:
+            self._merge_into(acc, dict(d))      # dict(d) är en atomär kopia under GIL:en
+        return acc
+
+    def render(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        d = self._shard()
+        d[labels] = d.get(labels, 0.0) + amount
+
+    def _merge_into(self, acc: Dict[Labels, Any], d: Dict[Labels, Any]) -> None:
+        for k, v in d.items():
+            acc[k] = acc.get(k, 0.0) + v
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        for labels, v in sorted(self._collect().items()):
+            yield f"{self.name}{_fmt_labels(self.labels, labels)} {_num(v)}"
+
+
+# Standardgränser (sekunder): 10 µs .. 10 s
+DEFAULT_BUCKETS = (1e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._n = len(self.buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        d = self._shard()
+        h = d.get(labels)
+        if h is None:
+            h = d[labels] = [0] * (self._n + 1) + [0.0]    # buckets, +Inf, summa
+        h[bisect_left(self.buckets, value)] += 1
+        h[-1] += value
+
+    def _merge_into(self, acc: Dict[Labels, Any], d: Dict[Labels, Any]) -> None:
+        for k, h in d.items():
+            h = list(h)
+            a = acc.get(k)
+            if a is None:
+                acc[k] = h
+            else:
+                for i, v in enumerate(h):
+                    a[i] += v
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, h in sorted(self._collect().items()):
+            cum = 0
+            for bound, n in zip(self.buckets + (float("inf"),), h[:-1]):
+                cum += n
+                le = 'le="' + _num(bound) + '"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, labels, le)} {cum}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, labels)} {_num(h[-1])}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, labels)} {cum}"
+
+
+class TimedLock:
+    """Ersättare för threading.Lock som mäter väntetid och hålltid."""
+
+    def __init__(self, wait: Histogram, hold: Histogram) -> None:
+        self._lock = threading.Lock()
+        self._wait = wait
+        self._hold = hold
+        self._acquired_at = 0.0               # skrivs bara av den som håller låset
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        t0 = time.perf_counter()
+        ok = self._lock.acquire(blocking, timeout)
+        if ok:
+            t1 = time.perf_counter()
+            self._acquired_at = t1
+            self._wait.observe(t1 - t0)
+        return ok
+
+    def release(self) -> None:
+        held = time.perf_counter() - self._acquired_at
+        self._lock.release()
+        self._hold.observe(held)
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.release()
+
+
+def register_collector(fn: Callable[[], Iterable[str]]) -> None:
+    """Lägg till en funktion som ger färdiga exportrader vid varje scrape (gauges)."""
+    _collectors.append(fn)
+
+
+def gauge(name: str, doc: str, samples: Iterable[Tuple[str, float]]) -> Iterable[str]:
+    """Exportrader för en gauge; `samples` är (labeltext, värde), labeltext t.ex. 'section="x"'."""
+    yield f"# HELP {name} {doc}"
+    yield f"# TYPE {name} gauge"
+    for labels, v in samples:
+        yield f"{name}{{{labels}}} {_num(v)}" if labels else f"{name} {_num(v)}"
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    for fn in _collectors:
+        name = getattr(fn, "__name__", repr(fn))
+        try:
+            lines.extend(fn())
+        except Exception as e:
+            # Varna en gång per fel, inte vid varje skrapning
+            if name in _failing:
+                _LOGGER.debug("collector %s misslyckades: %s", name, e)
+            else:
+                _failing.add(name)
+                _LOGGER.warning("collector %s misslyckades: %s", name, e)
+        else:
+            if name in _failing:
+                _failing.discard(name)
+                _LOGGER.info("collector %s fungerar igen", name)
+    return "\n".join(lines) + "\n"
+
+
+# --- Mätpunkter ----------------------------------------------------------
+MQTT_MESSAGES = Counter("familydash_mqtt_messages_total", "MQTT messages received", ("topic",))
+MQTT_PARSE_SECONDS = Histogram("familydash_mqtt_parse_seconds",
+                               "Time to dispatch and parse one MQTT message", ("topic",))
+MQTT_WATCHDOG_RECONNECTS = Counter("familydash_mqtt_watchdog_reconnects_total",
+                                   "Reconnects forced by the liveness watchdog")
+MQTT_DISCONNECTS = Counter("familydash_mqtt_disconnects_total", "Disconnects reported by paho")
+LOCK_WAIT_SECONDS = Histogram("familydash_snapshot_lock_wait_seconds",
+                              "Time spent waiting for the snapshot lock")
+LOCK_HOLD_SECONDS = Histogram("familydash_snapshot_lock_hold_seconds",
+                              "Time the snapshot lock was held")
+HA_REQUEST_SECONDS = Histogram("familydash_ha_request_seconds",
+                               "Home Assistant call latency", ("op",))
+HA_ERRORS = Counter("familydash_ha_errors_total", "Failed Home Assistant calls", ("op",))
+CALLBACK_SECONDS = Histogram("familydash_callback_seconds", "Dash callback wall time", ("callback",))
+
+
+def snapshot_lock() -> Any:
+    """Låset för mqtt_subscriber._snapshot: TimedLock om metrics är på."""
+    if ENABLED:
+        return TimedLock(LOCK_WAIT_SECONDS, LOCK_HOLD_SECONDS)
+    return threading.Lock()
+
+
+# --- Processmått ---------------------------------------------------------
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _process_metrics() -> Iterable[str]:
+    rss = rss_bytes()
+    if rss is not None:
+        yield from gauge("process_resident_memory_bytes", "Resident set size", [("", rss)])
+    yield from gauge("python_threads", "Live Python threads", [("", threading.active_count())])
+    stats = gc.get_stats()
+    yield "# HELP python_gc_collections_total GC collections per generation"
+    yield "# TYPE python_gc_collections_total counter"
+    for gen, s in enumerate(stats):
+        yield f'python_gc_collections_total{{generation="{gen}"}} {s["collections"]}'
+    yield "# HELP python_gc_objects_collected_total Objects collected per generation"
+    yield "# TYPE python_gc_objects_collected_total counter"
+    for gen, s in enumerate(stats):
+        yield f'python_gc_objects_collected_total{{generation="{gen}"}} {s["collected"]}'
+    yield from gauge("python_gc_pending", "Allocations since last collection per generation",
+                     [(f'generation="{gen}"', n) for gen, n in enumerate(gc.get_count())])
+
+
+def _mqtt_metrics() -> Iterable[str]:
+    import mqtt_subscriber
+    now = time.time()
+    ages = [(f'section="{_escape(sec)}"', now - ts)
+            for sec, ts in sorted(mqtt_subscriber.section_ts().items()) if ts]
+    yield from gauge("familydash_mqtt_section_age_seconds",
+                     "Seconds since each snapshot section was last updated", ages)
+    lag = mqtt_subscriber.ingest_lag()
+    if lag is not None:
+        yield from gauge("familydash_mqtt_last_message_age_seconds",
+                         "Seconds since the last message from the broker", [("", lag)])
+
+
+register_collector(_process_metrics)
+register_collector(_mqtt_metrics)
+
+
+def install(app: Any) -> None:
+    """Registrera /metrics (om METRICS=1) och /healthz på Flask-servern bakom Dash."""
+    from flask import Response, jsonify
+
+    import mqtt_subscriber
+
+    server = app.server
+
+    @server.route("/healthz")
+    def _healthz() -> Any:
+        if not mqtt_subscriber.MQTT_ENABLE:
+            return jsonify({"status": "ok", "mqtt": "disabled"})
+        lag = mqtt_subscriber.ingest_lag()
+        if lag is None:
+            return jsonify({"status": "starting"}), 503
+        newest = max((ts for ts in mqtt_subscriber.section_ts().values() if ts), default=None)
+        body = {
+            "status": "ok" if lag <= HEALTH_MAX_LAG_S else "stale",
+            "ingest_lag_s": round(lag, 1),
+            "newest_section_age_s": round(time.time() - newest, 1) if newest else None,
+            "max_lag_s": HEALTH_MAX_LAG_S,
+        }
+        return jsonify(body), (200 if body["status"] == "ok" else 503)
+
+    if not ENABLED:
+        return
+
+    @server.route("/metrics")
+    def _metrics() -> Any:
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    _LOGGER.info("/metrics och /healthz aktiva")
@@ -0,0 +1,155 @@
+# mqtt_log.py
+# -------------------------------------------------------------------------
+# Insyn i MQTT-trafiken utan en stdout-rad per meddelande.
+#
+# Varje meddelande läggs i en ringbuffert per topic (de senaste
+# MQTT_LOG_RING), läsbar via GET /debug/mqtt[?topic=<filter>]. Med
+# MQTT_DEBUG=1 loggas meddelanden dessutom till loggern "mqtt.msg", med
+# sampling, rate limit och trunkering per topic:
+#
+#   MQTT_LOG_SAMPLE=1       logga vart N:e meddelande per topic
+#   MQTT_LOG_RATE=12        max loggrader per topic och minut (token bucket)
+#   MQTT_LOG_BURST=5        ...med så här stor burst
+#   MQTT_LOG_TRUNCATE=200   max tecken payload per loggrad
+#   MQTT_LOG_TOPICS='{"home/calendar/#": {"rate": 1}, "home/tibber/power": {"sample": 10}}'
+#                           överstyrning per topicfilter (+ och # stöds)
+#   MQTT_LOG_RING=20        meddelanden per topic i ringbufferten
+#   MQTT_LOG_RING_CHARS=2000  max tecken payload per sparat meddelande
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from paho.mqtt.client import topic_matches_sub
+
+_LOGGER = logging.getLogger("mqtt.msg")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _load_overrides() -> Dict[str, Dict[str, float]]:
+    raw = os.getenv("MQTT_LOG_TOPICS")
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        _LOGGER.warning("MQTT_LOG_TOPICS är inte giltig JSON, ignoreras")
+        return {}
+    return {k: v for k, v in data.items() if isinstance(v, dict)}
+
+
+class _Policy:
+    """Sampling + token bucket för en topic."""
+    __slots__ = ("sample", "rate", "burst", "seen", "tokens", "last", "suppressed")
+
+    def __init__(self, sample: int, rate: float, burst: float) -> None:
+        self.sample = max(1, int(sample))
+        self.rate = rate / 60.0                     # tokens per sekund
+        self.burst = max(1.0, burst)
+        self.seen = 0
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.suppressed = 0
+
+    def allow(self) -> bool:
+        self.seen += 1
+        if (self.seen - 1) % self.sample:
+            return False
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < 1.0:
+            self.suppressed += 1
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class MessageLog:
+    def __init__(self) -> None:
+        self.ring_size = _env_int("MQTT_LOG_RING", 20)
+        self.ring_chars = _env_int("MQTT_LOG_RING_CHARS", 2000)
+        self.truncate = _env_int("MQTT_LOG_TRUNCATE", 200)
+        self.sample = _env_int("MQTT_LOG_SAMPLE", 1)
+        self.rate = float(_env_int("MQTT_LOG_RATE", 12))
+        self.burst = float(_env_int("MQTT_LOG_BURST", 5))
+        self.overrides = _load_overrides()
+        # (mottagen epoch, payloadlängd, ev. trunkerad payload)
+        self._rings: Dict[str, Deque[Tuple[float, int, str]]] = {}
+        self._counts: Dict[str, int] = {}
+        self._policies: Dict[str, _Policy] = {}
+
+    # --- paho-tråden -----------------------------------------------------
+    def record(self, topic: str, payload: str) -> None:
+        """Spara i ringbufferten (anropas för varje meddelande, ska vara billig)."""
+        ring = self._rings.get(topic)
+        if ring is None:
+            ring = self._rings.setdefault(topic, deque(maxlen=self.ring_size))
+        ring.append((time.time(), len(payload), payload[:self.ring_chars]))
+        self._counts[topic] = self._counts.get(topic, 0) + 1
+
+    def log(self, topic: str, payload: str) -> None:
+        """Logga meddelandet om topicens sampling/rate limit tillåter (MQTT_DEBUG=1)."""
+        pol = self._policies.get(topic)
+        if pol is None:
+            pol = self._policies[topic] = self._policy_for(topic)
+        if not pol.allow():
+            return
+        text = payload if len(payload) <= self.truncate else \
+            f"{payload[:self.truncate]}… ({len(payload)} tecken)"
+        if pol.suppressed:
+            _LOGGER.info("%s <- %s (+%d undertryckta)", topic, text, pol.suppressed)
+            pol.suppressed = 0
+        else:
+            _LOGGER.info("%s <- %s", topic, text)
+
+    def _policy_for(self, topic: str) -> _Policy:
+        cfg: Dict[str, float] = {}
+        for filt, over in self.overrides.items():
+            if topic_matches_sub(filt, topic):
+                cfg = over
+                break
+        return _Policy(int(cfg.get("sample", self.sample)),
+                       float(cfg.get("rate", self.rate)),
+                       float(cfg.get("burst", self.burst)))
+
+    # --- läsning (HTTP) ----------------------------------------------------
+    def dump(self, topic_filter: Optional[str] = None) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for topic, ring in sorted(list(self._rings.items())):
+            if topic_filter and not topic_matches_sub(topic_filter, topic):
+                continue
+            last: List[Dict[str, Any]] = []
+            for ts, size, text in list(ring):
+                try:
+                    body: Any = json.loads(text) if len(text) == size else text
+                except ValueError:
+                    body = text
+                last.append({"ts": round(ts, 3), "bytes": size, "payload": body})
+            out[topic] = {"count": self._counts.get(topic, 0), "last": last}
+        return out
+
+
+message_log = MessageLog()
+
+
+def install(app: Any) -> None:
+    """Registrera GET /debug/mqtt på Flask-servern bakom Dash."""
+    from flask import jsonify, request
+
+    @app.server.route("/debug/mqtt")
+    def _debug_mqtt() -> Any:
+        return jsonify({"ring": message_log.ring_size,
+                        "topics": message_log.dump(request.args.get("topic"))})
@@ -0,0 +1,63 @@
+# mqtt_record.py
+# -------------------------------------------------------------------------
+# Kompakt, append-only inspelning av MQTT-trafik för felsökning och replay.
+#
+# Filformat: 5 bytes huvud (b"FDMQ" + version), därefter poster
+#   <f64 recv_monotonic> <u16 topic-längd> <u32 payload-längd> topic payload
+# (little endian). Payload sparas som råa bytes, exakt som paho levererade dem.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import os
+import struct
+import threading
+from typing import Iterator, Tuple
+
+MAGIC = b"FDMQ\x01"
+_HEAD = struct.Struct("<dHI")
+
+
+class Recorder:
+    """Buffrad skrivare. write() anropas från paho-tråden; flush() från watchdogen."""
+
+    def __init__(self, path: str, buffer_size: int = 64 * 1024) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.path = path
+        self._f = open(path, "ab", buffering=buffer_size)
+        self._lock = threading.Lock()
+        if new:
+            self._f.write(MAGIC)
+
+    def write(self, recv_monotonic: float, topic: str, payload: bytes) -> None:
+        t = topic.encode("utf-8")
+        with self._lock:
+            self._f.write(_HEAD.pack(recv_monotonic, len(t), len(payload)))
+            self._f.write(t)
+            self._f.write(payload)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._f.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+
+def read_records(path: str) -> Iterator[Tuple[float, str, bytes]]:
+    """Läs (recv_monotonic, topic, payload) ur en inspelning. En trunkerad sista post hoppas över."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} är ingen FamilyDash-inspelning")
+        while True:
+            head = f.read(_HEAD.size)
+            if len(head) < _HEAD.size:
+                return
+            ts, tlen, plen = _HEAD.unpack(head)
+            topic = f.read(tlen)
+            payload = f.read(plen)
+            if len(topic) < tlen or len(payload) < plen:
+                return
+            yield ts, topic.decode("utf-8", errors="replace"), payload
@@ -8,15 +8,26 @@
 
 from __future__ import annotations
 
-import copy
+import atexit
+import dataclasses
 import json
+import logging
 import os
 import threading
 import time
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 
 import paho.mqtt.client as mqtt
 
+import metrics
+import sections
+import startup_trace
+from mqtt_log import message_log
+from mqtt_record import Recorder
+from power_integrator import TrapezoidAccumulator
+
 # --- Env -----------------------------------------------------------------
 def _get_port() -> int:
     raw = os.getenv("MQTT_PORT", "1883")
@@ -28,6 +39,11 @@ MQTT_PORT: int           = _get_port()
 MQTT_USER: Optional[str] = os.getenv("MQTT_USER") or None
 MQTT_PASS: Optional[str] = os.getenv("MQTT_PASS") or None
 MQTT_CLIENT: str         = os.getenv("MQTT_CLIENT", "familydash-default")
+# Live-läge för energimodalen: integrera per-enhet-effekt från MQTT
+ENERGY_LIVE: bool        = os.getenv("ENERGY_LIVE", "0") == "1"
+LOCAL_TZ: ZoneInfo       = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
+# Spela in all inkommande trafik till denna fil (t.ex. data/mqtt.rec), se mqtt_record.py
+MQTT_RECORD: Optional[str] = os.getenv("MQTT_RECORD") or None
 
 # --- Topics --------------------------------------------------------------
 TOPIC_CALENDAR_FAM: str   = "home/calendar/familie/next7d"
@@ -51,66 +67,109 @@ TOPIC_AIRQUALITY_RAW: str = "home/env/livingroom/airquality_raw"
 # Weather (från din HA-automation)
 TOPIC_WEATHER: str        = "home/weather"
 
+# Momentan effekt per enhet (W), home/energy/<key>/power. <key> matchar
+# "power_key" i components/energy_modal.DEVICES. Prenumereras bara i live-läge.
+TOPIC_DEVICE_POWER: str   = "home/energy/+/power"
+_DEVICE_POWER_PREFIX: str = "home/energy/"
+
 SHELLY_PREFIX: str        = "shelly-htg3"
 TOPIC_SHELLY: str         = f"{SHELLY_PREFIX}/#"
 
-DEBUG: bool               = True
+# MQTT_DEBUG=1: logga inkommande meddelanden (samplat/rate-limitat, se mqtt_log.py)
+DEBUG: bool               = os.getenv("MQTT_DEBUG", "0") == "1"
 
-# --- Shared snapshot -----------------------------------------------------
-_snapshot: Dict[str, Dict[str, Any]] = {
-    "calendar": {
-        "familie":       {"events_next7d": None,   "ts": None},
-        "fodelsedagar":  {"events_next370d": None, "ts": None},
-    },
-    "washer":       {"status": None, "time_to_end_min": None, "ts": None},
-    "dryer":        {"status": None, "time_left": None, "ts": None},
-    "automower":    {"name": None, "activity": None, "battery": None, "progress": None, "ts": None},
-    "shelly":       {"tC": None, "rh": None, "online": None, "ts": None},
-    "shelly_bht":   {"t": None, "rh": None, "ts": None},
-    "pulse_power":  {"power": None, "power_raw": None, "power_smooth": None, "energy_day_kwh": None, "cost_day": None, "ts": None},
-    "airquality_raw": {
-        "eco2_ppm": None, "tvoc_ppb": None, "aqi": None,
-        "temperature_c": None, "pressure_hpa": None, "humidity_pct": None,
-        "ts": None
-    },
-    "weather": {
-        "condition": None, "temperature": None,
-        "wind_speed": None, "wind_bearing": None,
-        "wind_gust": None, "wind_dir": None, "wind_class": None,
-        "tmax": None, "precipitation": None, "precip_prob_max": None,
-        "uv_max": None, "timestamp": None, "ts": None
-    },
-    "tibber_forecast": {
-        "prices": None,
-        "ts": None
-    },
-    # Additional room sensors (livingroom data is in shelly_bht)
-    "env_office": {"t": None, "rh": None, "ts": None},
-    "env_laundry": {"t": None, "rh": None, "ts": None},
-    "env_bedroom": {"t": None, "rh": None, "ts": None},
-}
+_LOGGER = logging.getLogger("mqtt")
 
-_lock = threading.Lock()
+# --- Shared snapshot -----------------------------------------------------
+# sektion -> frusen post (se sections.py). Poster byts ut, muteras aldrig.
+_snapshot: Dict[str, Any] = sections.empty_snapshot()
+
+# TimedLock (väntetid/hålltid till /metrics) om METRICS=1, annars ett vanligt Lock
+_lock = metrics.snapshot_lock()
+
+# Valfri mätkrok: anropas med sekunder per get_snapshot() (callback_stats)
+_snapshot_timer: Optional[Callable[[float], None]] = None
+
+def set_snapshot_timer(fn: Optional[Callable[[float], None]]) -> None:
+    global _snapshot_timer
+    _snapshot_timer = fn
+
+def get_snapshot() -> Dict[str, Any]:
+    """Grund kopia av snapshoten: posterna är oföränderliga och delas med läsaren."""
+    timer = _snapshot_timer
+    if timer is None:
+        with _lock:
+            return dict(_snapshot)
+    t0 = time.perf_counter()
+    try:
+        with _lock:
+            return dict(_snapshot)
+    finally:
+        timer(time.perf_counter() - t0)
+
+# Lyssnare på sektionsuppdateringar: fn(sektion, ny post), anropas utanför låset
+# från MQTT-tråden (eller bootstrap-tråden). "calendar.familie" osv. för kalendern.
+_listeners: List[Callable[[str, Any], None]] = []
+
+def add_listener(fn: Callable[[str, Any], None], replay: bool = False) -> None:
+    """Registrera fn(sektion, post).
+
+    replay=True kör dessutom fn direkt för varje post som redan finns i
+    snapshoten (nästlade som "calendar.familie"). MQTT och bootstrap startar
+    före de flesta lyssnarmoduler, så data kan ha kommit in innan modulen
+    importerades. Lyssnaren läggs till först: en uppdatering mitt i
+    uppspelningen kan då komma två gånger, men aldrig tappas.
+    """
+    _listeners.append(fn)
+    if not replay:
+        return
+    for name, rec in get_snapshot().items():
+        if hasattr(rec, "ts"):
+            fn(name, rec)
+        else:
+            for sub in sections.field_names(type(rec)):
+                fn(f"{name}.{sub}", getattr(rec, sub))
+
+# Moduler som registrerar lyssnare vid import (add_listener). Appen och
+# tools/mqtt_replay laddar samma lista, så att en uppspelning mäter hela
+# ingest-vägen och inte bara parsningen.
+INGEST_MODULES: Tuple[str, ...] = (
+    "staleness", "calendar_index", "price_planner", "price_alerts", "history",
+    "aggregators", "alerts", "appliance_cycles", "automower_stats",
+)
+
+def load_ingest() -> None:
+    """Importera INGEST_MODULES (idempotent; lyssnarna spelar upp snapshoten)."""
+    import importlib
+    for name in INGEST_MODULES:
+        importlib.import_module(name)
+
+def _notify(section: str, rec: Any) -> None:
+    for fn in _listeners:
+        try:
+            fn(section, rec)
+        except Exception:
+            _LOGGER.exception("listener %s misslyckades för %s", getattr(fn, "__name__", fn), section)
 
-def get_snapshot() -> Dict[str, Dict[str, Any]]:
+def section_ts() -> Dict[str, Optional[int]]:
+    """ts per sektion (nästlade som "calendar.familie"), utan att kopiera data."""
+    out: Dict[str, Optional[int]] = {}
     with _lock:
-        return copy.deepcopy(_snapshot)
+        items = list(_snapshot.items())
+    for name, rec in items:
+        if hasattr(rec, "ts"):
+            out[name] = rec.ts
+        else:
+            for sub in sections.field_names(type(rec)):
+                out[f"{name}.{sub}"] = getattr(rec, sub).ts
+    return out
 
 # --- Helpers -------------------------------------------------------------
 def _now() -> int:
     return int(time.time())
 
-def _to_int(v: Any) -> Optional[int]:
-    try:
-        return int(float(str(v).strip()))
-    except Exception:
-        return None
-
-def _to_float(v: Any) -> Optional[float]:
-    try:
-        return float(str(v).strip())
-    except Exception:
-        return None
+_to_int = sections.to_int
+_to_float = sections.to_float
 
 def _json_payload(payload: str) -> Optional[dict]:
     if not payload:
@@ -123,109 +182,122 @@ def _json_payload(payload: str) -> Optional[dict]:
     except Exception:
         return None
 
-def _set(section: str, **kwargs: Any) -> None:
+# Genererade uppdaterare per posttyp: (d, old, ts) -> ny post
+_UPDATERS: Dict[type, Callable[[Dict[str, Any], Any, Optional[int]], Any]] = {
+    cls: sections.compile_updater(cls)
+    for cls in (sections.Washer, sections.Dryer, sections.Automower, sections.Shelly,
+                sections.RoomClimate, sections.PulsePower, sections.AirQuality, sections.Weather)
+}
+
+def _update(section: str, d: Dict[str, Any], ts: Optional[int] = None) -> None:
+    """Ersätt `section` med en ny post där fälten ur `d` (utom None) är ifyllda."""
+    ts = ts or _now()
     with _lock:
-        _snapshot[section].update({k: v for k, v in kwargs.items() if v is not None})
-        _snapshot[section]["ts"] = _now()
+        old = _snapshot[section]
+        _snapshot[section] = new = _UPDATERS[type(old)](d, old, ts)
+    _notify(section, new)
+
+def seed(section: str, ts: int, **kwargs: Any) -> bool:
+    """Fyll en sektion med värden från annan källa (t.ex. HA-bootstrap).
+
+    `section` kan vara nästlad med punkt, t.ex. "calendar.familie". Skriver
+    bara om sektionen saknar data eller har äldre ts än `ts`, så att färskare
+    MQTT-data aldrig skrivs över. Returnerar True om något skrevs.
+    """
+    top, _, sub = section.partition(".")
+    with _lock:
+        parent = _snapshot.get(top)
+        target = getattr(parent, sub, None) if sub else parent
+        if target is None or not hasattr(target, "ts"):
+            return False
+        if target.ts is not None and target.ts >= ts:
+            return False
+        names = sections.field_names(type(target))
+        values = {k: v for k, v in kwargs.items() if v is not None and k in names and k != "ts"}
+        if not values:
+            return False
+        new = dataclasses.replace(target, ts=ts, **values)
+        _snapshot[top] = dataclasses.replace(parent, **{sub: new}) if sub else new
+    _notify(section, new)
+    return True
 
 # --- Parsers -------------------------------------------------------------
 # Parsers for various topics. Each parser extracts relevant fields from the
-# payload (which may be JSON or plain text) and updates the shared _snapshot.
+# payload (which may be JSON or plain text) and replaces the section record.
 
-def _parse_calendar_fam(payload: str) -> None:
+def _calendar_events(payload: str) -> Optional[tuple]:
     d = _json_payload(payload)
-    if not isinstance(d, dict): return
+    if not isinstance(d, dict): return None
     events = d.get("events", [])
+    return tuple(events) if isinstance(events, list) else ()
+
+def _parse_calendar_fam(payload: str) -> None:
+    events = _calendar_events(payload)
+    if events is None: return
+    feed = sections.FamilyCalendar(events, _now())
     with _lock:
-        _snapshot["calendar"]["familie"]["events_next7d"] = events
-        _snapshot["calendar"]["familie"]["ts"] = _now()
+        _snapshot["calendar"] = sections.Calendar(feed, _snapshot["calendar"].fodelsedagar)
+    _notify("calendar.familie", feed)
 
 def _parse_calendar_bday(payload: str) -> None:
-    d = _json_payload(payload)
-    if not isinstance(d, dict): return
-    events = d.get("events", [])
+    events = _calendar_events(payload)
+    if events is None: return
+    feed = sections.BirthdayCalendar(events, _now())
     with _lock:
-        _snapshot["calendar"]["fodelsedagar"]["events_next370d"] = events
-        _snapshot["calendar"]["fodelsedagar"]["ts"] = _now()
+        _snapshot["calendar"] = sections.Calendar(_snapshot["calendar"].familie, feed)
+    _notify("calendar.fodelsedagar", feed)
 
 def _parse_washer(payload: str) -> None:
-    status = None; minutes = None
     d = _json_payload(payload)
-    if isinstance(d, dict):
-        status = d.get("status")
-        minutes = d.get("time_to_end_min")
-    else:
-        minutes = payload
-    _set("washer", status=status, time_to_end_min=_to_int(minutes))
+    _update("washer", d if isinstance(d, dict) else {"time_to_end_min": payload})
 
 def _parse_dryer(payload: str) -> None:
-    status = None; time_left = None
     d = _json_payload(payload)
-    if isinstance(d, dict):
-        status = d.get("status")
-        time_left = d.get("time_left")
-    else:
-        time_left = payload
-    _set("dryer", status=status, time_left=_to_int(time_left))
+    _update("dryer", d if isinstance(d, dict) else {"time_left": payload})
 
 def _parse_automower(payload: str) -> None:
     d = _json_payload(payload)
     if not isinstance(d, dict): return
-    _set("automower",
-         name=d.get("name"),
-         activity=d.get("activity"),
-         battery=_to_int(d.get("battery")),
-         progress=_to_int(d.get("progress")))
+    _update("automower", d)
 
 def _parse_shelly(topic: str, payload: str) -> None:
     if topic.endswith("/online"):
-        _set("shelly", online=(payload.strip().lower() == "true"))
+        online = payload.strip().lower() == "true"
+        with _lock:
+            _snapshot["shelly"] = new = dataclasses.replace(_snapshot["shelly"], online=online, ts=_now())
+        _notify("shelly", new)
         return
     d = _json_payload(payload)
     if isinstance(d, dict):
-        tC = _to_float(d.get("tC") or d.get("temperature"))
-        rh = _to_float(d.get("rh") or d.get("humidity") or d.get("hum"))
-        _set("shelly", tC=tC, rh=rh)
+        _update("shelly", {"tC": d.get("tC") or d.get("temperature"),
+                           "rh": d.get("rh") or d.get("humidity") or d.get("hum")})
         return
     low = topic.lower()
     if any(k in low for k in ("/temp", "/temperature")):
-        _set("shelly", tC=_to_float(payload)); return
+        _update("shelly", {"tC": payload}); return
     if any(k in low for k in ("/hum", "/humidity", "/rh")):
-        _set("shelly", rh=_to_float(payload)); return
+        _update("shelly", {"rh": payload}); return
 
 def _parse_shelly_bht(payload: str) -> None:
     d = _json_payload(payload)
     if not isinstance(d, dict): return
-    _set("shelly_bht",
-         t=_to_float(d.get("t")),
-         rh=_to_float(d.get("rh")))
+    _update("shelly_bht", d)
 
 def _parse_env_room(section: str, payload: str) -> None:
     """Generic parser for environment room sensors (office, laundry, bedroom)"""
     d = _json_payload(payload)
     if not isinstance(d, dict): return
-    _set(section,
-         t=_to_float(d.get("t")),
-         rh=_to_float(d.get("rh")))
+    _update(section, d)
 
 def _parse_power(payload: str) -> None:
     d = _json_payload(payload)
     if not isinstance(d, dict): return
     ts_iso = d.get("ts")
     try:
-        from datetime import datetime as _dt
-        ts_epoch = int(_dt.fromisoformat(ts_iso).timestamp()) if ts_iso else None
+        ts_epoch = int(datetime.fromisoformat(ts_iso).timestamp()) if ts_iso else None
     except Exception:
         ts_epoch = None
-    with _lock:
-        _snapshot["pulse_power"].update({k: v for k, v in {
-            "power":          _to_float(d.get("power")),
-            "power_raw":      _to_float(d.get("power_raw")),
-            "power_smooth":   _to_float(d.get("power_smooth")),
-            "energy_day_kwh": _to_float(d.get("energy_day_kwh")),
-            "cost_day":       _to_float(d.get("cost_day")),
-            "ts":             ts_epoch if ts_epoch else _now(),
-        }.items() if v is not None})
+    _update("pulse_power", d, ts_epoch)
 
 def _parse_tibber_forecast(payload: str) -> None:
     """Parse JSON array from home/tibber/forecast/json (published by HA)."""
@@ -238,57 +310,62 @@ def _parse_tibber_forecast(payload: str) -> None:
     if not isinstance(prices, list):
         return
 
-    # Convert price from SEK to öre (multiply by 100)
-    processed = []
-    for item in prices:
-        if isinstance(item, dict):
-            processed.append({
-                "startsAt": item.get("start_time"),
-                "energy_ore": _to_float(item.get("price")) * 100 if item.get("price") else None,
-                "level": item.get("level")
-            })
-
+    # Kolumner, öre, nivåkoder, färger och statistik räknas här, en gång
+    forecast = sections.tibber_forecast(prices, _now())
     with _lock:
-        _snapshot["tibber_forecast"]["prices"] = processed
-        _snapshot["tibber_forecast"]["ts"] = _now()
+        _snapshot["tibber_forecast"] = forecast
+    _notify("tibber_forecast", forecast)
+
 
+_power_acc: Dict[str, TrapezoidAccumulator] = {}
+
+def _parse_device_power(topic: str, payload: str) -> None:
+    """home/energy/<key>/power -> W (ren siffra eller JSON {"power": W})."""
+    key = topic[len(_DEVICE_POWER_PREFIX):].split("/", 1)[0]
+    if not key:
+        return
+    d = _json_payload(payload)
+    watts = _to_float(d.get("power")) if isinstance(d, dict) else _to_float(payload)
+    if watts is None:
+        return
+    now = time.time()
+    with _lock:
+        acc = _power_acc.get(key)
+        if acc is None:
+            acc = _power_acc[key] = TrapezoidAccumulator(LOCAL_TZ)
+        kwh = acc.add(now, max(0.0, watts))
+        old = _snapshot["device_power"]
+        _snapshot["device_power"] = new = sections.DevicePower(
+            {**old.w, key: watts}, {**old.kwh, key: kwh}, int(now))
+    _notify("device_power", new)
+
+def device_kwh_today() -> Dict[str, float]:
+    """Integrerad förbrukning idag per enhetsnyckel (0 för enheter som tystnat före midnatt).
+
+    Enheter vars integrering inte täcker hela dygnet (startade efter midnatt)
+    utelämnas, så att anroparen faller tillbaka på HA:s statistik för dem.
+    """
+    now = time.time()
+    with _lock:
+        return {key: acc.kwh_at(now) for key, acc in _power_acc.items() if acc.whole_day}
 
 def _parse_airquality_raw(payload: str) -> None:
     d = _json_payload(payload)
     if not isinstance(d, dict): return
-    _set("airquality_raw",
-         eco2_ppm=_to_int(d.get("eco2_ppm")),
-         tvoc_ppb=_to_int(d.get("tvoc_ppb")),
-         aqi=_to_int(d.get("aqi")),
-         temperature_c=_to_float(d.get("temperature_c")),
-         pressure_hpa=_to_float(d.get("pressure_hpa")),
-         humidity_pct=_to_float(d.get("humidity_pct")))
+    _update("airquality_raw", d)
 
 def _parse_weather(payload: str) -> None:
     """Parse JSON from home/weather (published by HA automation)."""
     d = _json_payload(payload)
     if not isinstance(d, dict):
         return
-    _set(
-        "weather",
-        condition=d.get("condition"),
-        temperature=_to_float(d.get("temperature")),
-        wind_speed=_to_float(d.get("wind_speed")),          # m/s enligt vår payload
-        wind_bearing=_to_float(d.get("wind_bearing")),
-        wind_gust=_to_float(d.get("wind_gust")),
-        wind_dir=d.get("wind_dir"),
-        wind_class=d.get("wind_class"),
-        tmax=_to_float(d.get("tmax")),
-        precipitation=_to_float(d.get("precipitation")),
-        precip_prob_max=_to_int(d.get("precip_prob_max")),
-        uv_max=_to_float(d.get("uv_max")),
-        timestamp=d.get("timestamp"),
-    )
+    _update("weather", d)
 
 # --- MQTT callbacks (Paho v2) -------------------------------------------
 def _on_connect(cli: mqtt.Client, _ud: Any, _flags: Any,
                 reason_code: mqtt.ReasonCodes, _props: mqtt.Properties | None = None) -> None:
-    print(f"[mqtt] connected reason_code={reason_code}, id={MQTT_CLIENT}")
+    _LOGGER.info("connected reason_code=%s, id=%s", reason_code, MQTT_CLIENT)
+    startup_trace.mark("mqtt_connected")
     _mark_alive()
     status_topic = f"clients/{MQTT_CLIENT}/status"
     cli.publish(status_topic, payload="online", qos=1, retain=True)
@@ -308,12 +385,14 @@ def _on_connect(cli: mqtt.Client, _ud: Any, _flags: Any,
     cli.subscribe(TOPIC_ENV_OFFICE, qos=0)
     cli.subscribe(TOPIC_ENV_LAUNDRY, qos=0)
     cli.subscribe(TOPIC_ENV_BEDROOM, qos=0)
+    if ENERGY_LIVE:
+        cli.subscribe(TOPIC_DEVICE_POWER, qos=0)
 
-    print("[mqtt] subscribed:",
-          TOPIC_WASHER, TOPIC_DRYER, TOPIC_AUTOMOWER, TOPIC_SHELLY,
-          TOPIC_SHELLY_BHT, TOPIC_POWER, TOPIC_AIRQUALITY_RAW,
-          TOPIC_CALENDAR_FAM, TOPIC_CALENDAR_BDAY, TOPIC_WEATHER, TOPIC_TIBBER_FORECAST,
-          TOPIC_ENV_OFFICE, TOPIC_ENV_LAUNDRY, TOPIC_ENV_BEDROOM)
+    _LOGGER.info("subscribed: %s", " ".join((
+        TOPIC_WASHER, TOPIC_DRYER, TOPIC_AUTOMOWER, TOPIC_SHELLY,
+        TOPIC_SHELLY_BHT, TOPIC_POWER, TOPIC_AIRQUALITY_RAW,
+        TOPIC_CALENDAR_FAM, TOPIC_CALENDAR_BDAY, TOPIC_WEATHER, TOPIC_TIBBER_FORECAST,
+        TOPIC_ENV_OFFICE, TOPIC_ENV_LAUNDRY, TOPIC_ENV_BEDROOM)))
 
 # --- Liveness watchdog --------------------------------------------------
 # Paho's loop_start auto-reconnects on graceful disconnects (broker FIN,
@@ -331,67 +410,107 @@ def _mark_alive() -> None:
     global _last_msg_ts
     _last_msg_ts = time.monotonic()
 
+def ingest_lag() -> Optional[float]:
+    """Sekunder sedan senaste brokertrafik (None innan klienten startat)."""
+    if not _last_msg_ts:
+        return None
+    return time.monotonic() - _last_msg_ts
+
 def _watchdog_loop(cli: mqtt.Client) -> None:
     while True:
         time.sleep(WATCHDOG_INTERVAL_S)
+        if _recorder is not None:
+            try:
+                _recorder.flush()
+            except Exception as e:
+                _LOGGER.warning("recorder: flush failed: %s", e)
         try:
             stale = time.monotonic() - _last_msg_ts
             if stale > WATCHDOG_STALE_S:
-                print(f"[mqtt] watchdog: no broker traffic for {stale:.0f}s "
-                      f"(is_connected={cli.is_connected()}) - forcing reconnect")
+                _LOGGER.warning("watchdog: no broker traffic for %.0fs (is_connected=%s) - forcing reconnect",
+                                stale, cli.is_connected())
                 # Bump _last_msg_ts so we don't re-fire while the reconnect
                 # handshake is still in flight; a real message (or the next
                 # stale interval) will move things forward from here.
                 _mark_alive()
+                metrics.MQTT_WATCHDOG_RECONNECTS.inc()
                 try:
                     cli.reconnect()
                 except Exception as e:
-                    print(f"[mqtt] watchdog: reconnect() raised: {e}")
+                    _LOGGER.warning("watchdog: reconnect() raised: %s", e)
         except Exception as e:
-            print(f"[mqtt] watchdog: unexpected error: {e}")
+            _LOGGER.error("watchdog: unexpected error: %s", e)
 
 def _on_disconnect(cli: mqtt.Client, _ud: Any, _flags: Any,
                    reason_code: mqtt.ReasonCodes,
                    _props: mqtt.Properties | None = None) -> None:
     # Paho v2 CallbackAPIVersion.VERSION2 calls this with 5 positional args:
     # (client, userdata, disconnect_flags, reason_code, properties).
-    print(f"[mqtt] disconnected reason_code={reason_code}, id={MQTT_CLIENT}")
+    _LOGGER.warning("disconnected reason_code=%s, id=%s", reason_code, MQTT_CLIENT)
+    metrics.MQTT_DISCONNECTS.inc()
     # Recovery is handled by Paho's reconnect_delay_set (for drops Paho
     # observes) and _watchdog_loop (for the wedged-loop / half-open case).
 
+_recorder: Optional[Recorder] = None
+
 def _on_message(_cli: mqtt.Client, _ud: Any, msg: mqtt.MQTTMessage) -> None:
     _mark_alive()
+    if startup_trace.ENABLED:
+        startup_trace.message()
+    if _recorder is not None:
+        _recorder.write(time.monotonic(), msg.topic, msg.payload)
     payload = msg.payload.decode("utf-8", errors="replace").strip()
+    message_log.record(msg.topic, payload)
     if DEBUG:
-        print(f"[mqtt] {msg.topic} <- {payload}")
-
-    if msg.topic == TOPIC_CALENDAR_FAM:     _parse_calendar_fam(payload);  return
-    if msg.topic == TOPIC_CALENDAR_BDAY:    _parse_calendar_bday(payload); return
-    if msg.topic == TOPIC_WASHER:           _parse_washer(payload);        return
-    if msg.topic == TOPIC_DRYER:            _parse_dryer(payload);         return
-    if msg.topic == TOPIC_AUTOMOWER:        _parse_automower(payload);     return
-    if msg.topic.startswith(SHELLY_PREFIX): _parse_shelly(msg.topic, payload); return
-    if msg.topic == TOPIC_SHELLY_BHT:       _parse_shelly_bht(payload);    return
-    if msg.topic == TOPIC_POWER:            _parse_power(payload);         return
-    if msg.topic == TOPIC_TIBBER_FORECAST:  _parse_tibber_forecast(payload); return
-    if msg.topic == TOPIC_AIRQUALITY_RAW:   _parse_airquality_raw(payload);return
-    if msg.topic == TOPIC_WEATHER:          _parse_weather(payload);       return
+        message_log.log(msg.topic, payload)
+    if not metrics.ENABLED:
+        _dispatch(msg.topic, payload)
+        return
+    t0 = time.perf_counter()
+    _dispatch(msg.topic, payload)
+    metrics.MQTT_PARSE_SECONDS.observe(time.perf_counter() - t0, msg.topic)
+    metrics.MQTT_MESSAGES.inc(msg.topic)
+
+def _dispatch(topic: str, payload: str) -> None:
+    """Route a decoded payload to its parser (also used by tools/mqtt_replay)."""
+    if topic == TOPIC_CALENDAR_FAM:     _parse_calendar_fam(payload);  return
+    if topic == TOPIC_CALENDAR_BDAY:    _parse_calendar_bday(payload); return
+    if topic == TOPIC_WASHER:           _parse_washer(payload);        return
+    if topic == TOPIC_DRYER:            _parse_dryer(payload);         return
+    if topic == TOPIC_AUTOMOWER:        _parse_automower(payload);     return
+    if topic.startswith(SHELLY_PREFIX): _parse_shelly(topic, payload); return
+    if topic == TOPIC_SHELLY_BHT:       _parse_shelly_bht(payload);    return
+    if topic == TOPIC_POWER:            _parse_power(payload);         return
+    if topic == TOPIC_TIBBER_FORECAST:  _parse_tibber_forecast(payload); return
+    if topic == TOPIC_AIRQUALITY_RAW:   _parse_airquality_raw(payload);return
+    if topic == TOPIC_WEATHER:          _parse_weather(payload);       return
     # Room sensors
-    if msg.topic == TOPIC_ENV_OFFICE:       _parse_env_room("env_office", payload); return
-    if msg.topic == TOPIC_ENV_LAUNDRY:      _parse_env_room("env_laundry", payload); return
-    if msg.topic == TOPIC_ENV_BEDROOM:      _parse_env_room("env_bedroom", payload); return
+    if topic == TOPIC_ENV_OFFICE:       _parse_env_room("env_office", payload); return
+    if topic == TOPIC_ENV_LAUNDRY:      _parse_env_room("env_laundry", payload); return
+    if topic == TOPIC_ENV_BEDROOM:      _parse_env_room("env_bedroom", payload); return
+    if topic.startswith(_DEVICE_POWER_PREFIX): _parse_device_power(topic, payload); return
 
 # --- Start (idempotent, bakgrundstråd) ----------------------------------
 def start() -> None:
     if not MQTT_ENABLE:
-        print("[mqtt] disabled (MQTT_ENABLE=0)"); return
+        _LOGGER.info("disabled (MQTT_ENABLE=0)"); return
     if getattr(start, "_started", False):
         return
     start._started = True  # type: ignore[attr-defined]
 
+    global _recorder
+    if MQTT_RECORD:
+        try:
+            _recorder = Recorder(MQTT_RECORD)
+            atexit.register(_recorder.flush)
+            _LOGGER.info("recording to %s", MQTT_RECORD)
+        except Exception as e:
+            _LOGGER.warning("recorder: could not open %s: %s", MQTT_RECORD, e)
+
     def _loop() -> None:
         try:
-            print(f"[mqtt] host={MQTT_HOST} port={MQTT_PORT} id={MQTT_CLIENT} user={'set' if MQTT_USER else 'none'}")
+            _LOGGER.info("host=%s port=%s id=%s user=%s", MQTT_HOST, MQTT_PORT, MQTT_CLIENT,
+                         "set" if MQTT_USER else "none")
             cli = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=MQTT_CLIENT)
             if MQTT_USER:
                 cli.username_pw_set(MQTT_USER, MQTT_PASS)
@@ -413,7 +532,7 @@ def start() -> None:
 
             cli.connect(MQTT_HOST, MQTT_PORT, keepalive=60)
             cli.loop_start()
-            print("[mqtt] loop started")
+            _LOGGER.info("loop started")
 
             # Independent watchdog: catches the half-open-socket case where
             # Paho's loop is stuck on a dead recv() and never observes the
@@ -421,6 +540,6 @@ def start() -> None:
             threading.Thread(target=_watchdog_loop, args=(cli,),
                              name="mqtt-watchdog", daemon=True).start()
         except Exception as e:
-            print(f"[mqtt] ERROR: {e}")
+            _LOGGER.error("ERROR: %s", e)
 
     threading.Thread(target=_loop, name="mqtt-loop", daemon=True).start()
@@ -0,0 +1,67 @@
+# power_integrator.py
+# -------------------------------------------------------------------------
+# Inkrementell W -> kWh-integrering för enheter som publicerar momentan effekt.
+#
+# Varje sample kostar O(1): trapetsregeln mellan föregående och aktuellt
+# sample adderas till dygnets summa. Vid lokal midnatt delas intervallet
+# (effekten interpoleras linjärt fram till midnatt) och summan nollställs.
+# Summan är komplett först efter första midnatten (whole_day); dessförinnan
+# saknas allt som förbrukats mellan midnatt och första samplet.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+
+def _next_midnight(ts: float, tz: ZoneInfo) -> float:
+    d = datetime.fromtimestamp(ts, tz).date() + timedelta(days=1)
+    return datetime(d.year, d.month, d.day, tzinfo=tz).timestamp()
+
+
+class TrapezoidAccumulator:
+    """Dygnsenergi (kWh) för en enhet, integrerad från effektsamples (W)."""
+
+    __slots__ = ("tz", "kwh", "day_end", "last_ts", "last_w", "whole_day")
+
+    def __init__(self, tz: ZoneInfo) -> None:
+        self.tz = tz
+        self.kwh: float = 0.0
+        self.day_end: float = 0.0            # epoch för nästa midnatt (nollställning)
+        self.last_ts: Optional[float] = None
+        self.last_w: Optional[float] = None
+        self.whole_day: bool = False
+
+    def add(self, ts: float, watts: float) -> float:
+        """Lägg till ett sample och returnera dygnets kWh hittills."""
+        if self.last_ts is None or self.last_w is None:
+            self.day_end = _next_midnight(ts, self.tz)
+            self.last_ts, self.last_w = ts, watts
+            return self.kwh
+        if ts <= self.last_ts:
+            self.last_w = watts                # samma/äldre tidpunkt: bara ny nivå
+            return self.kwh
+
+        if ts >= self.day_end:
+            # Dela intervallet vid midnatt; delen före hör till gårdagen.
+            new_end = _next_midnight(ts, self.tz)
+            if new_end == _next_midnight(self.day_end, self.tz):
+                frac = (self.day_end - self.last_ts) / (ts - self.last_ts)
+                w_mid = self.last_w + (watts - self.last_w) * frac
+                self.last_ts, self.last_w = self.day_end, w_mid
+                self.whole_day = True
+            else:
+                self.last_ts = ts              # lucka över ett helt dygn: börja om
+                self.whole_day = False
+            self.kwh = 0.0
+            self.day_end = new_end
+
+        self.kwh += (self.last_w + watts) * 0.5 * (ts - self.last_ts) / 3_600_000.0
+        self.last_ts, self.last_w = ts, watts
+        return self.kwh
+
+    def kwh_at(self, ts: float) -> float:
+        """Dygnets kWh vid `ts` (0 om senaste sample var ett tidigare dygn)."""
+        return self.kwh if ts < self.day_end else 0.0
@@ -0,0 +1,158 @@
+# price_alerts.py
+# -------------------------------------------------------------------------
+# Aktuellt elpris och prislarm ur Tibber-prognosen.
+#
+# Ett larm är en regel "över/under X öre/kWh i minst N minuter framåt".
+# När prognosen uppdateras (mqtt_subscriber-lyssnare) räknas för varje
+# regel, bakifrån, hur långt den följd av slots som uppfyller villkoret
+# sträcker sig från varje slot; ett larm är aktivt i slot i om följden
+# från i räcker minst N minuter. Nuvarande slot slås upp med bisect över
+# starttiderna (TibberForecast.index).
+#
+# Utvärderingen körs bara när prognosen byts och vid varje slotgräns, via
+# scheduler. Resultatet (PriceNow) ligger färdigt tills dess; tilen läser
+# det och de-dupar på sekvensnumret, så en tick kostar en jämförelse.
+#
+#   price_alerts.current()   -> (seq, PriceNow eller None)
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import mqtt_subscriber
+import scheduler
+from sections import TibberForecast
+
+_LOGGER = logging.getLogger("price")
+
+_TZ = ZoneInfo(os.getenv("LOCAL_TZ", "Europe/Stockholm"))
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    label: str
+    above: bool          # True: larm när priset är över gränsen
+    ore: float
+    minutes: float
+
+
+# namn -> regel; gränserna kan sättas i miljön
+RULES: Dict[str, Rule] = {
+    "high": Rule("Dyrt", True, float(os.getenv("PRICE_HIGH_ORE", "150")),
+                 float(os.getenv("PRICE_HIGH_MIN", "120"))),
+    "low":  Rule("Billigt", False, float(os.getenv("PRICE_LOW_ORE", "30")),
+                 float(os.getenv("PRICE_LOW_MIN", "120"))),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Alert:
+    name: str
+    text: str
+    until: float         # epoch då följden tar slut
+
+
+@dataclass(frozen=True, slots=True)
+class PriceNow:
+    start: float
+    end: float
+    ore: float
+    level: int
+    color: str
+    next_ore: Optional[float]
+    alerts: Tuple[Alert, ...]
+
+
+def run_ends(ore: Tuple[float, ...], rule: Rule) -> List[int]:
+    """För varje slot i: första slot efter i där villkoret inte längre gäller."""
+    out = [0] * len(ore)
+    end = len(ore)
+    for i in range(len(ore) - 1, -1, -1):
+        if not (ore[i] > rule.ore if rule.above else ore[i] < rule.ore):
+            end = i
+        out[i] = end
+    return out
+
+
+def _alert(name: str, rule: Rule, fc: TibberForecast, i: int, end: int, tz: Any) -> Optional[Alert]:
+    if (end - i) * fc.slot_s < rule.minutes * 60:
+        return None
+    until = fc.starts[i] + (end - i) * fc.slot_s
+    hhmm = datetime.fromtimestamp(until, tz).strftime("%H:%M")
+    word = "över" if rule.above else "under"
+    return Alert(name, f"{rule.label}: {word} {rule.ore:.0f} öre till {hhmm}", until)
+
+
+def evaluate(fc: TibberForecast, ends: Dict[str, List[int]], now: float, tz: Any) -> Optional[PriceNow]:
+    """Läget i slotten som pågår vid `now`, None utanför prognosen."""
+    i = fc.index(now)
+    if i is None:
+        return None
+    alerts = tuple(a for name, rule in RULES.items()
+                   if (a := _alert(name, rule, fc, i, ends[name][i], tz)) is not None)
+    nxt = fc.ore[i + 1] if i + 1 < len(fc.ore) else None
+    start = fc.starts[i]
+    return PriceNow(start, start + fc.slot_s, fc.ore[i], fc.levels[i], fc.colors[i], nxt, alerts)
+
+
+# --- Tillstånd -------------------------------------------------------------
+_lock = threading.Lock()
+_fc = TibberForecast()
+_ends: Dict[str, List[int]] = {name: [] for name in RULES}
+_generation: Optional[int] = None
+_state: Tuple[int, Optional[PriceNow]] = (0, None)    # byts ut i ett stycke
+_timer: Optional[scheduler.Handle] = None
+
+
+def current() -> Tuple[int, Optional[PriceNow]]:
+    """(sekvensnummer, läget); numret ökar vid varje omvärdering."""
+    return _state
+
+
+def _reevaluate(due: float = 0.0) -> None:
+    """Räkna om läget och boka nästa slotgräns. Kallas med _lock hållet."""
+    global _state, _timer
+    now = max(time.time(), due)              # aldrig kvar i slotten som just tog slut
+    seq, old = _state
+    prev = {a.name for a in old.alerts} if old else set()
+    cur = evaluate(_fc, _ends, now, _TZ)
+    _state = (seq + 1, cur)
+    for a in (cur.alerts if cur else ()):
+        if a.name not in prev:
+            _LOGGER.info("prislarm: %s", a.text)
+    if _timer is not None:
+        _timer.cancel()
+        _timer = None
+    if cur is not None:
+        _timer = scheduler.call_at(cur.end, _on_boundary, cur.end)
+    elif _fc.starts and now < _fc.starts[0]:
+        _timer = scheduler.call_at(_fc.starts[0], _on_boundary, _fc.starts[0])
+
+
+def _on_boundary(due: float) -> None:
+    with _lock:
+        _reevaluate(due)
+
+
+def _on_update(section: str, rec: Any) -> None:
+    global _fc, _ends, _generation
+    if section != "tibber_forecast":
+        return
+    with _lock:
+        if rec.ts is not None and _generation is not None and rec.ts < _generation:
+            return
+        _fc = rec
+        _ends = {name: run_ends(rec.ore, rule) for name, rule in RULES.items()}
+        _generation = rec.ts
+        _reevaluate()
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
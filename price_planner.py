@@ -0,0 +1,251 @@
+# price_planner.py
+# -------------------------------------------------------------------------
+# Billigaste sammanhängande körfönster per apparat ur Tibber-prognosen.
+#
+# En profil är segment (minuter, kW), t.ex. tvättmaskinens uppvärmning
+# följt av centrifugering. Profilen blir en vikt per prisslot (kWh i
+# slotten) och vikterna delas i följder med samma värde; kostnaden för
+# varje start är då en summa glidande fönstersummor ur en prefixsumma, O(n)
+# per följd (vektoriserat med NumPy när det finns).
+#
+# Allt som beror på prognosen räknas en gång per prognosgeneration, när
+# tibber_forecast uppdateras (mqtt_subscriber-lyssnare): kostnad per start
+# och, bakifrån, billigaste start från och med varje slot. En fråga
+# (plan()) är sedan en bisect på nuvarande tid och två uppslagningar.
+#
+#   price_planner.plan("washer")  -> Plan(start, end, cost_kr, now_cost_kr)
+#   GET /api/plan                 -> alla profiler
+#   GET /api/plan?minutes=90&kw=2 -> godtyckligt platt fönster (400 om längre
+#                                    än prognosen eller kw > KW_MAX)
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import bisect
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import mqtt_subscriber
+from sections import TibberForecast
+
+try:
+    import numpy as np
+except ImportError:                       # pragma: no cover - numpy står i requirements.txt;
+    np = None                             # window_costs faller då tillbaka på ren Python
+
+_LOGGER = logging.getLogger("planner")
+
+KW_MAX: float = 50.0                      # övre gräns för /api/plan?kw= (mer än husets säkring)
+
+# apparat -> segment (minuter, kW)
+PROFILES: Dict[str, Tuple[Tuple[float, float], ...]] = {
+    "washer":  ((20, 2.0), (90, 0.25), (15, 0.5)),   # uppvärmning, tvätt, centrifug
+    "dryer":   ((120, 2.2),),
+    "laddbox": ((240, 11.0),),
+    "vvb":     ((180, 3.0),),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    start: float          # epoch; nu om billigast är att starta direkt
+    end: float
+    cost_kr: float
+    now_cost_kr: float    # kostnad om man startar i nuvarande slot
+
+    @property
+    def saving_kr(self) -> float:
+        return self.now_cost_kr - self.cost_kr
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"start": self.start, "end": self.end, "cost_kr": round(self.cost_kr, 2),
+                "now_cost_kr": round(self.now_cost_kr, 2), "saving_kr": round(self.saving_kr, 2)}
+
+
+class _Table:
+    """Kostnad per start och billigaste start från varje slot, för en profil."""
+    __slots__ = ("cost", "best", "span")
+
+    def __init__(self, cost: Sequence[float], span: float) -> None:
+        self.cost = cost
+        self.span = span
+        best: List[int] = [0] * len(cost)
+        b = len(cost) - 1
+        for i in range(len(cost) - 1, -1, -1):
+            if cost[i] <= cost[b]:                # lika: tidigaste start vinner
+                b = i
+            best[i] = b
+        self.best = best
+
+
+# --- Beräkning -------------------------------------------------------------
+def _weights(profile: Sequence[Tuple[float, float]], slot_min: float) -> List[float]:
+    """kWh per slot för profilen med start i början av en slot."""
+    total = sum(m for m, _kw in profile)
+    w = [0.0] * max(1, math.ceil(total / slot_min - 1e-9))
+    t = 0.0
+    for minutes, kw in profile:
+        end = t + minutes
+        while t < end - 1e-9:
+            i = int(t // slot_min)
+            step = min(end, (i + 1) * slot_min) - t
+            w[i] += kw * step / 60
+            t += step
+    return w
+
+
+def _runs(w: Sequence[float]) -> List[Tuple[int, int, float]]:
+    """Följder (från, till, vikt) med samma vikt."""
+    runs: List[Tuple[int, int, float]] = []
+    s = 0
+    for i in range(1, len(w) + 1):
+        if i == len(w) or w[i] != w[s]:
+            runs.append((s, i, w[s]))
+            s = i
+    return runs
+
+
+def window_costs(prices: Sequence[float], w: Sequence[float], use_numpy: bool = True) -> List[float]:
+    """Kostnad (samma enhet som prices × kWh) för varje start där profilen ryms."""
+    n = len(prices) - len(w) + 1
+    if n <= 0:
+        return []
+    runs = _runs(w)
+    if use_numpy and np is not None:
+        pre = np.concatenate(([0.0], np.cumsum(np.asarray(prices, dtype=float))))
+        cost = np.zeros(n)
+        for s, e, wt in runs:
+            cost += wt * (pre[e:e + n] - pre[s:s + n])
+        return cost.tolist()
+    pre = [0.0, *accumulate(prices)]
+    cost = [0.0] * n
+    for s, e, wt in runs:
+        for i in range(n):
+            cost[i] += wt * (pre[i + e] - pre[i + s])
+    return cost
+
+
+def _slots(fc: TibberForecast) -> Tuple[List[float], List[float], float]:
+    """(starttider, öre/kWh, slotlängd i s) fram till första lucka i prognosen."""
+    starts, slot = fc.starts, fc.slot_s
+    n = len(starts)
+    for i in range(1, n):
+        if starts[i] - starts[i - 1] != slot:
+            n = i
+            break
+    return list(starts[:n]), list(fc.ore[:n]), slot
+
+
+def build(fc: TibberForecast, profiles: Dict[str, Sequence[Tuple[float, float]]] = PROFILES,
+          use_numpy: bool = True) -> "_Forecast":
+    starts, ore, slot = _slots(fc)
+    tables: Dict[str, _Table] = {}
+    for name, profile in profiles.items():
+        w = _weights(profile, slot / 60)
+        tables[name] = _Table(window_costs(ore, w, use_numpy), sum(m for m, _kw in profile) * 60)
+    return _Forecast(starts, ore, slot, tables)
+
+
+class _Forecast:
+    __slots__ = ("starts", "ore", "slot", "tables")
+
+    def __init__(self, starts: List[float], ore: List[float], slot: float,
+                 tables: Dict[str, _Table]) -> None:
+        self.starts = starts
+        self.ore = ore
+        self.slot = slot
+        self.tables = tables
+
+    @property
+    def span_min(self) -> float:
+        """Prognosens längd i minuter; längre fönster ryms aldrig."""
+        return len(self.starts) * self.slot / 60
+
+    def plan(self, table: _Table, now: float) -> Optional[Plan]:
+        i0 = max(0, bisect.bisect_right(self.starts, now) - 1)
+        if i0 >= len(table.cost) or now >= self.starts[-1] + self.slot:
+            return None                           # prognosen räcker inte för hela fönstret
+        b = table.best[i0]
+        start = max(self.starts[b], now)
+        return Plan(start, start + table.span, table.cost[b] / 100, table.cost[i0] / 100)
+
+
+# --- Tillstånd -------------------------------------------------------------
+_forecast = build(TibberForecast())
+_generation: Optional[int] = None
+
+
+def plan(appliance: str, now: Optional[float] = None) -> Optional[Plan]:
+    """Billigaste start från nu för en profil i PROFILES, None utan prognos."""
+    fc = _forecast
+    table = fc.tables.get(appliance)
+    if table is None:
+        return None
+    return fc.plan(table, time.time() if now is None else now)
+
+
+def plan_custom(profile: Sequence[Tuple[float, float]], now: Optional[float] = None) -> Optional[Plan]:
+    """Som plan() men för en godtycklig profil, räknad direkt mot aktuell prognos."""
+    fc = _forecast
+    if sum(m for m, _kw in profile) > fc.span_min:
+        return None                               # ryms inte; bygg inga vikter
+    table = _Table(window_costs(fc.ore, _weights(profile, fc.slot / 60)),
+                   sum(m for m, _kw in profile) * 60)
+    return fc.plan(table, time.time() if now is None else now)
+
+
+def tile_text(appliance: str, tz: Any, now: Optional[float] = None) -> Optional[str]:
+    """Rad för apparatens tile: "Billigast HH:MM (−X kr)" eller "Billigast nu"."""
+    now = time.time() if now is None else now
+    p = plan(appliance, now)
+    if p is None:
+        return None
+    if p.start <= now or p.saving_kr < 0.005:
+        return "Billigast nu"
+    hhmm = datetime.fromtimestamp(p.start, tz).strftime("%H:%M")
+    return f"Billigast {hhmm} (−{p.saving_kr:.2f} kr)"
+
+
+def _on_update(section: str, rec: Any) -> None:
+    global _forecast, _generation
+    if section != "tibber_forecast":
+        return
+    if rec.ts is not None and _generation is not None and rec.ts < _generation:
+        return
+    t0 = time.perf_counter()
+    _forecast = build(rec)
+    _generation = rec.ts
+    _LOGGER.debug("planer för %d slots (%.0f min) på %.2f ms", len(_forecast.starts),
+                  _forecast.slot / 60, (time.perf_counter() - t0) * 1000)
+
+
+def install(app: Any) -> None:
+    """Registrera /api/plan på Flask-servern bakom Dash."""
+    from flask import jsonify, request
+
+    @app.server.route("/api/plan")
+    def _api_plan() -> Any:
+        fc, now = _forecast, time.time()
+        out: Dict[str, Any] = {"generation": _generation, "resolution_min": fc.slot / 60}
+        minutes = request.args.get("minutes", type=float)
+        if minutes is not None:
+            if not 0 < minutes <= fc.span_min:
+                return jsonify({"error": f"minutes måste vara > 0 och högst {fc.span_min:g} "
+                                         "(prognosens längd)"}), 400
+            kw = request.args.get("kw", 1.0, type=float)
+            if not 0 < kw <= KW_MAX:
+                return jsonify({"error": f"kw måste vara > 0 och högst {KW_MAX:g}"}), 400
+            p = plan_custom(((minutes, kw),), now)
+            out["plan"] = p.as_dict() if p else None
+            return jsonify(out)
+        out["plans"] = {name: (p.as_dict() if (p := fc.plan(t, now)) else None)
+                        for name, t in fc.tables.items()}
+        return jsonify(out)
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
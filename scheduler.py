@@ -0,0 +1,87 @@
+# scheduler.py
+# -------------------------------------------------------------------------
+# En gemensam timertråd för hela appen.
+#
+# Jobb läggs i en min-heap sorterad på väggklocka (time.time(), samma bas
+# som snapshotens ts) och körs på tråden "scheduler" när de förfaller.
+# Tråden sover tills nästa deadline eller tills ett tidigare jobb läggs in,
+# så inga periodiska kontroller behövs. Jobben ska vara korta; tyngre
+# arbete lämnas vidare till en egen tråd.
+#
+#   h = scheduler.call_at(ts + 600, fn, arg)
+#   h = scheduler.call_later(30, fn)
+#   h.cancel()
+#
+# Avbokade jobb ligger kvar i heapen tills de förfaller och hoppas då över.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+_LOGGER = logging.getLogger("scheduler")
+
+
+class Handle:
+    __slots__ = ("when", "fn", "args", "cancelled")
+
+    def __init__(self, when: float, fn: Callable[..., Any], args: Tuple[Any, ...]) -> None:
+        self.when = when
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+_heap: List[Tuple[float, int, Handle]] = []
+_seq = itertools.count()
+_cond = threading.Condition()
+_thread: Optional[threading.Thread] = None
+
+
+def call_at(when: float, fn: Callable[..., Any], *args: Any) -> Handle:
+    """Kör fn(*args) på schemaläggartråden vid epoch-tiden `when` (direkt om den passerat)."""
+    global _thread
+    h = Handle(when, fn, args)
+    with _cond:
+        heapq.heappush(_heap, (when, next(_seq), h))
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="scheduler", daemon=True)
+            _thread.start()
+        elif _heap[0][2] is h:
+            _cond.notify()                     # ny tidigaste deadline: väck tråden
+    return h
+
+
+def call_later(delay: float, fn: Callable[..., Any], *args: Any) -> Handle:
+    return call_at(time.time() + delay, fn, *args)
+
+
+def pending() -> int:
+    """Antal jobb i heapen (inklusive avbokade som inte förfallit)."""
+    with _cond:
+        return len(_heap)
+
+
+def _run() -> None:
+    while True:
+        with _cond:
+            while True:
+                now = time.time()
+                if _heap and _heap[0][0] <= now:
+                    h = heapq.heappop(_heap)[2]
+                    break
+                _cond.wait(_heap[0][0] - now if _heap else None)
+        if h.cancelled:
+            continue
+        try:
+            h.fn(*h.args)
+        except Exception:
+            _LOGGER.exception("jobb %s misslyckades", getattr(h.fn, "__name__", h.fn))
@@ -0,0 +1,259 @@
+# sections.py
+# -------------------------------------------------------------------------
+# Typade poster för snapshot-sektionerna i mqtt_subscriber.
+#
+# Varje sektion är en frusen dataclass med __slots__. En uppdatering bygger
+# en ny post och byter ut den i snapshoten under låset; ingen post ändras
+# någonsin på plats. Därför räcker det att get_snapshot() kopierar
+# toppnivån, och läsare får attribut med kända typer i stället för
+# .get()-kedjor och isinstance-kontroller.
+#
+# Fält som fylls från en JSON-payload har källnyckel och konvertering i
+# metadata (_f(src, conv)). compile_updater() genererar en specialiserad
+# funktion per posttyp, update(d, old, ts) -> ny post, som läser och
+# konverterar varje fält direkt, utan kwargs-dict eller dict comprehension.
+# Värden som saknas (None) behåller det gamla värdet, precis som förr.
+#
+# Calendar-händelser och device_power-mappningar är vanliga dict/tuple från
+# JSON; de byts ut hela och får inte muteras av läsare. Tibber-prognosen
+# lagras kolumnvis (parallella tuples) med färger och statistik färdiga.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from price_colors import gradient_color
+
+
+# --- Konverteringar ------------------------------------------------------
+def to_int(v: Any) -> Optional[int]:
+    try:
+        return int(float(str(v).strip()))
+    except Exception:
+        return None
+
+def to_float(v: Any) -> Optional[float]:
+    try:
+        return float(str(v).strip())
+    except Exception:
+        return None
+
+def _f(src: str, conv: Optional[Callable[[Any], Any]] = None) -> Any:
+    """Fält som fylls från JSON-nyckeln `src`, valfritt via `conv`."""
+    return field(default=None, metadata={"src": src, "conv": conv})
+
+
+# --- Poster ----------------------------------------------------------------
+@dataclass(frozen=True, slots=True)
+class Washer:
+    status: Optional[str]          = _f("status")
+    time_to_end_min: Optional[int] = _f("time_to_end_min", to_int)
+    program: Optional[str]         = _f("program")
+    ts: Optional[int]              = None
+
+@dataclass(frozen=True, slots=True)
+class Dryer:
+    status: Optional[str]    = _f("status")
+    time_left: Optional[int] = _f("time_left", to_int)
+    program: Optional[str]   = _f("program")
+    ts: Optional[int]        = None
+
+@dataclass(frozen=True, slots=True)
+class Automower:
+    name: Optional[str]     = _f("name")
+    activity: Optional[str] = _f("activity")
+    battery: Optional[int]  = _f("battery", to_int)
+    progress: Optional[int] = _f("progress", to_int)
+    ts: Optional[int]       = None
+
+@dataclass(frozen=True, slots=True)
+class Shelly:
+    # Shellyns nycklar varierar (tC/temperature, rh/humidity/hum); parsern normaliserar
+    tC: Optional[float]      = _f("tC", to_float)
+    rh: Optional[float]      = _f("rh", to_float)
+    online: Optional[bool]   = None
+    ts: Optional[int]        = None
+
+@dataclass(frozen=True, slots=True)
+class RoomClimate:
+    """shelly_bht (stue) och env_office/env_laundry/env_bedroom."""
+    t: Optional[float]  = _f("t", to_float)
+    rh: Optional[float] = _f("rh", to_float)
+    ts: Optional[int]   = None
+
+@dataclass(frozen=True, slots=True)
+class PulsePower:
+    power: Optional[float]          = _f("power", to_float)
+    power_raw: Optional[float]      = _f("power_raw", to_float)
+    power_smooth: Optional[float]   = _f("power_smooth", to_float)
+    energy_day_kwh: Optional[float] = _f("energy_day_kwh", to_float)
+    cost_day: Optional[float]       = _f("cost_day", to_float)
+    ts: Optional[int]               = None
+
+@dataclass(frozen=True, slots=True)
+class AirQuality:
+    eco2_ppm: Optional[int]        = _f("eco2_ppm", to_int)
+    tvoc_ppb: Optional[int]        = _f("tvoc_ppb", to_int)
+    aqi: Optional[int]             = _f("aqi", to_int)
+    temperature_c: Optional[float] = _f("temperature_c", to_float)
+    pressure_hpa: Optional[float]  = _f("pressure_hpa", to_float)
+    humidity_pct: Optional[float]  = _f("humidity_pct", to_float)
+    ts: Optional[int]              = None
+
+@dataclass(frozen=True, slots=True)
+class Weather:
+    condition: Optional[str]         = _f("condition")
+    temperature: Optional[float]     = _f("temperature", to_float)
+    wind_speed: Optional[float]      = _f("wind_speed", to_float)      # m/s enligt vår payload
+    wind_bearing: Optional[float]    = _f("wind_bearing", to_float)
+    wind_gust: Optional[float]       = _f("wind_gust", to_float)
+    wind_dir: Optional[str]          = _f("wind_dir")
+    wind_class: Optional[str]        = _f("wind_class")
+    tmax: Optional[float]            = _f("tmax", to_float)
+    precipitation: Optional[float]   = _f("precipitation", to_float)
+    precip_prob_max: Optional[int]   = _f("precip_prob_max", to_int)
+    uv_max: Optional[float]          = _f("uv_max", to_float)
+    timestamp: Optional[str]         = _f("timestamp")
+    ts: Optional[int]                = None
+
+# Tibbers prisnivåer; TibberForecast.levels håller index hit (-1 = okänd)
+PRICE_LEVELS: Tuple[str, ...] = ("VERY_CHEAP", "CHEAP", "NORMAL", "EXPENSIVE", "VERY_EXPENSIVE")
+_LEVEL_CODE = {name: i for i, name in enumerate(PRICE_LEVELS)}
+
+@dataclass(frozen=True, slots=True)
+class TibberForecast:
+    """Prognosen kolumnvis, en post per slot i tidsordning i alla kolumner.
+
+    Byggs en gång per payload av tibber_forecast(); läsare använder
+    kolumnerna direkt. Statistiken gäller hela prognosen.
+    """
+    starts: Tuple[float, ...]  = ()     # epoch s
+    starts_at: Tuple[str, ...] = ()     # ISO-sträng från HA (x i prisgrafen)
+    ore: Tuple[float, ...]     = ()     # öre/kWh
+    levels: Tuple[int, ...]    = ()     # index i PRICE_LEVELS
+    colors: Tuple[str, ...]    = ()     # gradientfärg, price_colors
+    slot_s: float              = 3600.0
+    min_ore: Optional[float]   = None
+    max_ore: Optional[float]   = None
+    mean_ore: Optional[float]  = None
+    ts: Optional[int]          = None
+
+    def index(self, now: float) -> Optional[int]:
+        """Sloten som pågår vid `now`, None utanför prognosen."""
+        i = bisect.bisect_right(self.starts, now) - 1
+        if i < 0 or now >= self.starts[i] + self.slot_s:
+            return None
+        return i
+
+
+def tibber_forecast(items: Any, ts: Optional[int]) -> TibberForecast:
+    """Kolumner ur HA:s lista [{start_time, price (SEK/kWh), level}].
+
+    Poster utan giltig starttid eller pris hoppas över.
+    """
+    rows = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        price = to_float(item.get("price"))
+        start = item.get("start_time")
+        if price is None or not isinstance(start, str):
+            continue
+        try:
+            epoch = datetime.fromisoformat(start).timestamp()
+        except ValueError:
+            continue
+        # öre med två decimaler är exakt Tibbers pris (kr, fyra decimaler)
+        rows.append((epoch, start, round(price * 100, 2), _LEVEL_CODE.get(item.get("level"), -1)))
+    if not rows:
+        return TibberForecast(ts=ts)
+    rows.sort(key=lambda r: r[0])
+    starts, starts_at, ore, levels = zip(*rows)
+    return TibberForecast(
+        starts, starts_at, ore, levels,
+        tuple(gradient_color(v) for v in ore),
+        starts[1] - starts[0] if len(starts) > 1 else 3600.0,
+        min(ore), max(ore), sum(ore) / len(ore),
+        ts,
+    )
+
+@dataclass(frozen=True, slots=True)
+class FamilyCalendar:
+    events_next7d: Optional[Tuple[Dict[str, Any], ...]] = None
+    ts: Optional[int]                                   = None
+
+@dataclass(frozen=True, slots=True)
+class BirthdayCalendar:
+    events_next370d: Optional[Tuple[Dict[str, Any], ...]] = None
+    ts: Optional[int]                                     = None
+
+@dataclass(frozen=True, slots=True)
+class Calendar:
+    """Två flöden med egna ts; adresseras som "calendar.familie" osv."""
+    familie: FamilyCalendar           = FamilyCalendar()
+    fodelsedagar: BirthdayCalendar    = BirthdayCalendar()
+
+@dataclass(frozen=True, slots=True)
+class DevicePower:
+    """Live-effekt per enhet: w = senaste W, kwh = integrerat sedan midnatt."""
+    w: Mapping[str, float]   = field(default_factory=dict)
+    kwh: Mapping[str, float] = field(default_factory=dict)
+    ts: Optional[int]        = None
+
+
+def empty_snapshot() -> Dict[str, Any]:
+    return {
+        "calendar":        Calendar(),
+        "washer":          Washer(),
+        "dryer":           Dryer(),
+        "automower":       Automower(),
+        "shelly":          Shelly(),
+        "shelly_bht":      RoomClimate(),
+        "pulse_power":     PulsePower(),
+        "airquality_raw":  AirQuality(),
+        "weather":         Weather(),
+        "tibber_forecast": TibberForecast(),
+        # Additional room sensors (livingroom data is in shelly_bht)
+        "env_office":      RoomClimate(),
+        "env_laundry":     RoomClimate(),
+        "env_bedroom":     RoomClimate(),
+        "device_power":    DevicePower(),
+    }
+
+# Tom snapshot för läsare som får None (t.ex. innan något tagits emot)
+EMPTY: Mapping[str, Any] = MappingProxyType(empty_snapshot())
+
+
+# --- Genererade uppdaterare ----------------------------------------------
+def compile_updater(cls: type) -> Callable[[Dict[str, Any], Any, Optional[int]], Any]:
+    """Bygg update(d, old, ts) för posttypen `cls` (fält utan src behåller old-värdet)."""
+    ns: Dict[str, Any] = {"_cls": cls}
+    body, args = [], []
+    for i, f in enumerate(fields(cls)):
+        src = f.metadata.get("src")
+        if f.name == "ts":
+            args.append("ts")
+        elif src is None:
+            args.append(f"old.{f.name}")
+        else:
+            conv = f.metadata.get("conv")
+            if conv is not None:
+                ns[f"_c{i}"] = conv
+                body.append(f"    v{i} = _c{i}(d.get({src!r}))")
+            else:
+                body.append(f"    v{i} = d.get({src!r})")
+            args.append(f"old.{f.name} if v{i} is None else v{i}")
+    src_code = "def update(d, old, ts):\n" + "\n".join(body) + \
+               f"\n    return _cls({', '.join(args)})\n"
+    exec(compile(src_code, f"<updater {cls.__name__}>", "exec"), ns)
+    return ns["update"]
+
+
+def field_names(cls: type) -> Tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
+
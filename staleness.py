@@ -0,0 +1,125 @@
+# staleness.py
+# -------------------------------------------------------------------------
+# Central bedömning av om data är för gammal ("stale").
+#
+# Varje kontroll i CHECKS har en snapshot-sektion och en maxålder. Modulen
+# lyssnar på sektionsuppdateringar från mqtt_subscriber och håller högst
+# ett jobb per kontroll i scheduler-heapen, vid "blir stale"-tidpunkten
+# ts + maxålder. När jobbet förfaller:
+#   - har sektionen uppdaterats under tiden flyttas jobbet fram (ingen ändring)
+#   - annars flippar kontrollen till stale
+# En uppdatering av en stale sektion flippar tillbaka direkt. Läsare frågar
+# is_stale(namn), en dict-uppslagning; inga tider räknas om per tick.
+# Flaggan ändras bara vid faktiska flippar, så en tile som har den i sin
+# de-dupe-nyckel renderas om exakt två gånger per stale-episod.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+import mqtt_subscriber
+import scheduler
+
+_LOGGER = logging.getLogger("stale")
+
+# kontroll -> (sektion, maxålder i sekunder)
+CHECKS: Dict[str, Tuple[str, float]] = {
+    "power":            ("pulse_power", 10 * 60),
+    "automower":        ("automower", 15 * 60),
+    "climate":          ("shelly_bht", 4 * 3600),
+    "weather":          ("weather", 6 * 3600),
+    # temperaturmodalen: tidsstämpeln blir röd efter 1 h per rum
+    "room.shelly_bht":  ("shelly_bht", 3600),
+    "room.env_office":  ("env_office", 3600),
+    "room.env_laundry": ("env_laundry", 3600),
+    "room.env_bedroom": ("env_bedroom", 3600),
+}
+
+
+class _Check:
+    __slots__ = ("name", "max_age", "ts", "stale", "armed")
+
+    def __init__(self, name: str, max_age: float) -> None:
+        self.name = name
+        self.max_age = max_age
+        self.ts: Optional[float] = None
+        self.stale = False
+        self.armed = False
+
+
+_checks: Dict[str, _Check] = {name: _Check(name, age) for name, (_sec, age) in CHECKS.items()}
+_by_section: Dict[str, List[_Check]] = {}
+for _name, (_sec, _age) in CHECKS.items():
+    _by_section.setdefault(_sec, []).append(_checks[_name])
+
+_lock = threading.Lock()
+_flips = 0
+
+
+def is_stale(name: str) -> bool:
+    c = _checks.get(name)
+    return c.stale if c is not None else False
+
+
+def _announce(changed: List[_Check]) -> None:
+    global _flips
+    for c in changed:
+        _flips += 1
+        _LOGGER.info("%s %s", c.name, f"stale (ingen data på {c.max_age / 60:.0f} min)"
+                     if c.stale else "färsk igen")
+
+
+def _observe(section: str, ts: Optional[float]) -> None:
+    checks = _by_section.get(section)
+    if not checks or ts is None:
+        return
+    now = time.time()
+    changed: List[_Check] = []
+    with _lock:
+        for c in checks:
+            if c.ts is not None and ts <= c.ts:
+                continue
+            c.ts = ts
+            due = ts + c.max_age
+            if not c.armed:
+                c.armed = True
+                scheduler.call_at(due, _fire, c)
+            if c.stale and now < due:
+                c.stale = False
+                changed.append(c)
+    _announce(changed)
+
+
+def _on_update(section: str, rec: Any) -> None:
+    _observe(section, getattr(rec, "ts", None))
+
+
+def _fire(c: _Check) -> None:
+    changed: List[_Check] = []
+    with _lock:
+        due = (c.ts or 0) + c.max_age
+        if time.time() < due:                     # uppdaterad sedan jobbet lades: flytta fram
+            scheduler.call_at(due, _fire, c)
+            return
+        c.armed = False
+        if not c.stale:
+            c.stale = True
+            changed.append(c)
+    _announce(changed)
+
+
+def _stale_metrics() -> Any:
+    yield from metrics.gauge("familydash_section_stale", "1 if the check's section is older than its limit",
+                             [(f'check="{c.name}"', int(c.stale)) for c in _checks.values()])
+    yield "# HELP familydash_stale_flips_total Fresh/stale transitions"
+    yield "# TYPE familydash_stale_flips_total counter"
+    yield f"familydash_stale_flips_total {_flips}"
+
+
+mqtt_subscriber.add_listener(_on_update, replay=True)
+metrics.register_collector(_stale_metrics)
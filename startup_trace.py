@@ -0,0 +1,163 @@
+# startup_trace.py
+# -------------------------------------------------------------------------
+# Tidslinje för kallstart (STARTUP_TRACE=1).
+#
+# app.py markerar faser (imports, layout, callbacks, ...), subscribern
+# markerar MQTT-anslutning och första meddelandet, och Flask-krokar
+# markerar första sidan, första /_dash-layout och första callback-svaret.
+# Några sekunder efter första callbacken skrivs en tabell till loggen och
+# rapporten sparas som JSON (STARTUP_TRACE_PATH), med diff mot föregående
+# körning, så att effekten av en ändring syns direkt.
+#
+#   STARTUP_TRACE=1                  slå på
+#   STARTUP_TRACE_PATH=data/startup_trace.json
+#   STARTUP_DEFER=0                  gamla ordningen (MQTT efter imports,
+#                                    Tibber-grafen byggs i layouten) för A/B
+#
+# Modulen ska importeras först i app.py; tiden räknas från importen, och
+# interpretatorns egen uppstart läses från /proc.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_T0 = time.perf_counter()
+
+ENABLED: bool    = os.getenv("STARTUP_TRACE", "0") == "1"
+DEFER: bool      = os.getenv("STARTUP_DEFER", "1") == "1"
+TRACE_PATH: str  = os.getenv("STARTUP_TRACE_PATH", "data/startup_trace.json")
+SETTLE_S: float  = 3.0           # vänta så här länge efter första callbacken
+BURST_GAP_S: float = 0.5         # retained-skuren anses klar efter så här lång paus
+
+_LOGGER = logging.getLogger("startup")
+
+_marks: Dict[str, float] = {}
+_msg_times: List[float] = []
+_first_callback = threading.Event()
+_lock = threading.Lock()
+
+
+def _interpreter_s() -> Optional[float]:
+    """Sekunder från processstart till att modulen importerades (Linux)."""
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return max(0.0, uptime - started - (time.perf_counter() - _T0))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+_BOOT_S = _interpreter_s() if ENABLED else None
+
+
+def mark(phase: str) -> None:
+    """Markera att en fas är klar (bara första gången räknas)."""
+    if not ENABLED:
+        return
+    t = time.perf_counter() - _T0
+    with _lock:
+        _marks.setdefault(phase, t)
+
+
+def message() -> None:
+    """Anropas per MQTT-meddelande medan spårningen pågår (första + skuren)."""
+    if len(_msg_times) < 5000:
+        _msg_times.append(time.perf_counter() - _T0)
+
+
+def _burst_end() -> Optional[float]:
+    times = list(_msg_times)
+    if not times:
+        return None
+    end = times[0]
+    for t in times[1:]:
+        if t - end > BURST_GAP_S:
+            break
+        end = t
+    return end
+
+
+def report() -> Dict[str, Any]:
+    with _lock:
+        marks = dict(_marks)
+    if _msg_times:
+        marks.setdefault("mqtt_first_message", _msg_times[0])
+        burst = _burst_end()
+        if burst is not None:
+            marks.setdefault("mqtt_retained_burst", burst)
+    phases = []
+    prev = 0.0
+    for name, t in sorted(marks.items(), key=lambda kv: kv[1]):
+        phases.append({"phase": name, "t_s": round(t, 4), "delta_s": round(t - prev, 4)})
+        prev = t
+    return {
+        "when": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "defer": DEFER,
+        "interpreter_s": round(_BOOT_S, 4) if _BOOT_S is not None else None,
+        "mqtt_messages_until_report": len(_msg_times),
+        "phases": phases,
+    }
+
+
+def _load_previous() -> Optional[Dict[str, Any]]:
+    try:
+        with open(TRACE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _finish() -> None:
+    _first_callback.wait(300)
+    time.sleep(SETTLE_S)
+    rep = report()
+    prev = _load_previous()
+    prev_t = {p["phase"]: p["t_s"] for p in (prev or {}).get("phases", [])}
+
+    lines = [f"startup trace (defer={DEFER}, interpreter {rep['interpreter_s']} s före import):",
+             f"  {'fas':<26}{'t (s)':>9}{'delta':>9}{'föreg.':>9}{'diff':>9}"]
+    for p in rep["phases"]:
+        old = prev_t.get(p["phase"])
+        diff = f"{p['t_s'] - old:+.3f}" if old is not None else ""
+        old_txt = f"{old:.3f}" if old is not None else ""
+        lines.append(f"  {p['phase']:<26}{p['t_s']:>9.3f}{p['delta_s']:>9.3f}{old_txt:>9}{diff:>9}")
+    _LOGGER.info("\n".join(lines))
+
+    try:
+        os.makedirs(os.path.dirname(TRACE_PATH) or ".", exist_ok=True)
+        with open(TRACE_PATH, "w", encoding="utf-8") as f:
+            json.dump({**rep, "previous": prev and {k: prev[k] for k in ("when", "defer", "phases") if k in prev}},
+                      f, indent=2)
+    except OSError as e:
+        _LOGGER.warning("kunde inte spara %s: %s", TRACE_PATH, e)
+
+
+def install(app: Any) -> None:
+    """Flask-krokar för första sida/layout/callback och rapporttråden."""
+    if not ENABLED:
+        return
+    server = app.server
+
+    @server.after_request
+    def _trace_request(resp: Any) -> Any:
+        from flask import request
+        path = request.path
+        if path == "/":
+            mark("first_index_served")
+        elif path == "/_dash-layout":
+            mark("first_layout_served")
+        elif path == "/_dash-update-component" and resp.status_code == 200:
+            mark("first_callback_served")
+            _first_callback.set()
+        return resp
+
+    threading.Thread(target=_finish, name="startup-trace", daemon=True).start()
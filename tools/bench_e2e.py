@@ -0,0 +1,295 @@
+# tools/bench_e2e.py
+# -------------------------------------------------------------------------
+# End-to-end-latens från MQTT-publicering till renderad tile.
+#
+# Startar tools.fake_mqtt.FakeBroker och Dash-appen (riktig paho-klient och
+# riktig Flask-server i samma process), publicerar skriptad trafik och
+# pollar callback-endpointen (/_dash-update-component) som en webbläsare.
+# Varje publicering bär ett unikt synligt värde; när det dyker upp i ett
+# callback-svar är meddelandet "renderat".
+#
+# Uppdelning per meddelande:
+#   ingest   publicering -> paho _on_message
+#   parse    _on_message -> snapshot uppdaterad
+#   queue    snapshot uppdaterad -> start av den poll som plockade upp det
+#   snapshot tid i get_snapshot() under den callbacken (serversidan)
+#   render   övrig servertid (compute + serialisering)
+#   total    publicering -> svar mottaget
+#
+#   python -m tools.bench_e2e --rounds 30 --poll-ms 100
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.fake_mqtt import FakeBroker
+
+
+def _hhmm(m: int) -> str:
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+# widget -> (output som identifierar callbacken, topic, payload(r), markör(r))
+WIDGETS: Dict[str, Tuple[str, str, Callable[[int], dict], Callable[[int], str]]] = {
+    "washer": ("washer-box.children", "home/appliance/washer/state",
+               lambda r: {"status": "run", "time_to_end_min": 61 + r},
+               lambda r: _hhmm(61 + r)),
+    "dryer": ("dryer-box.children", "home/appliance/dryer/state",
+              lambda r: {"status": "run", "time_left": 121 + r},
+              lambda r: _hhmm(121 + r)),
+    "power": ("power-box.children", "home/tibber/power",
+              lambda r: {"power": 1000 + r, "power_smooth": 1000 + r, "energy_day_kwh": 5.0, "cost_day": 7.5},
+              lambda r: f"{1000 + r} W"),
+    "automower": ("automower-box.children", "home/appliance/automower/state",
+                  lambda r: {"name": "Bench", "activity": "mowing", "battery": 1 + r % 99, "progress": 10},
+                  lambda r: f"{1 + r % 99}%"),
+    # Stue-tilen visar EMA + trendpil (aggregators.py): ett konstant värde gör
+    # EMA == råvärdet, och varje runda har ny ts så tilen renderas om ändå.
+    "climate": ("climate-quality-box.children", "home/env/livingroom/ht/state",
+                lambda r: {"t": 21.5, "rh": 40},
+                lambda r: "21.5 °C →"),
+    "temp_tiles": ("temp-tiles-container.children", "home/env/bedroom/ht/state",
+                   lambda r: {"t": 5 + (r % 200) / 10, "rh": 50},
+                   lambda r: f"{5 + (r % 200) / 10:.1f}°C"),
+    "weather": ("weather-box.children", "home/weather",
+                lambda r: {"condition": "sunny", "temperature": -40 + r % 80, "tmax": 30},
+                lambda r: f"{-40 + r % 80:.0f}°C"),
+    "calendar": ("calendar-box.children", "home/calendar/familie/next7d",
+                 lambda r: {"events": [{"summary": f"Bench {r}",
+                                        "start": {"dateTime": f"{date.today().isoformat()}T12:00:00"}}]},
+                 lambda r: f"Bench {r}"),
+}
+
+
+def percentile(vals: List[float], p: float) -> float:
+    if not vals:
+        return 0.0
+    s = sorted(vals)
+    return s[min(len(s) - 1, max(0, int(round(p / 100 * (len(s) - 1)))))]
+
+
+class _Probe:
+    """Tidsstämplar från subscriber och server, nycklade på topic."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.recv: Dict[str, float] = {}
+        self.parsed: Dict[str, float] = {}
+        self.local = threading.local()
+
+
+def _install_probes(probe: _Probe) -> None:
+    """Linda _on_message och get_snapshot innan appen importeras."""
+    import mqtt_subscriber
+
+    orig_on_message = mqtt_subscriber._on_message
+    orig_get_snapshot = mqtt_subscriber.get_snapshot
+
+    def on_message(cli: Any, ud: Any, msg: Any) -> None:
+        t_recv = time.perf_counter()
+        orig_on_message(cli, ud, msg)
+        t_parsed = time.perf_counter()
+        with probe.lock:
+            probe.recv[msg.topic] = t_recv
+            probe.parsed[msg.topic] = t_parsed
+
+    def get_snapshot() -> Any:
+        t0 = time.perf_counter()
+        try:
+            return orig_get_snapshot()
+        finally:
+            probe.local.snap = getattr(probe.local, "snap", 0.0) + time.perf_counter() - t0
+
+    mqtt_subscriber._on_message = on_message
+    mqtt_subscriber.get_snapshot = get_snapshot
+
+
+def _find_callback(callback_map: Dict[str, Any], output: str) -> Tuple[str, Dict[str, Any]]:
+    for key, cb in callback_map.items():
+        if output in key.strip(".").split("..."):
+            return key, cb
+    raise KeyError(output)
+
+
+class _Client:
+    """Webbläsarlik klient för en callback: håller Store-state mellan anrop."""
+
+    def __init__(self, base: str, key: str, cb: Dict[str, Any]) -> None:
+        import requests
+        self.http = requests.Session()
+        self.url = base + "/_dash-update-component"
+        self.key = key
+        self.cb = cb
+        self.values: Dict[str, Any] = {}
+        self.n = 0
+        outs = cb["output"] if isinstance(cb["output"], list) else [cb["output"]]
+        self.outputs = [{"id": o.component_id, "property": o.component_property} for o in outs]
+        self.multi = key.startswith("..")
+
+    @staticmethod
+    def _is_tick(d: Dict[str, str]) -> bool:
+        """Intervall eller synlighetsgrind (view_gate), dvs. det som triggar en poll."""
+        import view_gate
+        return d["property"] == "n_intervals" or d["id"] in view_gate.GATES
+
+    def _arg(self, d: Dict[str, str]) -> Dict[str, Any]:
+        prop = f"{d['id']}.{d['property']}"
+        value = self.n if self._is_tick(d) else self.values.get(prop)
+        return {"id": d["id"], "property": d["property"], "value": value}
+
+    def poll(self) -> Tuple[str, Dict[str, float]]:
+        self.n += 1
+        inputs = [self._arg(d) for d in self.cb["inputs"]]
+        trigger = next((f"{d['id']}.{d['property']}" for d in self.cb["inputs"]
+                        if self._is_tick(d)), None)
+        body = {
+            "output": self.key,
+            "outputs": self.outputs if self.multi else self.outputs[0],
+            "inputs": inputs,
+            "state": [self._arg(d) for d in self.cb["state"]],
+            "changedPropIds": [trigger] if trigger else [],
+        }
+        resp = self.http.post(self.url, json=body)
+        timing = {
+            "server": float(resp.headers.get("X-Bench-Server", 0)),
+            "snapshot": float(resp.headers.get("X-Bench-Snapshot", 0)),
+        }
+        if resp.status_code == 204:                     # PreventUpdate / bara no_update
+            return "", timing
+        text = resp.text
+        try:
+            for cid, props in (resp.json().get("response") or {}).items():
+                for prop, value in props.items():
+                    self.values[f"{cid}.{prop}"] = value
+        except ValueError:
+            pass
+        return text, timing
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="End-to-end-latens MQTT -> Dash-callback")
+    ap.add_argument("--rounds", type=int, default=20, help="publiceringar per widget")
+    ap.add_argument("--poll-ms", type=float, default=100.0, help="pollintervall per callback")
+    ap.add_argument("--gap-s", type=float, default=1.05,
+                    help="tid mellan publiceringar (>1 s eftersom ts har sekundupplösning)")
+    ap.add_argument("--widgets", nargs="+", default=list(WIDGETS))
+    ap.add_argument("--json", help="skriv rapporten som JSON hit")
+    args = ap.parse_args()
+
+    broker = FakeBroker().start()
+    os.environ.update(MQTT_ENABLE="1", MQTT_HOST="127.0.0.1", MQTT_PORT=str(broker.port),
+                      MQTT_CLIENT="familydash-bench", MQTT_USER="", MQTT_PASS="")
+    probe = _Probe()
+    _install_probes(probe)
+
+    import mqtt_subscriber
+    mqtt_subscriber.DEBUG = False
+    import app as dash_app
+    from werkzeug.serving import make_server
+
+    server = dash_app.app.server
+
+    @server.before_request
+    def _bench_start() -> None:
+        probe.local.snap = 0.0
+        probe.local.t0 = time.perf_counter()
+
+    @server.after_request
+    def _bench_end(resp: Any) -> Any:
+        t0 = getattr(probe.local, "t0", None)
+        if t0 is not None:
+            resp.headers["X-Bench-Server"] = f"{(time.perf_counter() - t0) * 1000:.3f}"
+            resp.headers["X-Bench-Snapshot"] = f"{getattr(probe.local, 'snap', 0.0) * 1000:.3f}"
+        return resp
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    http = make_server("127.0.0.1", 0, server, threaded=True)
+    threading.Thread(target=http.serve_forever, name="bench-http", daemon=True).start()
+    base = f"http://127.0.0.1:{http.server_port}"
+
+    if not broker.wait_for_subscriber(10):
+        raise SystemExit("paho-klienten prenumererade aldrig hos fake-brokern")
+
+    widgets = [w for w in args.widgets if w in WIDGETS]
+    pending: Dict[str, Optional[Tuple[str, float]]] = {w: None for w in widgets}
+    samples: Dict[str, List[Dict[str, float]]] = {w: [] for w in widgets}
+    cond = threading.Condition()
+    stop = threading.Event()
+
+    def poller(widget: str) -> None:
+        output, topic, _payload, _marker = WIDGETS[widget]
+        client = _Client(base, *_find_callback(dash_app.app.callback_map, output))
+        while not stop.is_set():
+            t_req = time.perf_counter()
+            text, timing = client.poll()
+            t_resp = time.perf_counter()
+            with cond:
+                job = pending[widget]
+                if job and job[0] in text:
+                    _m, t_pub = job
+                    with probe.lock:
+                        t_recv = probe.recv.get(topic, t_pub)
+                        t_parsed = probe.parsed.get(topic, t_recv)
+                    samples[widget].append({
+                        "ingest": (t_recv - t_pub) * 1000,
+                        "parse": (t_parsed - t_recv) * 1000,
+                        "queue": max(0.0, t_req - t_parsed) * 1000,
+                        "snapshot": timing["snapshot"],
+                        "render": max(0.0, timing["server"] - timing["snapshot"]),
+                        "total": (t_resp - t_pub) * 1000,
+                    })
+                    pending[widget] = None
+                    cond.notify_all()
+            stop.wait(args.poll_ms / 1000)
+
+    threads = [threading.Thread(target=poller, args=(w,), daemon=True) for w in widgets]
+    for t in threads:
+        t.start()
+
+    for r in range(args.rounds):
+        for w in widgets:
+            _out, topic, payload, marker = WIDGETS[w]
+            with cond:
+                pending[w] = (marker(r), time.perf_counter())
+            broker.publish(topic, json.dumps(payload(r)))
+        deadline = time.monotonic() + 10
+        with cond:
+            while any(pending.values()) and time.monotonic() < deadline:
+                cond.wait(0.5)
+            for w in widgets:
+                if pending[w]:
+                    print(f"[bench] {w}: runda {r} renderades aldrig")
+                    pending[w] = None
+        time.sleep(args.gap_s)
+
+    stop.set()
+    http.shutdown()
+    broker.stop()
+
+    phases = ["ingest", "parse", "queue", "snapshot", "render", "total"]
+    report: Dict[str, Any] = {}
+    print(f"{'widget':<12}{'n':>4}  " + "".join(f"{p:>24}" for p in phases))
+    print(f"{'':<16}" + "".join(f"{'p50/p95/p99 ms':>24}" for _ in phases))
+    for w in widgets:
+        rows = samples[w]
+        stats = {p: {q: percentile([s[p] for s in rows], q) for q in (50, 95, 99)} for p in phases}
+        report[w] = {"n": len(rows), **stats}
+        cells = "".join(f"{stats[p][50]:>8.2f}/{stats[p][95]:>7.2f}/{stats[p][99]:>7.2f}" for p in phases)
+        print(f"{w:<12}{len(rows):>4}  {cells}")
+    print(f"(poll var {args.poll_ms:.0f} ms; 'queue' domineras av pollintervallet, i kiosken 5 s/2 min)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "widgets": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# tools/bench_ha.py
+# -------------------------------------------------------------------------
+# Benchmark av HA-vägen (ha_client) mot den fejkade HA-servern i tools/fake_ha.
+#
+# Mäter genomströmning och svanslatens för call_service (REST) och
+# get_energy_today (websocket + statistik) med N samtidiga anropare.
+#
+#   python -m tools.bench_ha
+#   python -m tools.bench_ha --callers 1 4 16 --calls 200 --latency-ms 10 --error-rate 0.02
+#   python -m tools.bench_ha --json data/bench_ha.json
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import ha_client
+from components.energy_modal import stat_ids
+from tools.fake_ha import FakeHA
+
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(p / 100 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def run(fn: Callable[[], bool], callers: int, calls: int) -> Dict[str, float]:
+    """Kör `calls` anrop fördelade på `callers` trådar; returnera statistik i ms."""
+    def one(_i: int) -> Tuple[float, bool]:
+        t0 = time.perf_counter()
+        ok = fn()
+        return (time.perf_counter() - t0) * 1000, ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(one, range(calls)))
+    wall = time.perf_counter() - t0
+
+    lat = sorted(r[0] for r in results)
+    return {
+        "callers": callers,
+        "calls": calls,
+        "errors": sum(1 for r in results if not r[1]),
+        "ops_per_s": calls / wall if wall > 0 else 0.0,
+        "p50_ms": percentile(lat, 50),
+        "p95_ms": percentile(lat, 95),
+        "p99_ms": percentile(lat, 99),
+        "max_ms": lat[-1] if lat else 0.0,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark av ha_client mot fejkad HA")
+    ap.add_argument("--callers", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--calls", type=int, default=200, help="anrop per mätning")
+    ap.add_argument("--latency-ms", type=float, default=5.0, help="serverlatens per anrop")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="slumpad extra latens 0..jitter")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--json", help="skriv resultatet som JSON hit")
+    args = ap.parse_args()
+
+    lat = args.latency_ms / 1000
+    latency = (lat, lat + args.jitter_ms / 1000) if args.jitter_ms else lat
+    ids = stat_ids()
+
+    benches: Dict[str, Callable[[], bool]] = {
+        "call_service": lambda: ha_client.call_service("script", "turn_on", {"entity_id": "script.bench"})[0],
+        "get_energy_today": lambda: bool(ha_client.get_energy_today(ids)),
+    }
+
+    rows = []
+    with FakeHA(latency=latency, error_rate=args.error_rate, seed=1) as ha:
+        ha.configure_client()
+        # Värm upp sessionspoolen så att första mätningen inte betalar TCP-connect
+        ha_client.call_service("script", "turn_on", {})
+        for name, fn in benches.items():
+            for callers in args.callers:
+                res = run(fn, callers, args.calls)
+                res["bench"] = name
+                rows.append(res)
+        server_calls = dict(ha.calls)
+
+    print(f"{'bench':<18}{'callers':>8}{'ops/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'err':>6}")
+    for r in rows:
+        print(f"{r['bench']:<18}{r['callers']:>8}{r['ops_per_s']:>10.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}{r['errors']:>6}")
+    print(f"(latens i ms, serverlatens {args.latency_ms:.1f} ms, felfrekvens {args.error_rate:.0%}, "
+          f"serveranrop {server_calls})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
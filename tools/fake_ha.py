@@ -0,0 +1,296 @@
+# tools/fake_ha.py
+# -------------------------------------------------------------------------
+# Fejkad Home Assistant i samma process, för benchmarks och lokala tester
+# av ha_client utan nätverk.
+#
+# Implementerar det ha_client använder:
+#   REST  POST /api/services/<domain>/<service>
+#         GET  /api/states, GET /api/states/<entity_id>
+#   WS    /api/websocket: auth_required -> auth -> auth_ok,
+#         recorder/statistics_during_period (period=day, types=change)
+#
+# Latens, felinjektion och statistik är konfigurerbara:
+#   with FakeHA(latency=0.02, error_rate=0.05, stats={"sensor.x": 1.5}) as ha:
+#       ha.configure_client()      # pekar ha_client mot servern
+#       ha_client.call_service("script", "turn_on", {...})
+#
+# Websocket-delen är en minimal RFC 6455-server (bara textramar, ping, close)
+# byggd på http.server så att inga extra beroenden behövs.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+Latency = Union[float, Tuple[float, float]]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128       # standard (5) ger SYN-omsändningar på 1 s vid många anropare
+
+
+class FakeHA:
+    """Fejkad HA-server. Starta med start()/stop() eller som context manager."""
+
+    def __init__(self, token: str = "fake-token", latency: Latency = 0.0,
+                 error_rate: float = 0.0, stats: Optional[Dict[str, float]] = None,
+                 default_daily_kwh: float = 1.0,
+                 states: Optional[Dict[str, Dict[str, Any]]] = None,
+                 host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None) -> None:
+        self.token = token
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stats = dict(stats or {})          # statistic_id -> kWh per dygn
+        self.default_daily_kwh = default_daily_kwh
+        self.states = dict(states or {})        # entity_id -> HA state-objekt
+        self.calls: Dict[str, int] = {}
+        self._fail_next = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _make_handler(self))
+        self._thread: Optional[threading.Thread] = None
+
+    # --- livscykel --------------------------------------------------------
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeHA":
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="fake-ha", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeHA":
+        return self.start()
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.stop()
+
+    def configure_client(self) -> None:
+        """Peka ha_client (redan importerad eller ej) mot den här servern."""
+        import ha_client
+        ha_client._HA_BASE_URL = self.url
+        ha_client._HA_TOKEN = self.token
+
+    # --- styrning ---------------------------------------------------------
+    def fail_next(self, n: int = 1) -> None:
+        """Låt de n nästa anropen (REST eller WS-fråga) misslyckas."""
+        with self._lock:
+            self._fail_next += n
+
+    def set_state(self, entity_id: str, state: Any, attributes: Optional[dict] = None,
+                  last_updated: Optional[datetime] = None) -> None:
+        ts = (last_updated or datetime.now(timezone.utc)).isoformat()
+        self.states[entity_id] = {
+            "entity_id": entity_id, "state": str(state), "attributes": attributes or {},
+            "last_updated": ts, "last_changed": ts,
+        }
+
+    # --- interna hjälpare (anropas från request-trådar) -------------------
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            if self._fail_next > 0:
+                self._fail_next -= 1
+                return True
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def _sleep(self) -> None:
+        lat = self.latency
+        if isinstance(lat, tuple):
+            with self._lock:
+                lat = self._rng.uniform(*lat)
+        if lat > 0:
+            time.sleep(lat)
+
+    def _statistics(self, msg: dict) -> Dict[str, List[dict]]:
+        start = datetime.fromisoformat(msg["start_time"])
+        end = datetime.fromisoformat(msg["end_time"]) if msg.get("end_time") else datetime.now(start.tzinfo)
+        out: Dict[str, List[dict]] = {}
+        for sid in msg.get("statistic_ids") or []:
+            per_day = self.stats.get(sid, self.default_daily_kwh)
+            rows = []
+            day = start
+            while day < end:
+                nxt = min(day + timedelta(days=1), end)
+                rows.append({
+                    "start": int(day.timestamp() * 1000),
+                    "end": int(nxt.timestamp() * 1000),
+                    "change": round(per_day * (nxt - day).total_seconds() / 86400, 3),
+                })
+                day = nxt
+            out[sid] = rows
+        return out
+
+
+def _make_handler(ha: FakeHA) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"        # keep-alive, så sessionspoolen används
+        # Buffra svaret och skicka det i ett segment; annars ger Nagle +
+        # delayed ACK ~40 ms extra per anrop på keep-alive-anslutningar.
+        wbufsize = 64 * 1024
+        disable_nagle_algorithm = True
+
+        def log_message(self, *_args: Any) -> None:
+            pass
+
+        # --- REST ----------------------------------------------------------
+        def _send_json(self, code: int, body: Any) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            if self.headers.get("Authorization") == f"Bearer {ha.token}":
+                return True
+            self._send_json(401, {"message": "Unauthorized"})
+            return False
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if not self._authorized():
+                return
+            if not self.path.startswith("/api/services/"):
+                self._send_json(404, {"message": "Not found"})
+                return
+            ha._count("call_service")
+            ha._sleep()
+            if ha._should_fail():
+                self._send_json(500, {"message": "Injected error"})
+                return
+            try:
+                json.loads(body or b"{}")
+            except ValueError:
+                self._send_json(400, {"message": "Invalid JSON"})
+                return
+            self._send_json(200, [])
+
+        def do_GET(self) -> None:
+            if self.path == "/api/websocket" and self.headers.get("Upgrade", "").lower() == "websocket":
+                self._websocket()
+                return
+            if not self._authorized():
+                return
+            if self.path == "/api/states" or self.path.startswith("/api/states/"):
+                ha._count("get_states")
+                ha._sleep()
+                if ha._should_fail():
+                    self._send_json(500, {"message": "Injected error"})
+                    return
+                if self.path == "/api/states":
+                    self._send_json(200, list(ha.states.values()))
+                    return
+                state = ha.states.get(self.path[len("/api/states/"):])
+                if state is None:
+                    self._send_json(404, {"message": "Entity not found."})
+                else:
+                    self._send_json(200, state)
+                return
+            self._send_json(404, {"message": "Not found"})
+
+        # --- Websocket -----------------------------------------------------
+        def _websocket(self) -> None:
+            key = self.headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+            self.send_response(101, "Switching Protocols")
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+            self.close_connection = True
+
+            self._ws_send({"type": "auth_required", "ha_version": "fake"})
+            msg = self._ws_recv()
+            if not msg or msg.get("type") != "auth" or msg.get("access_token") != ha.token:
+                self._ws_send({"type": "auth_invalid", "message": "Invalid access token"})
+                return
+            self._ws_send({"type": "auth_ok", "ha_version": "fake"})
+
+            while True:
+                msg = self._ws_recv()
+                if msg is None:
+                    return
+                if msg.get("type") == "recorder/statistics_during_period":
+                    ha._count("statistics_during_period")
+                    ha._sleep()
+                    if ha._should_fail():
+                        self._ws_send({"id": msg.get("id"), "type": "result", "success": False,
+                                       "error": {"code": "unknown_error", "message": "Injected error"}})
+                        continue
+                    self._ws_send({"id": msg.get("id"), "type": "result", "success": True,
+                                   "result": ha._statistics(msg)})
+                else:
+                    self._ws_send({"id": msg.get("id"), "type": "result", "success": False,
+                                   "error": {"code": "unknown_command", "message": "Unknown command."}})
+
+        def _ws_send(self, obj: Any, opcode: int = 0x1) -> None:
+            data = obj if isinstance(obj, bytes) else json.dumps(obj).encode()
+            n = len(data)
+            if n < 126:
+                header = struct.pack("!BB", 0x80 | opcode, n)
+            elif n < 65536:
+                header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+            else:
+                header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+            self.wfile.write(header + data)
+            self.wfile.flush()
+
+        def _ws_recv(self) -> Optional[dict]:
+            """Läs nästa textmeddelande som JSON. None vid close/EOF."""
+            while True:
+                head = self.rfile.read(2)
+                if len(head) < 2:
+                    return None
+                opcode = head[0] & 0x0F
+                masked = head[1] & 0x80
+                n = head[1] & 0x7F
+                if n == 126:
+                    n = struct.unpack("!H", self.rfile.read(2))[0]
+                elif n == 127:
+                    n = struct.unpack("!Q", self.rfile.read(8))[0]
+                mask = self.rfile.read(4) if masked else b""
+                payload = self.rfile.read(n)
+                if mask:
+                    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+                if opcode == 0x8:                      # close
+                    try:
+                        self._ws_send(payload[:2], opcode=0x8)
+                    except OSError:
+                        pass
+                    return None
+                if opcode == 0x9:                      # ping -> pong
+                    self._ws_send(payload, opcode=0xA)
+                    continue
+                if opcode == 0x1:
+                    try:
+                        return json.loads(payload)
+                    except ValueError:
+                        return {}
+
+    return Handler
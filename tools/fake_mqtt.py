@@ -0,0 +1,243 @@
+# tools/fake_mqtt.py
+# -------------------------------------------------------------------------
+# Minimal MQTT 3.1.1-broker i samma process, för benchmarks utan Mosquitto.
+#
+# Stöder det paho-klienten i mqtt_subscriber använder: CONNECT/CONNACK (med
+# will och användare/lösen, som ignoreras), SUBSCRIBE/SUBACK med + och #,
+# UNSUBSCRIBE, PUBLISH QoS 0/1 (PUBACK), retained-meddelanden, PINGREQ och
+# DISCONNECT. Leverans till prenumeranter sker alltid med QoS 0.
+#
+#   with FakeBroker() as broker:
+#       os.environ["MQTT_PORT"] = str(broker.port)
+#       ...
+#       broker.publish("home/appliance/washer/state", b'{"time_to_end_min": 42}')
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def topic_matches(filt: str, topic: str) -> bool:
+    """MQTT-filtermatchning med + (en nivå) och # (resten)."""
+    f_parts = filt.split("/")
+    t_parts = topic.split("/")
+    for i, f in enumerate(f_parts):
+        if f == "#":
+            return True
+        if i >= len(t_parts):
+            return False
+        if f != "+" and f != t_parts[i]:
+            return False
+    return len(f_parts) == len(t_parts)
+
+
+def _encode_len(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n % 128
+        n //= 128
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def _str(b: bytes, i: int) -> Tuple[str, int]:
+    n = struct.unpack_from("!H", b, i)[0]
+    return b[i + 2:i + 2 + n].decode("utf-8", errors="replace"), i + 2 + n
+
+
+def publish_packet(topic: str, payload: bytes, retain: bool = False) -> bytes:
+    t = topic.encode()
+    body = struct.pack("!H", len(t)) + t + payload
+    return bytes([0x30 | (0x01 if retain else 0)]) + _encode_len(len(body)) + body
+
+
+class _Session:
+    __slots__ = ("sock", "filters", "wlock", "client_id")
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.filters: Dict[str, int] = {}
+        self.wlock = threading.Lock()
+        self.client_id = ""
+
+    def send(self, data: bytes) -> None:
+        with self.wlock:
+            self.sock.sendall(data)
+
+
+class FakeBroker:
+    """Broker-stand-in. `on_publish(topic, payload)` anropas för varje inkommande PUBLISH."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 on_publish: Optional[Callable[[str, bytes], None]] = None) -> None:
+        self.on_publish = on_publish
+        self.retained: Dict[str, bytes] = {}
+        self.sessions: List[_Session] = []
+        self._lock = threading.Lock()
+        self._connected = threading.Event()
+
+        broker = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                broker._serve(self.request)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "FakeBroker":
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="fake-mqtt", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            for s in self.sessions:
+                try:
+                    s.sock.close()
+                except OSError:
+                    pass
+
+    def __enter__(self) -> "FakeBroker":
+        return self.start()
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.stop()
+
+    def wait_for_subscriber(self, timeout: float = 10.0) -> bool:
+        """Vänta tills minst en klient har prenumererat."""
+        return self._connected.wait(timeout)
+
+    # --- publicering -----------------------------------------------------
+    def publish(self, topic: str, payload: bytes | str, retain: bool = False) -> int:
+        """Leverera ett meddelande som om en sensor publicerat det. Returnerar antal mottagare."""
+        data = payload.encode() if isinstance(payload, str) else payload
+        if retain:
+            with self._lock:
+                if data:
+                    self.retained[topic] = data
+                else:
+                    self.retained.pop(topic, None)
+        pkt = publish_packet(topic, data)
+        with self._lock:
+            targets = [s for s in self.sessions
+                       if any(topic_matches(f, topic) for f in s.filters)]
+        for s in targets:
+            try:
+                s.send(pkt)
+            except OSError:
+                pass
+        return len(targets)
+
+    # --- protokoll --------------------------------------------------------
+    def _read_packet(self, sock: socket.socket) -> Optional[Tuple[int, bytes]]:
+        head = _recv_exact(sock, 1)
+        if not head:
+            return None
+        mult, length = 1, 0
+        while True:
+            b = _recv_exact(sock, 1)
+            if not b:
+                return None
+            length += (b[0] & 0x7F) * mult
+            if not b[0] & 0x80:
+                break
+            mult *= 128
+        body = _recv_exact(sock, length) if length else b""
+        if body is None:
+            return None
+        return head[0], body
+
+    def _serve(self, sock: socket.socket) -> None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sess = _Session(sock)
+        try:
+            while True:
+                pkt = self._read_packet(sock)
+                if pkt is None:
+                    return
+                ptype, body = pkt[0] >> 4, pkt[1]
+                flags = pkt[0] & 0x0F
+                if ptype == 1:                                    # CONNECT
+                    _proto, i = _str(body, 0)
+                    i += 4                                        # level, flags, keepalive
+                    sess.client_id, _ = _str(body, i)
+                    with self._lock:
+                        self.sessions.append(sess)
+                    sess.send(b"\x20\x02\x00\x00")
+                elif ptype == 3:                                  # PUBLISH
+                    topic, i = _str(body, 0)
+                    qos = (flags >> 1) & 0x03
+                    if qos:
+                        pid = body[i:i + 2]
+                        i += 2
+                        sess.send(b"\x40\x02" + pid)
+                    payload = body[i:]
+                    if self.on_publish:
+                        self.on_publish(topic, payload)
+                    self.publish(topic, payload, retain=bool(flags & 0x01))
+                elif ptype == 8:                                  # SUBSCRIBE
+                    pid = body[:2]
+                    i, granted, new = 2, bytearray(), []
+                    while i < len(body):
+                        filt, i = _str(body, i)
+                        qos = body[i] & 0x03
+                        i += 1
+                        sess.filters[filt] = qos
+                        granted.append(min(qos, 1))
+                        new.append(filt)
+                    sess.send(bytes([0x90]) + _encode_len(2 + len(granted)) + pid + bytes(granted))
+                    with self._lock:
+                        retained = list(self.retained.items())
+                    for topic, payload in retained:
+                        if any(topic_matches(f, topic) for f in new):
+                            sess.send(publish_packet(topic, payload, retain=True))
+                    self._connected.set()
+                elif ptype == 10:                                 # UNSUBSCRIBE
+                    pid, i = body[:2], 2
+                    while i < len(body):
+                        filt, i = _str(body, i)
+                        sess.filters.pop(filt, None)
+                    sess.send(b"\xb0\x02" + pid)
+                elif ptype == 12:                                 # PINGREQ
+                    sess.send(b"\xd0\x00")
+                elif ptype == 14:                                 # DISCONNECT
+                    return
+                # PUBACK (4) m.fl. från klienten ignoreras
+        except OSError:
+            return
+        finally:
+            with self._lock:
+                if sess in self.sessions:
+                    self.sessions.remove(sess)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+def _recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
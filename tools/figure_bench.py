@@ -0,0 +1,107 @@
+# tools/figure_bench.py
+# -------------------------------------------------------------------------
+# Server-CPU och bytes per uppdatering för pris- och energigrafen, med
+# hela figurer från servern (CLIENT_FIGURES=0) och med bara data till
+# klientsidiga figurer (CLIENT_FIGURES=1, client_figures.py).
+#
+# Läget bestäms när appen importeras, så varje läge körs i en egen process.
+# Callbacks anropas som i webbläsaren via Flask-testklienten mot
+# /_dash-update-component (samma _Caller som tools.view_gating): snapshoten
+# fylls med tools.fixtures och energimodalen hämtar från tools.fake_ha,
+# så dagens värde och historiken ligger i cache under mätningen.
+# Skeletten i klientläget skickas en gång per sidladdning med
+# /_dash-layout; skillnaden i layoutstorlek skrivs ut separat.
+#
+#   python -m tools.figure_bench [--reps 200] [--json ut.json]
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, Tuple
+
+os.environ.setdefault("MQTT_ENABLE", "0")
+os.environ.setdefault("METRICS", "0")
+
+# fall -> (graf-id, trigger, energy-range)
+CASES: Dict[str, Tuple[str, str, str]] = {
+    "tibber":       ("tibber-graph", "slow-main.data", ""),
+    "energi idag":  ("energy-devices-graph", "slow-energy.data", "day"),
+    "energi 7 d":   ("energy-devices-graph", "slow-energy.data", "week"),
+    "energi 30 d":  ("energy-devices-graph", "slow-energy.data", "month"),
+}
+
+
+def _worker(reps: int) -> Dict[str, Any]:
+    """Mätning i nuvarande process (läget enligt CLIENT_FIGURES)."""
+    import logging
+    import mqtt_subscriber
+    mqtt_subscriber.DEBUG = False
+    from tools import fixtures
+    from tools.fake_ha import FakeHA
+    from tools.view_gating import _Caller, _measure
+
+    with FakeHA() as ha:
+        ha.configure_client()
+        import app as dash_app
+        import energy_history
+        from components.energy_modal import stat_ids
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+        fixtures.populate()
+        energy_history.ensure_history(stat_ids())
+        app = dash_app.app
+        client = app.server.test_client()
+        out: Dict[str, Any] = {"layout_bytes": len(client.get("/_dash-layout").data)}
+        for name, (graph, trigger, range_key) in CASES.items():
+            key, cb = next((k, cb) for k, cb in app.callback_map.items()
+                           if graph in k and "callback" in cb)
+            caller = _Caller(client, key, cb)
+            if range_key:
+                caller.values["energy-range.value"] = range_key
+            cpu, nbytes = _measure(caller, trigger, {"energy-modal-open"}, reps)
+            out[name] = {"cpu_ms": cpu, "bytes": nbytes}
+    return out
+
+
+def _run(mode: str, reps: int) -> Dict[str, Any]:
+    env = dict(os.environ, CLIENT_FIGURES=mode,
+               ENERGY_HISTORY_PATH=os.path.join(tempfile.mkdtemp(), "energy_daily.json"))
+    res = subprocess.run([sys.executable, "-m", "tools.figure_bench", "--worker", "--reps", str(reps)],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="CPU och bytes per uppdatering, server- mot klientfigurer")
+    ap.add_argument("--reps", type=int, default=200, help="anrop per fall")
+    ap.add_argument("--json", help="skriv resultatet som JSON hit")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(_worker(args.reps)))
+        return
+
+    server, client = _run("0", args.reps), _run("1", args.reps)
+    print(f"{'fall':<14}{'CPU ms server':>14}{'klient':>9}{'B server':>10}{'klient':>9}   ändring CPU/B")
+    for name in CASES:
+        s, c = server[name], client[name]
+        print(f"{name:<14}{s['cpu_ms']:>14.2f}{c['cpu_ms']:>9.2f}{s['bytes']:>10.0f}{c['bytes']:>9.0f}"
+              f"   {(c['cpu_ms'] / s['cpu_ms'] - 1) * 100:+.0f}% / {(c['bytes'] / s['bytes'] - 1) * 100:+.0f}%")
+    extra = client["layout_bytes"] - server["layout_bytes"]
+    print(f"\n/_dash-layout: {server['layout_bytes']} -> {client['layout_bytes']} B "
+          f"({extra:+d} B skelett, en gång per sidladdning)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"server": server, "client": client}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
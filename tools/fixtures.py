@@ -0,0 +1,100 @@
+# tools/fixtures.py
+# -------------------------------------------------------------------------
+# Realistiska MQTT-payloads för benchmarks och lokala körningar, i samma
+# format som HA-automationerna och sensorerna publicerar dem.
+#
+#   from tools.fixtures import payloads, populate
+#   populate()          # kör alla payloads genom mqtt_subscriber._dispatch
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List
+
+_NAMES = ["Anna", "Erik", "Maja", "Lars", "Ingrid", "Oskar", "Sofie", "Mikkel",
+          "Åsa", "Jörgen", "Frida", "Mads", "Karin", "Nils", "Ida", "Henrik"]
+_EVENTS = ["Tandläkare", "Fotboll", "Tömning tunna", "Simskola", "Föräldramöte",
+           "Middag hos mormor", "Frisör", "Handla", "Yoga", "Bilservice"]
+
+
+def calendar_family(n: int = 20, seed: int = 1) -> dict:
+    """~20 familjehändelser de närmaste 7 dagarna, blandat heldag och klockslag."""
+    rng = random.Random(seed)
+    today = date.today()
+    events = []
+    for i in range(n):
+        d = today + timedelta(days=rng.randrange(7))
+        if i % 4 == 0:
+            start: dict = {"date": d.isoformat()}
+        else:
+            start = {"dateTime": f"{d.isoformat()}T{rng.randrange(7, 21):02d}:{rng.choice((0, 15, 30, 45)):02d}:00+02:00"}
+        events.append({"summary": rng.choice(_EVENTS), "start": start})
+    return {"events": events}
+
+
+def calendar_birthdays(days: int = 370, seed: int = 2) -> dict:
+    """En födelsedag per dag, hela 370-dagarsfönstret (värsta fallet för calendar_box)."""
+    rng = random.Random(seed)
+    today = date.today()
+    events = []
+    for i in range(days):
+        d = today + timedelta(days=i)
+        events.append({"summary": f"{rng.choice(_NAMES)}s födelsedag, {rng.randrange(1940, 2020)}",
+                       "start": {"date": d.isoformat()}})
+    return {"events": events}
+
+
+def tibber_forecast(slots: int = 192, minutes: int = 15, seed: int = 3) -> List[dict]:
+    """Idag + imorgon i kvartsupplösning (192 poster), pris i SEK/kWh."""
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    out = []
+    for i in range(slots):
+        hour = (i * minutes // 60) % 24
+        base = 0.6 + 0.5 * (7 <= hour <= 9) + 0.7 * (17 <= hour <= 20)
+        price = round(max(0.01, base + rng.uniform(-0.25, 0.25)), 4)
+        level = "CHEAP" if price < 0.6 else "NORMAL" if price < 1.1 else "EXPENSIVE"
+        out.append({"start_time": (start + timedelta(minutes=i * minutes)).isoformat(),
+                    "price": price, "level": level})
+    return out
+
+
+def payloads() -> Dict[str, str]:
+    """topic -> payload (str) för varje topic subscribern hanterar."""
+    now_iso = datetime.now(timezone.utc).isoformat()
+    return {
+        "home/calendar/familie/next7d": json.dumps(calendar_family()),
+        "home/calendar/fodelsedagar/next370d": json.dumps(calendar_birthdays()),
+        "home/appliance/washer/state": json.dumps({"status": "run", "time_to_end_min": 87}),
+        "home/appliance/dryer/state": json.dumps({"status": "run", "time_left": 64}),
+        "home/appliance/automower/state": json.dumps(
+            {"name": "Robbie", "activity": "mowing", "battery": 78, "progress": 42}),
+        "shelly-htg3-84fce63ad204/events/rpc": json.dumps({"tC": 21.4, "rh": 44.0}),
+        "home/env/livingroom/ht/state": json.dumps({"t": 21.7, "rh": 41.5}),
+        "home/env/office/ht/state": json.dumps({"t": 20.9, "rh": 38.0}),
+        "home/env/laundryroom/ht/state": json.dumps({"t": 19.2, "rh": 58.0}),
+        "home/env/bedroom/ht/state": json.dumps({"t": 18.4, "rh": 47.0}),
+        "home/tibber/power": json.dumps({
+            "power": 1834.0, "power_raw": 1840.0, "power_smooth": 1812.5,
+            "energy_day_kwh": 14.27, "cost_day": 21.9, "ts": now_iso}),
+        "home/tibber/forecast/json": json.dumps(tibber_forecast()),
+        "home/env/livingroom/airquality_raw": json.dumps({
+            "eco2_ppm": 612, "tvoc_ppb": 143, "aqi": 2,
+            "temperature_c": 22.1, "pressure_hpa": 1012.4, "humidity_pct": 40.2}),
+        "home/weather": json.dumps({
+            "condition": "partlycloudy", "temperature": 14.3, "wind_speed": 4.2,
+            "wind_bearing": 225, "wind_gust": 8.1, "wind_dir": "SV", "wind_class": "Måttlig vind",
+            "tmax": 17.0, "precipitation": 0.4, "precip_prob_max": 30, "uv_max": 3.1,
+            "timestamp": now_iso}),
+        "home/energy/laddbox/power": "7360",
+    }
+
+
+def populate() -> None:
+    """Fyll subscriberns snapshot med alla fixtures."""
+    import mqtt_subscriber
+    for topic, payload in payloads().items():
+        mqtt_subscriber._dispatch(topic, payload)
@@ -0,0 +1,125 @@
+# tools/history_bench.py
+# -------------------------------------------------------------------------
+# Payloadstorlek och serverns byggtid för historikdiagrammen på skärm 2.
+#
+# Fyller alla serier i history.py med 7 dagars syntetiska prov var 10:e
+# sekund (60 480 per serie) och mäter för 24 h och 7 d:
+#   rå         alla prov i fönstret som Scattergl-traces (utan LTTB)
+#   lttb       make_history_figures: LTTB till POINTS punkter per trace
+#   extend     ett extendData-svar efter en hinks nya data
+# Byggtid är figur + JSON-serialisering som Dash gör den (to_json_plotly);
+# bytes är JSON-storleken. Webbläsarens ritning mäts inte här, men den
+# skalar med punkter per trace, som också skrivs ut.
+#
+#   python -m tools.history_bench [--json ut.json]
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Tuple
+
+os.environ.setdefault("MQTT_ENABLE", "0")
+os.environ.setdefault("METRICS", "0")
+
+STEP_S = 10
+DAYS = 7
+
+
+def _fill(now: float) -> int:
+    """7 dagar syntetiska prov i varje serie; returnerar antal per serie."""
+    import numpy as np
+    import history
+
+    n = int(DAYS * 86400 / STEP_S)
+    ts = now - STEP_S * np.arange(n)[::-1]
+    rng = np.random.default_rng(1)
+    day = np.sin(2 * np.pi * ts / 86400)
+    base = {"t": (20.0, 2.0), "rh": (45.0, 8.0), "power": (1500.0, 900.0),
+            "eco2": (600.0, 200.0), "tvoc": (150.0, 80.0)}
+    for name in history.SERIES:
+        mid, amp = base[name.split(".")[0]]
+        v = mid + amp * day + rng.normal(0, amp * 0.1, n).cumsum() / np.sqrt(n)
+        ring = history._rings[name]
+        ring.ts[:n], ring.v[:n] = ts[-len(ring.ts):], v[-len(ring.ts):]
+        ring.size, ring.head = min(n, len(ring.ts)), n % len(ring.ts)
+    return n
+
+
+def _timed(fn: Callable[[], Any], reps: int = 5) -> Tuple[float, Any]:
+    best, out = float("inf"), None
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Payload och byggtid för historikdiagrammen")
+    ap.add_argument("--json", help="skriv resultatet som JSON hit")
+    args = ap.parse_args()
+
+    import plotly.graph_objects as go
+    from plotly.io.json import to_json_plotly
+
+    import history
+    from components import history_charts as hc
+
+    now = time.time()
+    per_series = _fill(now)
+    traces = sum(len(s) for _t, _u, s in hc.CHARTS.values())
+
+    def raw(range_key: str) -> str:
+        span = hc.RANGES[range_key][0]
+        figs = []
+        for _cid, (title, unit, series) in hc.CHARTS.items():
+            traces = []
+            for name, label, axis in series:
+                x, y = history.window(name, now - span)
+                traces.append(go.Scattergl(x=hc._local_ms(x), y=y, name=label, yaxis=axis))
+            figs.append(hc.figure(traces, hc._layout(title, unit, range_key, False)))
+        return "".join(to_json_plotly(f) for f in figs)
+
+    def lttb(range_key: str) -> str:
+        figs, _cursor = hc.make_history_figures(range_key, now)
+        return "".join(to_json_plotly(f) for f in figs)
+
+    report: Dict[str, Any] = {"samples_per_series": per_series, "traces": traces,
+                              "points": hc.POINTS, "ring_bytes": history.memory_bytes()}
+    print(f"{per_series} prov per serie, {traces} traces, POINTS={hc.POINTS}, "
+          f"ringbuffertar {history.memory_bytes() / 1e6:.1f} MB")
+    print(f"{'fall':<14}{'punkter/trace':>14}{'ms':>9}{'kB':>10}")
+    for range_key, (span, _label) in hc.RANGES.items():
+        n_raw = min(per_series, int(span / STEP_S))
+        ms_raw, js_raw = _timed(lambda: raw(range_key), reps=2)
+        ms_lttb, js_lttb = _timed(lambda: lttb(range_key))
+        _figs, cursor = hc.make_history_figures(range_key, now)
+        # en hinks nya data i varje serie, sedan ett extend-anrop
+        bucket = span / hc.POINTS
+        t_new = now + bucket + STEP_S
+        for name in history.SERIES:
+            for t in range(int(now) + STEP_S, int(t_new) + 1, STEP_S):
+                history._rings[name].append(float(t), 1.0)
+        ms_ext, (ext, _c) = _timed(lambda: hc.history_extend(range_key, cursor, t_new))
+        js_ext = to_json_plotly(ext)
+        rows = {
+            "raw": (n_raw, ms_raw, len(js_raw)),
+            "lttb": (min(n_raw, hc.POINTS), ms_lttb, len(js_lttb)),
+            "extend": (len(ext[0][0]["x"][0]) if isinstance(ext[0], list) else 0, ms_ext, len(js_ext)),
+        }
+        report[range_key] = {k: {"points_per_trace": p, "ms": m, "bytes": b} for k, (p, m, b) in rows.items()}
+        for k, (p, m, b) in rows.items():
+            print(f"{range_key + ' ' + k:<14}{p:>14}{m:>9.1f}{b / 1024:>10.1f}")
+        _fill(now)                              # återställ för nästa intervall
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
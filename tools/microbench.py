@@ -0,0 +1,229 @@
+# tools/microbench.py
+# -------------------------------------------------------------------------
+# Mikrobenchmarks för de heta vägarna: varje _parse_* i mqtt_subscriber,
+# get_snapshot, alla *_compute/render-funktioner i components/, calendar_box
+# med 370 födelsedagar, make_tibber_figure, make_energy_figure och
+# prisplaneraren (48 h prognos i tim- och kvartsupplösning), prislarmen och
+# larmmotorn.
+#
+#   python -m tools.microbench                          # kör och skriv tabell
+#   python -m tools.microbench --save data/microbench.json
+#   python -m tools.microbench --compare data/microbench.json --threshold 0.25
+#   python -m tools.microbench --pin 0 -k parse         # en kärna, bara parse
+#
+# --compare avslutar med kod 1 och en diff-tabell om något fall blivit mer än
+# --threshold långsammare än baslinjen (jämför median per anrop).
+# Baslinjer är maskinberoende: spela in och jämför under samma CPU-tak, t.ex.
+# `make bench-pi` som kör i Docker med --cpus=1 och en pinnad kärna.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("MQTT_ENABLE", "0")
+
+import mqtt_subscriber as ms
+from tools import fixtures
+
+
+def _benches() -> Dict[str, Callable[[], Any]]:
+    """namn -> funktion utan argument. Snapshoten fylls med fixtures först."""
+    from datetime import date
+    from zoneinfo import ZoneInfo
+
+    import aggregators
+    import alerts
+    import appliance_cycles
+    import automower_stats
+    import calendar_index
+    import price_alerts
+    import price_planner
+    from sections import AirQuality, Automower, RoomClimate, Washer, tibber_forecast
+    from components.alert_banner import alert_banner_compute
+    from components.automower_box import automower_compute
+    from components.automower_modal import automower_modal_compute
+    from components.calendar_box import calendar_box
+    from components.climate_quality_box import climate_quality_compute
+    from components.dryer_box import dryer_compute
+    from components.energy_modal import DEVICES, make_energy_figure
+    from components.env_stue_box import compute as env_stue_compute
+    from components.power_box import power_compute
+    from components.price_box import price_compute
+    from components.temperature_modal import render_temperature_tiles
+    from components.tibber_plot import make_tibber_figure
+    from components.washer_box import washer_compute
+    from components.weather_box import weather_box
+
+    ms.DEBUG = False
+    fixtures.populate()
+    p = fixtures.payloads()
+    tz = ZoneInfo("Europe/Stockholm")
+    snap = ms.get_snapshot()
+    energy = {sid: 1.0 + i * 0.7 for i, dev in enumerate(DEVICES) for sid in dev["ids"]}
+    energy_prev = {sid: v * 0.9 for sid, v in energy.items()}
+    # Prognoser för planeraren: 48 h i timupplösning och i kvartsupplösning
+    fc_h = tibber_forecast(fixtures.tibber_forecast(slots=48, minutes=60), None)
+    fc_q = tibber_forecast(fixtures.tibber_forecast(slots=192, minutes=15), None)
+    seq = itertools.count(int(time.time()) + 10)  # stigande ts till aggregaten
+    ends_q = {name: price_alerts.run_ends(fc_q.ore, r) for name, r in price_alerts.RULES.items()}
+
+    b: Dict[str, Callable[[], Any]] = {
+        "parse.calendar_fam":   lambda: ms._parse_calendar_fam(p["home/calendar/familie/next7d"]),
+        "parse.calendar_bday":  lambda: ms._parse_calendar_bday(p["home/calendar/fodelsedagar/next370d"]),
+        "parse.washer":         lambda: ms._parse_washer(p["home/appliance/washer/state"]),
+        "parse.dryer":          lambda: ms._parse_dryer(p["home/appliance/dryer/state"]),
+        "parse.automower":      lambda: ms._parse_automower(p["home/appliance/automower/state"]),
+        "parse.shelly":         lambda: ms._parse_shelly("shelly-htg3-84fce63ad204/events/rpc",
+                                                         p["shelly-htg3-84fce63ad204/events/rpc"]),
+        "parse.shelly_bht":     lambda: ms._parse_shelly_bht(p["home/env/livingroom/ht/state"]),
+        "parse.env_room":       lambda: ms._parse_env_room("env_office", p["home/env/office/ht/state"]),
+        "parse.power":          lambda: ms._parse_power(p["home/tibber/power"]),
+        "parse.tibber_forecast": lambda: ms._parse_tibber_forecast(p["home/tibber/forecast/json"]),
+        "parse.device_power":   lambda: ms._parse_device_power("home/energy/laddbox/power",
+                                                               p["home/energy/laddbox/power"]),
+        "parse.airquality_raw": lambda: ms._parse_airquality_raw(p["home/env/livingroom/airquality_raw"]),
+        "parse.weather":        lambda: ms._parse_weather(p["home/weather"]),
+        "get_snapshot":         ms.get_snapshot,
+        # EMA, min/max över AGG_WINDOWS_S och trend för t och rh, i ingest-vägen
+        "agg.on_update":        lambda: aggregators._on_update(
+                                    "shelly_bht", RoomClimate(21.0 + next(seq) % 7 * 0.1, 40.0, next(seq))),
+        # larmregler för en sektion (under gränsen: ingen timer bokas)
+        "alerts.on_update":     lambda: alerts._on_update(
+                                    "airquality_raw", AirQuality(eco2_ppm=800 + next(seq) % 300, ts=next(seq))),
+        "compute.alerts":       lambda: alert_banner_compute(tz, None),
+        # cykelspårning: en pågående cykel utan övergång (det vanliga fallet)
+        "cycles.on_update":     lambda: appliance_cycles._on_update(
+                                    "washer", Washer(time_to_end_min=60 + next(seq) % 30, ts=next(seq))),
+        # last_ts=None: ingen de-dupe, dvs. den fulla renderingsvägen
+        "compute.washer":       lambda: washer_compute(snap, tz, None),
+        "compute.dryer":        lambda: dryer_compute(snap, tz, None),
+        "compute.automower":    lambda: automower_compute(snap, tz, None),
+        # sessioner, minuter och historik vid ingest; modalen renderar det färdiga
+        "mower.on_update":      lambda: automower_stats._on_update(
+                                    "automower", Automower(activity="mowing", battery=80, progress=40, ts=next(seq))),
+        "compute.mower_modal":  lambda: automower_modal_compute(tz, None),
+        "compute.climate":      lambda: climate_quality_compute(snap, tz, None),
+        "compute.env_stue":     lambda: env_stue_compute(snap, tz, None),
+        "compute.power":        lambda: power_compute(snap, tz, None),
+        "render.weather_box":   weather_box,
+        # calendar_box läser ett cachat fönster; indexet byggs i parse.calendar_*
+        "render.calendar_box":  calendar_box,
+        "calendar.derive":      lambda: calendar_index.derive(calendar_index._index, date.today()),
+        "render.temperature_tiles": lambda: render_temperature_tiles(snap, tz),
+        "figure.tibber":        make_tibber_figure,
+        # en gång per prognosgeneration, alla PROFILES
+        "plan.build_48h_1h":       lambda: price_planner.build(fc_h),
+        "plan.build_48h_15m":      lambda: price_planner.build(fc_q),
+        "plan.build_48h_15m_py":   lambda: price_planner.build(fc_q, use_numpy=False),
+        "plan.lookup":             lambda: price_planner.plan("washer"),
+        # prislarm: följder per regel en gång per prognos, läget vid varje slotgräns
+        "price.run_ends":       lambda: [price_alerts.run_ends(fc_q.ore, r) for r in price_alerts.RULES.values()],
+        "price.evaluate":       lambda: price_alerts.evaluate(fc_q, ends_q, fc_q.starts[100] + 1, tz),
+        "compute.price":        lambda: price_compute(tz, None),
+        "figure.energy_day":    lambda: make_energy_figure(energy, 30.0),
+        "figure.energy_month":  lambda: make_energy_figure(energy, None, energy_prev, "month"),
+    }
+    return b
+
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, float]:
+    """Tider per anrop i µs: min och median över `repeat` omgångar."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:                       # som Timer.autorange, men med valbar mintid
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2 if number < 8 else 5
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"min_us": min(runs), "median_us": statistics.median(runs), "number": number}
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """Skriv diff-tabell; returnera namnen som regresserat mer än `threshold`."""
+    regressed = []
+    print(f"\n{'bench':<28}{'baslinje µs':>14}{'nu µs':>12}{'diff':>9}")
+    for name in sorted(set(current) | set(baseline)):
+        cur, base = current.get(name), baseline.get(name)
+        if cur is None or base is None:
+            b_txt = "–" if base is None else f"{base['median_us']:.1f}"
+            c_txt = "–" if cur is None else f"{cur['median_us']:.1f}"
+            print(f"{name:<28}{b_txt:>14}{c_txt:>12}{'ny' if base is None else 'saknas':>9}")
+            continue
+        ratio = cur["median_us"] / base["median_us"] - 1 if base["median_us"] else 0.0
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- REGRESSION"
+            regressed.append(name)
+        elif ratio < -threshold:
+            flag = "  (snabbare)"
+        print(f"{name:<28}{base['median_us']:>14.1f}{cur['median_us']:>12.1f}{ratio:>+9.0%}{flag}")
+    return regressed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Mikrobenchmarks för FamilyDash heta vägar")
+    ap.add_argument("-k", "--filter", action="append", help="kör bara fall vars namn innehåller detta")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--min-time", type=float, default=0.05, help="minsta tid per omgång (s)")
+    ap.add_argument("--pin", type=int, help="bind processen till denna CPU-kärna (Linux)")
+    ap.add_argument("--save", help="spara resultat som baslinje (JSON)")
+    ap.add_argument("--compare", help="jämför mot baslinje (JSON)")
+    ap.add_argument("--threshold", type=float, default=0.25, help="tillåten försämring, 0.25 = 25 %%")
+    args = ap.parse_args()
+
+    if args.pin is not None:
+        os.sched_setaffinity(0, {args.pin})
+
+    benches = _benches()
+    if args.filter:
+        benches = {n: f for n, f in benches.items() if any(k in n for k in args.filter)}
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'bench':<28}{'min µs':>12}{'median µs':>12}{'n':>9}")
+    for name, fn in benches.items():
+        r = results[name] = measure(fn, args.repeat, args.min_time)
+        print(f"{name:<28}{r['min_us']:>12.1f}{r['median_us']:>12.1f}{r['number']:>9}")
+
+    meta = {
+        "when": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"[bench] baslinje sparad: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        bmeta = baseline.get("meta", {})
+        if bmeta.get("machine") != meta["machine"] or bmeta.get("cpus") != meta["cpus"]:
+            print(f"[bench] OBS: baslinjen är från {bmeta.get('machine')}/{bmeta.get('cpus')} cpu, "
+                  f"nu {meta['machine']}/{meta['cpus']} cpu")
+        base = baseline.get("results", {})
+        if args.filter:
+            base = {n: r for n, r in base.items() if n in results}
+        regressed = compare(results, base, args.threshold)
+        if regressed:
+            print(f"\n[bench] {len(regressed)} fall långsammare än +{args.threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+        print(f"\n[bench] inga regressioner över +{args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# tools/mqtt_replay.py
+# -------------------------------------------------------------------------
+# Spela upp en MQTT-inspelning (se mqtt_record.py) genom subscriberns
+# parser/dispatch-lager, utan broker.
+#
+# Spela in i kiosken med MQTT_RECORD=data/mqtt.rec, kopiera filen och kör:
+#
+#   python -m tools.mqtt_replay data/mqtt.rec              # realtid (1x)
+#   python -m tools.mqtt_replay data/mqtt.rec --speed 60   # 60x
+#   python -m tools.mqtt_replay data/mqtt.rec --speed max --loops 20
+#
+# Med --speed max fungerar det som genomströmningsbenchmark för hela
+# ingest-vägen (_on_message: avkodning, dispatch, parse, snapshot-lås och
+# lyssnarna i mqtt_subscriber.INGEST_MODULES):
+# meddelanden/s och CPU-tid per meddelande, totalt och per topic.
+#
+# Lyssnarna körs utan sidoeffekter utåt: ingen inspelning (MQTT_RECORD),
+# inga HA-notiser från larmen (ALERT_NOTIFY) och maskincyklerna skrivs
+# till en temporär fil i stället för kioskens APPLIANCE_CYCLES_PATH.
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from mqtt_record import read_records
+
+
+class _Msg:
+    """Det minsta av paho.MQTTMessage som _on_message använder."""
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Spela upp en MQTT-inspelning utan broker")
+    ap.add_argument("path", help="inspelningsfil (MQTT_RECORD)")
+    ap.add_argument("--speed", default="1", help="1, N (t.ex. 60) eller max")
+    ap.add_argument("--loops", type=int, default=1, help="antal varv (bara med --speed max)")
+    ap.add_argument("--topic", action="append", help="spela bara upp dessa topics")
+    ap.add_argument("--debug", action="store_true", help="logga meddelanden som med MQTT_DEBUG=1")
+    ap.add_argument("--json", help="skriv rapporten som JSON hit")
+    args = ap.parse_args()
+
+    os.environ["MQTT_RECORD"] = ""              # spela aldrig in en uppspelning
+    os.environ["ALERT_NOTIFY"] = ""             # inga notiser till telefonerna
+    tmp = tempfile.TemporaryDirectory(prefix="mqtt_replay-")
+    os.environ["APPLIANCE_CYCLES_PATH"] = os.path.join(tmp.name, "appliance_cycles.jsonl")
+    import mqtt_subscriber
+    mqtt_subscriber.load_ingest()              # samma lyssnare som i appen
+    mqtt_subscriber.DEBUG = args.debug
+    if args.debug:
+        import log_setup
+        log_setup.setup()
+
+    records: List[Tuple[float, str, bytes]] = [
+        r for r in read_records(args.path) if not args.topic or r[1] in args.topic
+    ]
+    if not records:
+        raise SystemExit(f"inga meddelanden i {args.path}")
+    msgs = [(ts, _Msg(topic, payload)) for ts, topic, payload in records]
+
+    fast = args.speed == "max"
+    speed = 0.0 if fast else float(args.speed)
+    loops = max(1, args.loops) if fast else 1
+    span = records[-1][0] - records[0][0]
+    print(f"[replay] {len(msgs)} meddelanden, {span:.0f} s inspelat, "
+          f"hastighet {'max' if fast else f'{speed:g}x'}, varv {loops}")
+
+    on_message = mqtt_subscriber._on_message
+    per_topic: Dict[str, List[float]] = {}      # topic -> [antal, cpu_s]
+    cpu = time.process_time
+    wall0, cpu0 = time.perf_counter(), cpu()
+    for _ in range(loops):
+        t_first = msgs[0][0]
+        start = time.perf_counter()
+        for ts, msg in msgs:
+            if not fast:
+                delay = (ts - t_first) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            c0 = cpu()
+            on_message(None, None, msg)
+            acc = per_topic.setdefault(msg.topic, [0, 0.0])
+            acc[0] += 1
+            acc[1] += cpu() - c0
+    wall, cpu_total = time.perf_counter() - wall0, cpu() - cpu0
+
+    n = len(msgs) * loops
+    report: Dict[str, Any] = {
+        "messages": n,
+        "wall_s": wall,
+        "cpu_s": cpu_total,
+        "msgs_per_s": n / wall if wall > 0 else 0.0,
+        "cpu_us_per_msg": cpu_total / n * 1e6,
+        "topics": {t: {"n": c, "cpu_us_per_msg": s / c * 1e6} for t, (c, s) in per_topic.items()},
+    }
+    print(f"{'topic':<44}{'n':>8}{'cpu µs/msg':>12}")
+    for t, row in sorted(report["topics"].items(), key=lambda kv: -kv[1]["cpu_us_per_msg"]):
+        print(f"{t:<44}{row['n']:>8}{row['cpu_us_per_msg']:>12.1f}")
+    print(f"[replay] {n} meddelanden på {wall:.2f} s: {report['msgs_per_s']:.0f} msg/s, "
+          f"{report['cpu_us_per_msg']:.1f} µs CPU/msg")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), **report}, f, indent=2)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# tools/snapshot_footprint.py
+# -------------------------------------------------------------------------
+# Minne och allokeringar för MQTT-snapshoten, per sektion.
+#
+# Fyller snapshoten med tools.fixtures och mäter sedan:
+#   bytes        ungefärlig djup storlek per sektion (memprof.deep_sizeof)
+#   upd µs       tid för en uppdatering (_dispatch med sektionens fixture)
+#   upd peak B   tillfälligt allokerade bytes under en uppdatering
+#                (tracemallocs topp ovanför utgångsläget)
+#   upd blocks   nya block som ligger kvar efter uppdateringen, dvs. de
+#                nya värdena (det som ersätts allokerades före mätningen)
+# samt kostnaden för en get_snapshot()-läsning (tid, bytes och block som
+# kopian håller). Körs mot olika versioner av trädet för före/efter:
+#
+#   python -m tools.snapshot_footprint [--json ut.json]
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+os.environ.setdefault("MQTT_ENABLE", "0")
+os.environ.setdefault("METRICS", "0")
+
+# sektion -> topic vars fixture uppdaterar den
+SECTION_TOPICS: Dict[str, str] = {
+    "calendar":       "home/calendar/fodelsedagar/next370d",
+    "washer":         "home/appliance/washer/state",
+    "dryer":          "home/appliance/dryer/state",
+    "automower":      "home/appliance/automower/state",
+    "shelly":         "shelly-htg3-84fce63ad204/events/rpc",
+    "shelly_bht":     "home/env/livingroom/ht/state",
+    "pulse_power":    "home/tibber/power",
+    "airquality_raw": "home/env/livingroom/airquality_raw",
+    "weather":        "home/weather",
+    "tibber_forecast": "home/tibber/forecast/json",
+    "env_office":     "home/env/office/ht/state",
+    "env_laundry":    "home/env/laundryroom/ht/state",
+    "env_bedroom":    "home/env/bedroom/ht/state",
+    "device_power":   "home/energy/laddbox/power",
+}
+
+
+def _per_call_us(fn: Callable[[], Any], min_time: float = 0.2) -> float:
+    n, t0 = 0, time.perf_counter()
+    while True:
+        fn()
+        n += 1
+        dt = time.perf_counter() - t0
+        if dt >= min_time:
+            return dt / n * 1e6
+
+
+def _alloc(fn: Callable[[], Any], keep: bool) -> Dict[str, int]:
+    """Toppbytes och kvarvarande block för ett anrop. keep=True håller returvärdet vid liv."""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.take_snapshot()
+    cur0, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    held = fn()
+    _cur, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    kept = [s for s in after.compare_to(base, "lineno")
+            if "tracemalloc" not in s.traceback[0].filename]
+    out = {"peak_bytes": peak - cur0,
+           "blocks": sum(s.count_diff for s in kept),
+           "bytes": sum(s.size_diff for s in kept)}
+    if not keep:
+        out.pop("bytes")
+    del held
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Minne och allokeringar per snapshot-sektion")
+    ap.add_argument("--json", help="skriv resultatet som JSON hit")
+    args = ap.parse_args()
+
+    import memprof
+    import mqtt_subscriber as ms
+    from tools import fixtures
+
+    ms.DEBUG = False
+    fixtures.populate()
+    payloads = fixtures.payloads()
+    snap = ms.get_snapshot()
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    for name in sorted(snap):
+        topic = SECTION_TOPICS.get(name)
+        row: Dict[str, Any] = {"bytes": memprof.deep_sizeof(snap[name])}
+        if topic:
+            update = (lambda t=topic: ms._dispatch(t, payloads[t]))
+            row["update_us"] = _per_call_us(update)
+            a = _alloc(update, keep=False)
+            row["update_peak_bytes"] = a["peak_bytes"]
+            row["update_blocks"] = a["blocks"]
+        rows[name] = row
+
+    read = {"us": _per_call_us(ms.get_snapshot), **_alloc(ms.get_snapshot, keep=True)}
+    total = memprof.deep_sizeof(ms.get_snapshot())
+
+    print(f"{'sektion':<16}{'bytes':>9}{'upd µs':>9}{'upd peak B':>12}{'upd blocks':>12}")
+    for name, r in rows.items():
+        print(f"{name:<16}{r['bytes']:>9}{r.get('update_us', 0):>9.1f}"
+              f"{r.get('update_peak_bytes', 0):>12}{r.get('update_blocks', 0):>12}")
+    print(f"{'totalt':<16}{total:>9}")
+    print(f"get_snapshot: {read['us']:.1f} µs, {read['bytes']} B i {read['blocks']} block per läsning "
+          f"(topp {read['peak_bytes']} B)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "sections": rows,
+                       "total_bytes": total, "get_snapshot": read}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
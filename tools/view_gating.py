@@ -0,0 +1,216 @@
+# tools/view_gating.py
+# -------------------------------------------------------------------------
+# Requests och server-CPU per minut för olika vylägen, med och utan
+# synlighetsgrindarna i view_gate.py.
+#
+# Läser callback-kartan i appen och härleder för varje server-callback
+# vilka Intervall som triggar den, direkt eller via en grind. Ett vyläge
+# (aktiv skärm + öppna modaler) ger då requests/min per callback; "utan
+# grindar" är samma karta med alla grindar öppna, dvs. den gamla
+# kopplingen direkt mot tick/interval-component.
+#
+# CPU och svarsstorlek per request mäts i processen med Flask-testklienten
+# mot /_dash-update-component, i stationärt läge: snapshoten fylls med
+# tools.fixtures och svarens Store-värden matas tillbaka som i webbläsaren,
+# så tiles som inte ändrats bara svarar med sin last-ts-Store.
+# Callbacks som går mot Home Assistant (energimodalen) mäts inte som
+# standard (--with-ha).
+#
+#   python -m tools.view_gating [--reps 200] [--json ut.json]
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+os.environ.setdefault("MQTT_ENABLE", "0")
+os.environ.setdefault("METRICS", "0")
+
+# namn -> (aktiv skärm, öppna modal-stores)
+VIEWS: Dict[str, Tuple[int, Set[str]]] = {
+    "skärm 1":              (0, set()),
+    "skärm 2":              (1, set()),
+    "skärm 1 + temperatur": (0, {"modal-open"}),
+    "skärm 1 + energi":     (0, {"energy-modal-open"}),
+    "skärm 1 + klippare":   (0, {"automower-modal-open"}),
+}
+
+_HA_OUTPUTS = ("energy-devices-graph",)
+
+
+def _walk(node: Any) -> Iterator[Any]:
+    yield node
+    children = getattr(node, "children", None)
+    if isinstance(children, (list, tuple)):
+        for c in children:
+            yield from _walk(c)
+    elif children is not None and hasattr(children, "to_plotly_json"):
+        yield from _walk(children)
+
+
+def _intervals(layout: Any) -> Dict[str, float]:
+    """Interval-id -> period i sekunder (avstängda Intervall räknas inte)."""
+    from dash import dcc
+    return {c.id: c.interval / 1000 for c in _walk(layout)
+            if isinstance(c, dcc.Interval) and not getattr(c, "disabled", False)}
+
+
+def _clocks(cb: Dict[str, Any], intervals: Dict[str, float]) -> List[Tuple[str, Optional[str]]]:
+    """(Interval-id, grind eller None) för varje klock-input till callbacken."""
+    import view_gate
+    out: List[Tuple[str, Optional[str]]] = []
+    for d in cb["inputs"]:
+        if d["id"] in intervals and d["property"] == "n_intervals":
+            out.append((d["id"], None))
+        elif d["id"] in view_gate.GATES:
+            out.append((view_gate.GATES[d["id"]][0], d["id"]))
+    return out
+
+
+def _rate(clocks: List[Tuple[str, Optional[str]]], intervals: Dict[str, float],
+          view: Optional[Tuple[int, Set[str]]]) -> float:
+    """Requests/min i vyläget; view=None betyder alla grindar öppna."""
+    import view_gate
+    per_min = 0.0
+    for clock, gate in clocks:
+        if clock not in intervals:
+            continue
+        if gate is None or view is None or view_gate.is_open(gate, *view):
+            per_min += 60 / intervals[clock]
+    return per_min
+
+
+class _Caller:
+    """Anropar en callback via testklienten och håller Store-state mellan anropen."""
+
+    def __init__(self, client: Any, key: str, cb: Dict[str, Any]) -> None:
+        self.client = client
+        self.key = key
+        self.cb = cb
+        outs = cb["output"] if isinstance(cb["output"], list) else [cb["output"]]
+        self.outputs = [{"id": o.component_id, "property": o.component_property} for o in outs]
+        self.multi = key.startswith("..")
+        self.values: Dict[str, Any] = {}
+        self.n = 0
+        self.trigger = ""
+
+    def _arg(self, d: Dict[str, str], modals: Set[str]) -> Dict[str, Any]:
+        prop = f"{d['id']}.{d['property']}"
+        if d["property"] == "n_intervals" or prop == self.trigger:
+            value: Any = self.n
+        elif d["id"] in modals:
+            value = True
+        else:
+            value = self.values.get(prop)
+        return {"id": d["id"], "property": d["property"], "value": value}
+
+    def call(self, trigger: str, modals: Set[str]) -> int:
+        """Ett anrop; returnerar svarets storlek i bytes."""
+        self.n += 1
+        self.trigger = trigger
+        body = {
+            "output": self.key,
+            "outputs": self.outputs if self.multi else self.outputs[0],
+            "inputs": [self._arg(d, modals) for d in self.cb["inputs"]],
+            "state": [self._arg(d, modals) for d in self.cb["state"]],
+            "changedPropIds": [trigger],
+        }
+        resp = self.client.post("/_dash-update-component", json=body)
+        if resp.status_code == 200:
+            for cid, props in (resp.get_json().get("response") or {}).items():
+                for prop, value in props.items():
+                    self.values[f"{cid}.{prop}"] = value
+        return len(resp.data)
+
+
+def _measure(caller: _Caller, trigger: str, modals: Set[str], reps: int) -> Tuple[float, float]:
+    """(CPU-ms, bytes) per request i stationärt läge."""
+    for _ in range(3):                        # första anropen renderar och fyller Store-state
+        caller.call(trigger, modals)
+    nbytes = 0
+    t0 = time.process_time()
+    for _ in range(reps):
+        nbytes += caller.call(trigger, modals)
+    return (time.process_time() - t0) / reps * 1000, nbytes / reps
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Requests och CPU per vyläge med/utan synlighetsgrindar")
+    ap.add_argument("--reps", type=int, default=200, help="anrop per callback för CPU-mätningen")
+    ap.add_argument("--with-ha", action="store_true", help="mät även callbacks som går mot HA")
+    ap.add_argument("--json", help="skriv resultatet som JSON hit")
+    args = ap.parse_args()
+
+    import logging
+    import mqtt_subscriber
+    mqtt_subscriber.DEBUG = False
+    import app as dash_app
+    from tools import fixtures
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    fixtures.populate()
+    app = dash_app.app
+    intervals = _intervals(app.layout)
+    client = app.server.test_client()
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    for key, cb in app.callback_map.items():
+        if "callback" not in cb:
+            continue
+        clocks = _clocks(cb, intervals)
+        if not clocks:
+            continue                          # bara klick/val, oberoende av vyläget
+        name = key.strip(".").split("...")[0]
+        row: Dict[str, Any] = {"clocks": clocks, "cpu_ms": None}
+        if args.with_ha or not name.startswith(_HA_OUTPUTS):
+            clock, gate = clocks[0]
+            trigger = f"{gate}.data" if gate else f"{clock}.n_intervals"
+            modals = {m for _s, ms in VIEWS.values() for m in ms}
+            cpu, nbytes = _measure(_Caller(client, key, cb), trigger, modals, args.reps)
+            row.update(cpu_ms=cpu, bytes=nbytes)
+        rows[name] = row
+
+    def totals(view: Optional[Tuple[int, Set[str]]]) -> Dict[str, float]:
+        t = {"requests_per_min": 0.0, "cpu_ms_per_min": 0.0, "kb_per_min": 0.0}
+        for r in rows.values():
+            rate = _rate(r["clocks"], intervals, view)
+            t["requests_per_min"] += rate
+            t["cpu_ms_per_min"] += rate * (r["cpu_ms"] or 0.0)
+            t["kb_per_min"] += rate * r.get("bytes", 0.0) / 1024
+        return t
+
+    print(f"{'callback':<32}{'klocka':<14}{'CPU ms/req':>11}{'B/svar':>9}")
+    for name, r in rows.items():
+        clock = ", ".join(g or c for c, g in r["clocks"])
+        if r["cpu_ms"] is None:
+            print(f"{name[:31]:<32}{clock[:13]:<14}{'-':>11}{'-':>9}")
+        else:
+            print(f"{name[:31]:<32}{clock[:13]:<14}{r['cpu_ms']:>11.2f}{r['bytes']:>9.0f}")
+
+    keys = ("requests_per_min", "cpu_ms_per_min", "kb_per_min")
+    base = totals(None)
+    report: Dict[str, Any] = {"utan grindar": base}
+    print()
+    print(f"{'vyläge':<24}{'req/min':>9}{'CPU ms/min':>12}{'kB/min':>9}   ändring req/CPU/kB")
+    print(f"{'utan grindar (alla)':<24}" + "".join(f"{base[k]:>{w}.1f}" for k, w in zip(keys, (9, 12, 9))))
+    for view_name, view in VIEWS.items():
+        t = report[view_name] = totals(view)
+        change = " / ".join(f"{(t[k] - base[k]) / (base[k] or 1):+.0%}" for k in keys)
+        print(f"{view_name:<24}" + "".join(f"{t[k]:>{w}.1f}" for k, w in zip(keys, (9, 12, 9)))
+              + f"   {change}")
+    print("(stationärt läge utan ny MQTT-data; HA-callbacks räknas i req men inte i CPU/kB"
+          f"{'' if not args.with_ha else ', här inräknade'})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"per_callback": {n: {k: v for k, v in r.items() if k != "clocks"}
+                                        for n, r in rows.items()},
+                       "views": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
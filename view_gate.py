@@ -0,0 +1,70 @@
+# view_gate.py
+# -------------------------------------------------------------------------
+# Klientsidiga grindar för tick-callbacks: rendera bara det som syns.
+#
+# pager.js rapporterar aktiv skärm till Store "view-screen" (set_props), och
+# modalernas öppen-state finns redan i modal-open-storesen. En grind är en
+# Store som en klientsidig callback sätter vid varje tick från `clock`,
+# men bara när dess skärm är aktiv eller dess modal öppen. Server-
+# callbacks lyssnar på grinden i stället för på Intervallet, så dolda
+# widgets ger inga requests alls. När skärmen/modalen blir synlig igen
+# triggas grinden direkt och alla dess widgets kommer ikapp i en omgång
+# (de-dupe mot last-ts-storesen gör att bara ändrade tiles skickas).
+#
+#   TICK_MAIN = view_gate.gate(app, "tick-main", "tick", screen=0)
+#   ... layout: *view_gate.stores()
+#   @app.callback(..., Input(TICK_MAIN, "data"), ...)
+# -------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from dash import dcc
+from dash.dependencies import Input, Output
+
+VIEW_STORE = "view-screen"
+
+# grind -> (Interval-id, "screen"|"modal", skärmindex eller modal-store)
+GATES: Dict[str, Tuple[str, str, object]] = {}
+
+_SCREEN_JS = """
+function(n, screen) {
+    if ((screen || 0) !== %d) { return window.dash_clientside.no_update; }
+    return Date.now();
+}
+"""
+
+_MODAL_JS = """
+function(n, open) {
+    if (!open) { return window.dash_clientside.no_update; }
+    return Date.now();
+}
+"""
+
+
+def gate(app, gate_id: str, clock: str, *, screen: Optional[int] = None,
+         modal: Optional[str] = None) -> str:
+    """Registrera en grind och returnera dess id. Anges före layouten (stores())."""
+    if (screen is None) == (modal is None):
+        raise ValueError("ange exakt en av screen= och modal=")
+    if screen is not None:
+        app.clientside_callback(_SCREEN_JS % screen, Output(gate_id, "data"),
+                                Input(clock, "n_intervals"), Input(VIEW_STORE, "data"))
+        GATES[gate_id] = (clock, "screen", screen)
+    else:
+        app.clientside_callback(_MODAL_JS, Output(gate_id, "data"),
+                                Input(clock, "n_intervals"), Input(modal, "data"))
+        GATES[gate_id] = (clock, "modal", modal)
+    return gate_id
+
+
+def stores() -> List[dcc.Store]:
+    """Store för aktiv skärm plus en Store per registrerad grind."""
+    return [dcc.Store(id=VIEW_STORE, data=0)] + [dcc.Store(id=g, data=None) for g in GATES]
+
+
+def is_open(gate_id: str, screen: int, open_modals: "set[str]") -> bool:
+    """Släpper grinden igenom ticks i vyn (screen, öppna modal-stores)? För verktyg."""
+    _clock, kind, arg = GATES[gate_id]
+    return screen == arg if kind == "screen" else arg in open_modals